@@ -0,0 +1,85 @@
+import json
+
+
+class DecisionParser:
+    """Incremental parser for the agent's JSON decision as it streams in.
+
+    Feed it chunks of model output; every top-level member of the object
+    ({"action": ..., "tool_name": ..., "params": {...}}) shows up in `fields`
+    as soon as its value is complete, before the rest of the object has arrived.
+    Anything before the first "{" (e.g. a ```json fence) is skipped.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.closed = False
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+
+    def feed(self, chunk: str):
+        if self.closed:
+            return
+        self._text += chunk
+        text = self._text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._try_member(i + 1)
+                continue
+
+            if c == '"':
+                if self._depth > 0:
+                    self._in_string = True
+            elif c in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    if c != "{":
+                        self._depth = 0
+                        continue
+                    self._member_start = i + 1
+            elif c in "}]":
+                if self._depth == 0:
+                    continue
+                self._depth -= 1
+                if self._depth == 1:
+                    self._try_member(i + 1)
+                elif self._depth == 0:
+                    self._try_member(i)
+                    self.closed = True
+                    self._pos = i + 1
+                    return
+            elif c == "," and self._depth == 1:
+                self._try_member(i)
+                self._member_start = i + 1
+        self._pos = len(text)
+
+    def _try_member(self, end: int):
+        # Cheap: called only when a string, nested value, or member ends at depth 1.
+        member = self._text[self._member_start:end].strip()
+        if not member or ":" not in member:
+            return
+        try:
+            self.fields.update(json.loads("{" + member + "}"))
+        except ValueError:
+            pass
+
+    def tool_call(self):
+        """(tool_name, params) once a complete tool call has been seen, else None."""
+        fields = self.fields
+        if fields.get("action") != "tool" or not isinstance(fields.get("tool_name"), str):
+            return None
+        params = fields.get("params", {} if self.closed else None)
+        if not isinstance(params, dict):
+            return None
+        return fields["tool_name"], params
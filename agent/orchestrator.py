@@ -1,9 +1,31 @@
+import os
 import json
 import re
+import time
+import asyncio
+import hashlib
 from datetime import datetime
-from llm.groq_client import generate
+from llm.groq_client import generate, stream
 from tools.registry import registry
 from memory import save_message, get_history, save_summary, get_summary
+from semantic_memory import recall
+from tracing import span, current_span
+from deadline import check
+from agent.json_stream import DecisionParser
+from events import progress
+import metrics
+
+# Stream each step's response and start read-only tools as soon as their call is complete.
+AGENT_EARLY_DISPATCH = os.getenv("AGENT_EARLY_DISPATCH", "0") == "1"
+
+# Steps allowed per intent (classified from the first tool the model picks), not
+# counting steps that produce a new result — each of those earns one more, up to max_steps.
+STEP_BUDGETS = {"lookup": 2, "action": 3, "bulk": 4}
+# An identical call repeated this many times ends the run instead of looping on.
+MAX_REPEATS = 2
+# Handled by the loop itself: returns the full (unreduced) data behind a result_ref.
+EXPAND_RESULT = "expand_result"
+STUCK_REPLY = "Sorry — I couldn't finish that. Could you rephrase it or break it into smaller steps?"
 
 
 def extract_json(text: str):
@@ -21,44 +43,127 @@ def extract_json(text: str):
     return None
 
 
-async def run(prompt: str, session_id: str = "default"):
-    # Fetch history BEFORE saving current message to avoid duplication in prompt
-    history = get_history(session_id, limit=6)
-    summary = get_summary(session_id)
-    tools = registry.list_tools()
+def _reply(session_id: str, text: str, persist: bool = True) -> dict:
+    if persist:
+        save_message(session_id, "assistant", text)
+    return {"response": text}
 
-    # Save current message after fetching history
-    save_message(session_id, "user", prompt)
 
-    # Summarize every 20 messages instead of 10
-    all_history = get_history(session_id, limit=100)
-    if len(all_history) > 0 and len(all_history) % 20 == 0:
-        new_summary = await generate(f"Summarize this conversation in 3 sentences max:\n{all_history}")
-        save_summary(session_id, new_summary)
+def _discard(task: asyncio.Task):
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()  # mark retrieved so an unused failure is not logged
 
-    now = datetime.now()
-    current_time_str = now.strftime("%Y-%m-%d %H:%M")
-    current_time_readable = now.strftime("%A, %B %d %Y at %I:%M %p")
 
-    # Compact tool list — name + description + exact param names
-    compact_tools = [
-        {"name": t["name"], "desc": t["description"], "params": t.get("params", {})}
-        for t in tools
-    ]
+async def _stream_step(llm_stream, execute, prompt: str, session_id: str, step_span):
+    """Stream one step's response. Returns (text, early) where early is
+    (tool_name, params, task, dispatched_at) for a read-only tool already started."""
+    parser = DecisionParser()
+    chunks = []
+    early = None
+    try:
+        async for chunk in llm_stream(prompt, json_mode=True, session_id=session_id):
+            chunks.append(chunk)
+            if early is None:
+                parser.feed(chunk)
+                call = parser.tool_call()
+                if call and registry.is_read_only(call[0]):
+                    tool_name, params = call
+                    early = (tool_name, params, asyncio.create_task(execute(tool_name, params, session_id=session_id)), time.perf_counter())
+                    step_span.set(early_dispatch=tool_name)
+    except BaseException:
+        if early:
+            _discard(early[2])
+        raise
+    if early:
+        metrics.observe("agent.early_dispatch.overlap", (time.perf_counter() - early[3]) * 1000)
+    return "".join(chunks), early
 
-    system_prompt = f"""You are a concise AI productivity assistant called Agent Orchestration Platform.
-Current time: {current_time_readable} (reminder format: {current_time_str})
 
-Summary: {summary or "None"}
+def _fingerprint(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:16]
 
-Recent conversation:
-{json.dumps(history, indent=2)}
 
-Tools:
-{json.dumps(compact_tools, indent=2)}
+class _LoopGuard:
+    """Catches the model repeating itself and sizes the step budget to the request.
+
+    Calls are fingerprinted by (tool, params). Repeating a call whose result cannot
+    have changed — a write, or a read with no write since — is not executed again.
+    Results are fingerprinted too, so a re-run that returns the same thing counts
+    as a wasted step instead of progress.
+    """
+
+    def __init__(self, max_steps: int, run_span):
+        self.max_steps = max_steps
+        self.budget = max_steps
+        self.intent = None
+        self.wasted = 0
+        self.repeats = 0
+        self.last = None
+        self._run_span = run_span
+        self._calls = {}
+        self._results = set()
+        self._write_epoch = 0
+
+    def classify(self, tool_name: str):
+        if self.intent is not None:
+            return
+        if tool_name.startswith("bulk_"):
+            self.intent = "bulk"
+        elif registry.is_read_only(tool_name):
+            self.intent = "lookup"
+        else:
+            self.intent = "action"
+        self.budget = STEP_BUDGETS[self.intent]
+        self._run_span.set(intent=self.intent)
+
+    def repeat_of(self, tool_name: str, params: dict) -> int | None:
+        """Step number of an identical earlier call whose result cannot have changed."""
+        previous = self._calls.get(_fingerprint(tool_name, params))
+        if previous and (previous[1] == self._write_epoch or not registry.is_read_only(tool_name)):
+            return previous[0]
+        return None
+
+    def record(self, step: int, tool_name: str, params: dict, outcome: dict):
+        # Only a write that actually ran can change what a read returns. expand_result,
+        # unknown tool names and failed calls must not reset repeat detection.
+        tool = registry.get(tool_name)
+        value = outcome.get("result")
+        succeeded = outcome.get("success") and not (isinstance(value, dict) and value.get("success") is False)
+        if tool and not tool["read_only"] and succeeded:
+            self._write_epoch += 1
+        self._calls[_fingerprint(tool_name, params)] = (step, self._write_epoch)
+        self.last = (tool_name, params, outcome)
+
+        result = _fingerprint(tool_name, params, outcome.get("success"), outcome.get("result"), outcome.get("error"))
+        if result in self._results:
+            self.waste()
+        else:
+            self._results.add(result)
+            self.budget = min(self.max_steps, self.budget + 1)
+
+    def waste(self):
+        self.wasted += 1
+        metrics.incr("agent.wasted_steps")
+        self._run_span.set(wasted_steps=self.wasted)
+
+    def stuck_reply(self) -> str:
+        """Best answer when the loop is cut short: the last tool's own reply, if any."""
+        if self.last:
+            tool_name, params, outcome = self.last
+            reply = registry.render_reply(tool_name, params, outcome)
+            if reply:
+                return reply
+        return STUCK_REPLY
+
+
+# Everything that is the same for every request goes first, so the provider can
+# cache the prompt prefix; time, summary, history and the message follow it.
+SYSTEM_RULES = f"""You are a concise AI productivity assistant called Agent Orchestration Platform.
 
 Respond ONLY with valid JSON:
-Tool call: {{"action":"tool","tool_name":"...","params":{{}}}}
+Tool call: {{"action":"tool","tool_name":"...","params":{{}},"final":false}}
 Chat reply: {{"action":"chat","response":"..."}}
 
 RULES:
@@ -68,50 +173,226 @@ RULES:
 - For ambiguous requests, ask for clarification.
 - Always use tools — never answer from memory when a tool exists.
 - remind_at format: YYYY-MM-DD HH:MM
+- Long tool results are shortened: lists end with a "<name>_more" count and long text ends with "…". If you need what was cut, call {EXPAND_RESULT} with {{"ref": "<result_ref>", "path": "notes.2"}} (path optional).
+- Set "final": true only when this tool call alone completes the user's request (no lookup or further tool needed after it).
 
 STYLE: Be concise. "Done — marked complete." not "Todo with ID 5 has been marked as complete."
+
+Tools (name, desc, exact param names):
 """
 
-    current_prompt = system_prompt + f"\nUser: {prompt}"
+# Prefix text for a registry.catalog_version, and the sha of the prefix the previous run used.
+_prefix_cache = {"version": None, "text": "", "last_sha": None}
+
+
+def _stable_prefix() -> str:
+    """Rules plus tool catalog, rebuilt only when a tool is registered. Reports reuse."""
+    if _prefix_cache["version"] != registry.catalog_version:
+        _prefix_cache["text"] = SYSTEM_RULES + registry.catalog() + "\n"
+        _prefix_cache["version"] = registry.catalog_version
+    text = _prefix_cache["text"]
+
+    sha = hashlib.sha1(text.encode()).hexdigest()[:16]
+    reused = sha == _prefix_cache["last_sha"]
+    _prefix_cache["last_sha"] = sha
+    metrics.incr("agent.prompt_prefix.reused" if reused else "agent.prompt_prefix.changed")
+    current_span().set(prefix_chars=len(text), prefix_sha=sha, prefix_reused=reused)
+    return text
+
+
+def _compact_json(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _recalled_section(recalled: list) -> str:
+    if not recalled:
+        return ""
+    lines = "\n".join(f"- [{r['source']}, {(r['when'] or '')[:10]}] {r['text']}" for r in recalled)
+    return f"\nPossibly relevant from older conversations and notes:\n{lines}\n"
+
+
+def _expand_result(results: dict, params: dict) -> dict:
+    ref = params.get("ref")
+    if ref not in results:
+        return {"success": False, "error": f"No result with ref {ref!r}"}
+    value = results[ref].get("result")
+    path = str(params.get("path") or "")
+    for part in filter(None, path.split(".")):
+        try:
+            value = value[int(part)] if isinstance(value, list) else value[part]
+        except (KeyError, IndexError, ValueError, TypeError):
+            return {"success": False, "error": f"Path {path!r} not found in {ref}"}
+    return {"success": True, "result": value}
+
+
+def _load_context(prompt: str, session_id: str) -> dict:
+    # Fetch history BEFORE saving current message to avoid duplication in prompt
+    history = get_history(session_id, limit=6)
+    summary = get_summary(session_id)
+    # Older messages and notes relevant to this prompt, beyond the recent window
+    with span("agent.recall"):
+        recalled = recall(prompt, session_id, exclude=[m["content"] for m in history])
+
+    # Save current message after fetching history
+    save_message(session_id, "user", prompt)
+
+    # Summarize every 20 messages instead of 10
+    all_history = get_history(session_id, limit=100)
+    needs_summary = len(all_history) > 0 and len(all_history) % 20 == 0
+
+    return {
+        "history": history,
+        "summary": summary,
+        "recalled": recalled,
+        "summary_input": all_history if needs_summary else None,
+        "now": datetime.now().isoformat(),
+    }
+
+
+async def run(prompt: str, session_id: str = "default", tape=None):
+    """Run the agent loop. `tape` is an optional agent.recording Recorder or Replayer."""
+    llm = tape.generate if tape else generate
+    llm_stream = tape.stream if tape else stream
+    execute = tape.execute if tape else registry.execute
+    # A replay runs entirely off the recording and must not touch the database.
+    persist = not (tape and tape.replaying)
+
+    with span("agent.load_context", session_id=session_id):
+        # SQLite reads and recall: keep them off the event loop.
+        context = await asyncio.to_thread(_load_context, prompt, session_id) if persist else None
+        if tape:
+            context = tape.context(prompt, session_id, context)
+
+    history = context["history"]
+    summary = context["summary"]
+    if context["summary_input"]:
+        all_history = context["summary_input"]
+        with span("agent.summarize", messages=len(all_history)):
+            new_summary = await llm(
+                f"Summarize this conversation in 3 sentences max:\n{all_history}",
+                priority="background", session_id=session_id, purpose="conversation_summary",
+            )
+            if persist:
+                save_summary(session_id, new_summary)
+
+    now = datetime.fromisoformat(context["now"])
+    current_time_str = now.strftime("%Y-%m-%d %H:%M")
+    current_time_readable = now.strftime("%A, %B %d %Y at %I:%M %p")
+
+    current_prompt = _stable_prefix() + f"""
+Current time: {current_time_readable} (reminder format: {current_time_str})
+
+Summary: {summary or "None"}
+
+Recent conversation:
+{_compact_json(history)}
+{_recalled_section(context.get("recalled"))}
+User: {prompt}"""
+
     max_steps = 8
     tool_call_count = {}
+    guard = _LoopGuard(max_steps, current_span())
+    # Full tool results by result_ref; the prompt only gets the reduced form.
+    results = {}
 
     for step in range(max_steps):
-        response = await generate(current_prompt, json_mode=True)
-        decision = extract_json(response)
+        check()
+        if step >= guard.budget:
+            metrics.incr("agent.step_budget_exhausted")
+            current_span().set(step_budget_exhausted=True)
+            return _reply(session_id, guard.stuck_reply(), persist)
+        early = None
+        progress("thinking", step=step + 1)
+        with span("agent.step", step=step + 1, prompt_chars=len(current_prompt)) as step_span:
+            try:
+                if AGENT_EARLY_DISPATCH:
+                    response, early = await _stream_step(llm_stream, execute, current_prompt, session_id, step_span)
+                else:
+                    response = await llm(current_prompt, json_mode=True, session_id=session_id)
+                decision = extract_json(response)
+                step_span.set(action=decision.get("action") if decision else None)
+
+                if not decision:
+                    return _reply(session_id, response, persist)
+
+                if decision.get("action") == "tool":
+                    tool_name = decision.get("tool_name")
+                    params = decision.get("params", {})
+                    step_span.set(tool_name=tool_name)
+
+                    if not tool_name:
+                        break
 
-        if not decision:
-            save_message(session_id, "assistant", response)
-            return {"response": response}
+                    # Allow same tool up to 10 times (for bulk operations)
+                    count = tool_call_count.get(tool_name, 0)
+                    if count >= 10:
+                        break
 
-        if decision.get("action") == "tool":
-            tool_name = decision.get("tool_name")
-            params = decision.get("params", {})
+                    tool_call_count[tool_name] = count + 1
+                    if tool_name != EXPAND_RESULT:
+                        guard.classify(tool_name)
+
+                    repeated = guard.repeat_of(tool_name, params)
+                    if repeated is not None:
+                        step_span.set(repeat_of=repeated)
+                        guard.waste()
+                        guard.repeats += 1
+                        if guard.repeats >= MAX_REPEATS:
+                            metrics.incr("agent.loops_broken")
+                            return _reply(session_id, guard.stuck_reply(), persist)
+                        current_prompt += f"""
+Tool: {tool_name}
+Result: not run again — you already have this result from step {repeated} above.
+
+Do not repeat that call. Use the result you already have: call the next tool, or respond with a chat action.
+"""
+                        continue
 
-            if not tool_name:
-                break
+                    progress("tool", step=step + 1, tool_name=tool_name)
+                    if tool_name == EXPAND_RESULT:
+                        result = _expand_result(results, params)
+                    elif early and early[:2] == (tool_name, params):
+                        result = await early[2]
+                        early = None
+                        metrics.incr("agent.early_dispatch.used")
+                    else:
+                        result = await execute(tool_name, params, session_id=session_id)
+                    if tape and tool_name != EXPAND_RESULT:
+                        tape.accept(tool_name, params, result)
+                    guard.record(step + 1, tool_name, params, result)
+                    progress("tool_done", step=step + 1, tool_name=tool_name, success=result.get("success", True))
 
-            # Allow same tool up to 10 times (for bulk operations)
-            count = tool_call_count.get(tool_name, 0)
-            if count >= 10:
-                break
+                    # Write tools with a reply template answer locally instead of another LLM round-trip.
+                    if decision.get("final") is True:
+                        local_reply = registry.render_reply(tool_name, params, result)
+                        if local_reply:
+                            step_span.set(local_reply=True)
+                            metrics.incr("agent.local_replies")
+                            return _reply(session_id, local_reply, persist)
 
-            tool_call_count[tool_name] = count + 1
-            result = await registry.execute(tool_name, params)
+                    ref = f"r{step + 1}"
+                    results[ref] = result
+                    shown = registry.reduce(tool_name, result)
+                    if shown is not result:
+                        shown = {**shown, "result_ref": ref}
+                    shown = _compact_json(shown)
+                    step_span.set(result_chars=len(shown))
 
-            current_prompt += f"""
+                    current_prompt += f"""
 Tool: {tool_name}
-Result: {json.dumps(result, indent=2)}
+Result: {shown}
 
 If this was a list result (list_todos, get_notes, list_reminders) and the user asked to complete/delete/update an item, extract the correct ID from the result above and IMMEDIATELY call the appropriate action tool next. Do not respond with chat yet.
 If the task is fully complete, respond with a chat action summarizing what was done.
 """
-            continue
+                    continue
 
-        if decision.get("action") == "chat":
-            final = decision.get("response", response)
-            save_message(session_id, "assistant", final)
-            return {"response": final}
+                if decision.get("action") == "chat":
+                    return _reply(session_id, decision.get("response", response), persist)
+            finally:
+                # The final response did not confirm the speculative call; it was read-only, so just drop it.
+                if early:
+                    _discard(early[2])
+                    metrics.incr("agent.early_dispatch.discarded")
 
-    save_message(session_id, "assistant", response)
-    return {"response": response}
\ No newline at end of file
+    return _reply(session_id, response, persist)
@@ -0,0 +1,222 @@
+"""Record orchestrator runs and replay them offline.
+
+Recording: set RECORD_DIR and every /agent/run writes RECORD_DIR/<trace_id>.jsonl.gz
+containing the run's context, each LLM request/response and each tool call/result.
+
+Replay:
+    python -m agent.recording recordings/*.jsonl.gz --repeat 20
+
+re-runs each session through the current orchestrator code against the recorded LLM
+outputs and tool results — no network, no database writes — and reports wall and CPU
+time per run, plus any point where the new code diverged from the recording.
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+import asyncio
+import argparse
+from datetime import datetime
+from llm.groq_client import generate, stream
+from tools.registry import registry
+
+RECORD_DIR = os.getenv("RECORD_DIR", "")
+FORMAT_VERSION = 1
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def _canonical(params) -> str:
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+class ReplayDivergence(Exception):
+    pass
+
+
+class Recorder:
+    replaying = False
+
+    def __init__(self, path: str):
+        self.path = path
+        self.events = []
+        self._tool_ms = {}
+
+    def context(self, prompt: str, session_id: str, context: dict) -> dict:
+        self.events.append({
+            "type": "session",
+            "version": FORMAT_VERSION,
+            "recorded_at": datetime.utcnow().isoformat(),
+            "prompt": prompt,
+            "session_id": session_id,
+            "context": context,
+        })
+        return context
+
+    async def generate(self, prompt: str, **kwargs) -> str:
+        start = time.perf_counter()
+        response = await generate(prompt, **kwargs)
+        self.events.append({
+            "type": "llm",
+            "kwargs": kwargs,
+            "prompt_chars": len(prompt),
+            "prompt_sha": _digest(prompt),
+            "response": response,
+            "ms": round((time.perf_counter() - start) * 1000, 2),
+        })
+        return response
+
+    async def stream(self, prompt: str, **kwargs):
+        start = time.perf_counter()
+        chunks = []
+        async for chunk in stream(prompt, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        self.events.append({
+            "type": "llm",
+            "kwargs": kwargs,
+            "prompt_chars": len(prompt),
+            "prompt_sha": _digest(prompt),
+            "response": "".join(chunks),
+            "streamed": True,
+            "ms": round((time.perf_counter() - start) * 1000, 2),
+        })
+
+    async def execute(self, tool_name: str, params: dict, **kwargs) -> dict:
+        # Not recorded yet: a speculative (early-dispatched) call may be thrown away.
+        start = time.perf_counter()
+        result = await registry.execute(tool_name, params, **kwargs)
+        self._tool_ms[(tool_name, _canonical(params))] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    def accept(self, tool_name: str, params: dict, result: dict):
+        """The orchestrator used this tool result; it becomes part of the recording."""
+        self.events.append({
+            "type": "tool",
+            "tool_name": tool_name,
+            "params": params,
+            "result": result,
+            "ms": self._tool_ms.pop((tool_name, _canonical(params)), None),
+        })
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with gzip.open(self.path, "wt") as f:
+            for event in self.events:
+                f.write(json.dumps(event, separators=(",", ":"), default=str) + "\n")
+
+
+class Replayer:
+    replaying = True
+
+    def __init__(self, path: str):
+        with gzip.open(path, "rt") as f:
+            events = [json.loads(line) for line in f if line.strip()]
+        header = events[0]
+        if header.get("type") != "session":
+            raise ValueError(f"{path} is not a recording")
+        self.path = path
+        self.prompt = header["prompt"]
+        self.session_id = header["session_id"]
+        self._context = header["context"]
+        self._llm = [e for e in events if e["type"] == "llm"]
+        self._tools = [e for e in events if e["type"] == "tool"]
+        self.rewind()
+
+    def rewind(self):
+        self.llm_index = 0
+        self.tool_index = 0
+        self.prompt_mismatches = 0
+
+    def context(self, prompt: str, session_id: str, context: dict) -> dict:
+        return self._context
+
+    async def generate(self, prompt: str, **kwargs) -> str:
+        if self.llm_index >= len(self._llm):
+            raise ReplayDivergence(f"LLM call #{self.llm_index + 1} was not in the recording")
+        event = self._llm[self.llm_index]
+        self.llm_index += 1
+        if event["prompt_sha"] != _digest(prompt):
+            self.prompt_mismatches += 1
+        return event["response"]
+
+    async def stream(self, prompt: str, **kwargs):
+        # Chunk boundaries are not recorded; the whole response arrives as one chunk.
+        yield await self.generate(prompt, **kwargs)
+
+    async def execute(self, tool_name: str, params: dict, **kwargs) -> dict:
+        # Only accept() moves on, so a discarded speculative call does not use up an entry.
+        if self.tool_index >= len(self._tools):
+            raise ReplayDivergence(f"Tool call #{self.tool_index + 1} ({tool_name}) was not in the recording")
+        event = self._tools[self.tool_index]
+        if event["tool_name"] != tool_name or _canonical(event["params"]) != _canonical(params):
+            raise ReplayDivergence(
+                f"Tool call #{self.tool_index + 1}: recorded {event['tool_name']}({_canonical(event['params'])}), "
+                f"got {tool_name}({_canonical(params)})"
+            )
+        return event["result"]
+
+    def accept(self, tool_name: str, params: dict, result: dict):
+        self.tool_index += 1
+
+
+def recorder_for(run_id: str) -> Recorder | None:
+    """A Recorder writing to RECORD_DIR, or None when recording is off."""
+    if not RECORD_DIR:
+        return None
+    return Recorder(os.path.join(RECORD_DIR, f"{run_id}.jsonl.gz"))
+
+
+async def replay(path: str, repeat: int = 1) -> dict:
+    from agent.orchestrator import run
+
+    replayer = Replayer(path)
+    wall, cpu = [], []
+    for _ in range(repeat):
+        replayer.rewind()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        await run(replayer.prompt, replayer.session_id, tape=replayer)
+        wall.append((time.perf_counter() - wall_start) * 1000)
+        cpu.append((time.process_time() - cpu_start) * 1000)
+
+    return {
+        "recording": os.path.basename(path),
+        "llm_calls": len(replayer._llm),
+        "tool_calls": len(replayer._tools),
+        "prompt_mismatches": replayer.prompt_mismatches,
+        "wall_ms_mean": round(sum(wall) / len(wall), 3),
+        "wall_ms_min": round(min(wall), 3),
+        "cpu_ms_mean": round(sum(cpu) / len(cpu), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="+")
+    parser.add_argument("--repeat", type=int, default=1, help="replays per recording")
+    args = parser.parse_args()
+
+    import tools.catalog  # noqa: F401 — registers the tool catalog the prompt is built from
+
+    failed = False
+    for path in args.recordings:
+        try:
+            stats = asyncio.run(replay(path, args.repeat))
+        except ReplayDivergence as e:
+            failed = True
+            print(f"{os.path.basename(path)}: DIVERGED — {e}")
+            continue
+        print(
+            f"{stats['recording']}: {stats['llm_calls']} llm / {stats['tool_calls']} tool calls  "
+            f"wall {stats['wall_ms_mean']}ms (min {stats['wall_ms_min']})  cpu {stats['cpu_ms_mean']}ms  "
+            f"prompt mismatches {stats['prompt_mismatches']}"
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
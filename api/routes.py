@@ -1,18 +1,84 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import Optional
+import asyncio
+import hashlib
+import hmac
+import os
 import uuid
 
 from agent.orchestrator import run
+from agent.recording import recorder_for
 from memory import (
     get_chats, create_chat, rename_chat, delete_chat,
-    get_history, save_message
+    get_history, save_message, search_history,
+    get_chats_version, get_last_message_id,
 )
 from llm.groq_client import generate
+from tools.productivity import get_daily_summary
+from deadline import AGENT_DEADLINE_SECONDS, DeadlineExceeded, deadline, remaining
+from tracing import start_trace, get_trace, list_traces
+from profiling import SamplingProfiler, save_profile, load_profile
+import events
+import metrics
 
 router = APIRouter()
 
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def _is_admin(request: Request) -> bool:
+    token = request.headers.get("x-admin-token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def _require_debug_access(request: Request):
+    # Traces carry session ids and tool params: closed unless ADMIN_TOKEN is set and sent.
+    if not _is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+# Browsers may keep these, but must revalidate; the ETag makes that a 304.
+REVALIDATE = "no-cache"
+TOOLS_CACHE_CONTROL = "public, max-age=300"
+
+
+def _not_modified(request: Request, response: Response, etag: str, cache_control: str = REVALIDATE):
+    """Set ETag/Cache-Control; return a 304 response if the client already has this version, else None."""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    sent = request.headers.get("if-none-match", "")
+    # Weak comparison (RFC 9110): W/"x" matches "x".
+    tags = {tag.strip().removeprefix("W/") for tag in sent.split(",")}
+    if "*" in tags or etag.removeprefix("W/") in tags:
+        metrics.incr("http.not_modified")
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+async def _cancel_on_disconnect(request: Request, coro):
+    """Run coro, cancelling it if the client goes away (returns None) or the deadline passes."""
+    task = asyncio.create_task(coro)
+    try:
+        while True:
+            left = remaining()
+            timeout = DISCONNECT_POLL_SECONDS if left is None else max(0.0, min(DISCONNECT_POLL_SECONDS, left))
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                metrics.incr("agent.client_disconnected")
+                return None
+            if left is not None and left <= timeout:
+                raise DeadlineExceeded("Request deadline exceeded")
+    finally:
+        if not task.done():
+            task.cancel()
+
 
 class RunRequest(BaseModel):
     prompt: str
@@ -29,8 +95,47 @@ class RenameChatRequest(BaseModel):
     name: str
 
 @router.post("/agent/run")
-async def agent_run(req: RunRequest):
-    result = await run(req.prompt, req.session_id)
+async def agent_run(req: RunRequest, request: Request, response: Response, profile: bool = False):
+    profiler = None
+    if profile or request.headers.get("x-profile") == "1":
+        if not _is_admin(request):
+            raise HTTPException(status_code=403, detail="Profiling requires a valid X-Admin-Token")
+        profiler = SamplingProfiler()
+        profiler.start()
+
+    try:
+        with start_trace("agent.run", session_id=req.session_id, prompt_chars=len(req.prompt)) as trace:
+            recorder = recorder_for(trace.trace_id)
+            try:
+                with deadline(AGENT_DEADLINE_SECONDS):
+                    result = await _cancel_on_disconnect(
+                        request, run(req.prompt, req.session_id, tape=recorder)
+                    )
+                if result is None:
+                    trace.set(client_disconnected=True)
+                    # Nobody is listening; 499 is the conventional "client closed request".
+                    return Response(status_code=499)
+            except DeadlineExceeded:
+                trace.set(deadline_exceeded=True)
+                metrics.incr("agent.deadline_exceeded")
+                return JSONResponse(
+                    status_code=504,
+                    content={"response": "Sorry — that took too long. Please try again."},
+                    headers={"X-Trace-Id": trace.trace_id},
+                )
+            finally:
+                if recorder:
+                    recorder.save()
+    finally:
+        if profiler:
+            # Joins the sampling thread; keep that (and the file write below) off the event loop.
+            await asyncio.to_thread(profiler.stop)
+
+    response.headers["X-Trace-Id"] = trace.trace_id
+    if profiler:
+        result["profile"] = await asyncio.to_thread(
+            save_profile, trace.trace_id, profiler, get_trace(trace.trace_id)
+        )
     return result
 
 @router.post("/name-chat")
@@ -40,7 +145,7 @@ async def name_chat(req: NameRequest):
         f'"{req.prompt}". Reply with ONLY the title, no punctuation, no quotes.'
     )
     try:
-        name = await generate(prompt)
+        name = await generate(prompt, purpose="chat_title")
         name = name.strip()[:40]
     except Exception:
         name = req.prompt[:30]
@@ -48,12 +153,108 @@ async def name_chat(req: NameRequest):
 
     if req.session_id:
         rename_chat(req.session_id, name)
+        events.publish({"type": "chats_changed"})
 
     return {"name": name}
 
 
+# One socket per open chat: runs ({"type": "run", "id", "prompt"}), cancels, and server pushes.
+WS_MAX_RUNS = int(os.getenv("WS_MAX_RUNS", "2"))
+# A client that has not taken a message for this long is dropped (its buffer already sheds progress).
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+
+
+async def _ws_run(sub: events.Subscription, run_id, prompt: str, session_id: str):
+    with start_trace("agent.run", session_id=session_id, prompt_chars=len(prompt), transport="ws") as trace:
+        recorder = recorder_for(trace.trace_id)
+        try:
+            with deadline(AGENT_DEADLINE_SECONDS), \
+                    events.reporting_progress(lambda event: sub.put({**event, "id": run_id})):
+                result = await run(prompt, session_id, tape=recorder)
+            sub.put({"type": "result", "id": run_id, "trace_id": trace.trace_id, **result})
+        except DeadlineExceeded:
+            trace.set(deadline_exceeded=True)
+            metrics.incr("agent.deadline_exceeded")
+            sub.put({"type": "error", "id": run_id, "status": 504, "trace_id": trace.trace_id,
+                     "response": "Sorry — that took too long. Please try again."})
+        except asyncio.CancelledError:
+            trace.set(cancelled=True)
+            raise
+        except Exception as e:
+            print(f"WebSocket run {run_id} failed: {e}")
+            sub.put({"type": "error", "id": run_id, "status": 500, "trace_id": trace.trace_id,
+                     "response": "Sorry — something went wrong. Please try again."})
+        finally:
+            if recorder:
+                recorder.save()
+
+
+async def _ws_writer(websocket: WebSocket, sub: events.Subscription):
+    while True:
+        event = await sub.get()
+        await asyncio.wait_for(websocket.send_json(event), WS_SEND_TIMEOUT_SECONDS)
+
+
+@router.websocket("/ws/{session_id}")
+async def session_socket(websocket: WebSocket, session_id: str):
+    await websocket.accept()
+    sub = events.hub.subscribe(session_id)
+    writer = asyncio.create_task(_ws_writer(websocket, sub))
+    runs = {}  # run id -> task
+    metrics.incr("ws.connected")
+    try:
+        while True:
+            receive = asyncio.create_task(websocket.receive_json())
+            done, _ = await asyncio.wait({receive, writer}, return_when=asyncio.FIRST_COMPLETED)
+            if writer in done:
+                receive.cancel()
+                if isinstance(writer.exception(), asyncio.TimeoutError):
+                    metrics.incr("ws.slow_client")
+                    await websocket.close(code=1013)
+                break
+            message = receive.result()
+            kind = message.get("type") if isinstance(message, dict) else None
+            run_id = message.get("id") if kind else None
+
+            if kind == "run":
+                prompt = message.get("prompt")
+                if not isinstance(prompt, str) or not prompt.strip():
+                    sub.put({"type": "error", "id": run_id, "status": 422, "response": "prompt is required"})
+                elif run_id in runs:
+                    sub.put({"type": "error", "id": run_id, "status": 409, "response": "run id already in use"})
+                elif len(runs) >= WS_MAX_RUNS:
+                    metrics.incr("ws.busy")
+                    sub.put({"type": "error", "id": run_id, "status": 429,
+                             "response": "Still working on your previous messages — try again in a moment."})
+                else:
+                    task = asyncio.create_task(_ws_run(sub, run_id, prompt, session_id))
+                    runs[run_id] = task
+                    task.add_done_callback(lambda _, rid=run_id: runs.pop(rid, None))
+            elif kind == "cancel":
+                task = runs.get(run_id)
+                if task:
+                    task.cancel()
+                    metrics.incr("agent.cancelled")
+                    sub.put({"type": "cancelled", "id": run_id})
+            elif kind == "ping":
+                sub.put({"type": "pong", "id": run_id})
+            else:
+                sub.put({"type": "error", "id": run_id, "status": 400, "response": f"unknown message type: {kind}"})
+    except (WebSocketDisconnect, ValueError):
+        pass  # ValueError: a frame that is not JSON; treat like a broken client
+    finally:
+        for task in list(runs.values()):
+            task.cancel()
+        writer.cancel()
+        events.hub.unsubscribe(sub)
+        metrics.incr("ws.disconnected")
+
+
 @router.get("/chats")
-def list_chats():
+def list_chats(request: Request, response: Response):
+    not_modified = _not_modified(request, response, f'W/"c{get_chats_version()}"')
+    if not_modified:
+        return not_modified
     return get_chats()
 
 
@@ -61,23 +262,29 @@ def list_chats():
 def new_chat(req: CreateChatRequest):
     session_id = str(uuid.uuid4())
     create_chat(session_id, req.name)
+    events.publish({"type": "chats_changed"})
     return {"id": session_id, "name": req.name}
 
 
 @router.delete("/chats/{session_id}")
 def remove_chat(session_id: str):
     delete_chat(session_id)
+    events.publish({"type": "chats_changed"})
     return {"success": True}
 
 
 @router.put("/chats/{session_id}/rename")
 def rename(session_id: str, req: RenameChatRequest):
     rename_chat(session_id, req.name)
+    events.publish({"type": "chats_changed"})
     return {"success": True}
 
 
 @router.get("/chats/{session_id}/history")
-def chat_history(session_id: str):
+def chat_history(session_id: str, request: Request, response: Response):
+    not_modified = _not_modified(request, response, f'W/"h{get_last_message_id(session_id)}"')
+    if not_modified:
+        return not_modified
     history = get_history(session_id, limit=100)
     return [
         {"role": h["role"], "content": h["content"]}
@@ -86,7 +293,54 @@ def chat_history(session_id: str):
     ]
 
 
+@router.get("/search")
+def search(q: str, limit: int = 20, session_id: Optional[str] = None):
+    return search_history(q, limit=limit, session_id=session_id)
+
+
+@router.get("/summary/daily")
+def daily_summary():
+    return get_daily_summary()["daily_summary"]
+
+
 @router.get("/tools")
-def list_tools():
+def list_tools(request: Request, response: Response):
     from tools.registry import registry
-    return registry.list_tools()
\ No newline at end of file
+    # The catalog is cached by the registry; its hash changes only when the tool set does.
+    # Weak: GZipMiddleware may send this body gzipped or not under the same tag.
+    etag = f'W/"{hashlib.sha1(registry.catalog().encode()).hexdigest()[:16]}"'
+    not_modified = _not_modified(request, response, etag, TOOLS_CACHE_CONTROL)
+    if not_modified:
+        return not_modified
+    return registry.list_tools()
+
+
+@router.get("/debug/traces")
+def recent_traces(request: Request, limit: int = Query(50, ge=1, le=1000)):
+    _require_debug_access(request)
+    return list_traces(limit)
+
+
+@router.get("/debug/traces/{trace_id}")
+def trace_detail(trace_id: str, request: Request):
+    _require_debug_access(request)
+    trace = get_trace(trace_id)
+    if not trace:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace
+
+
+@router.get("/debug/metrics")
+def debug_metrics(request: Request):
+    _require_debug_access(request)
+    return metrics.snapshot()
+
+
+@router.get("/debug/profiles/{profile_id}")
+def profile_detail(profile_id: str, request: Request):
+    if not _is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    folded = load_profile(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(folded)
@@ -0,0 +1,289 @@
+"""Local stand-ins for Groq, Google Tasks/Calendar/Gmail and Slack.
+
+Run with: uvicorn benchmarks.fake_services:app --port 9100
+
+Configuration (env):
+  FAKE_GROQ_LATENCY_MS    mean latency of a chat completion (default 300)
+  FAKE_GROQ_JITTER_MS     uniform +/- jitter around the mean (default 100)
+  FAKE_GOOGLE_LATENCY_MS  latency of every Google/Slack call (default 80)
+  FAKE_GROQ_RPM           requests per minute before answering 429 (default 0 = unlimited)
+  FAKE_GROQ_TTFT_RATIO    share of the latency spent before the first streamed chunk (default 0.3)
+  FAKE_SCRIPT             path to a JSON script of agent responses (default: SCRIPT below)
+  FAKE_SEED               random seed so runs are reproducible (default 1)
+"""
+import os
+import json
+import uuid
+import time
+import random
+import asyncio
+from collections import deque
+from datetime import datetime, timedelta
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+
+GROQ_LATENCY_MS = float(os.getenv("FAKE_GROQ_LATENCY_MS", "300"))
+GROQ_JITTER_MS = float(os.getenv("FAKE_GROQ_JITTER_MS", "100"))
+GOOGLE_LATENCY_MS = float(os.getenv("FAKE_GOOGLE_LATENCY_MS", "80"))
+GROQ_RPM = int(os.getenv("FAKE_GROQ_RPM", "0"))
+GROQ_TTFT_RATIO = float(os.getenv("FAKE_GROQ_TTFT_RATIO", "0.3"))
+STREAM_CHUNK_CHARS = 8
+
+# Each rule maps a phrase in the user's message to the tool the "model" calls first.
+# Once a tool result is in the prompt, the model replies with a chat action.
+SCRIPT = {
+    "rules": [
+        {"match": "on my plate", "tool_name": "get_daily_summary", "params": {}},
+        {"match": "add these", "tool_name": "bulk_add_todos", "params": {
+            "tasks": [f"benchmark task {i}" for i in range(10)],
+        }, "final": True},
+        {"match": "my todos", "tool_name": "list_todos", "params": {}},
+        {"match": "focus", "tool_name": "get_priority_inbox", "params": {}},
+    ],
+    "final_response": "Done.",
+    "default_response": "Hi! How can I help?",
+}
+
+_rng = random.Random(int(os.getenv("FAKE_SEED", "1")))
+_tasks = {}
+_events = {}
+_groq_calls = deque()
+_last_prompt = {"text": ""}
+
+app = FastAPI(title="Benchmark fakes")
+
+
+def _load_script() -> dict:
+    path = os.getenv("FAKE_SCRIPT", "")
+    if path:
+        with open(path) as f:
+            return json.load(f)
+    return SCRIPT
+
+
+_script = _load_script()
+
+
+def _groq_latency() -> float:
+    jitter = _rng.uniform(-GROQ_JITTER_MS, GROQ_JITTER_MS)
+    return max(0.0, GROQ_LATENCY_MS + jitter) / 1000
+
+
+async def _groq_delay():
+    await asyncio.sleep(_groq_latency())
+
+
+async def _google_delay():
+    await asyncio.sleep(GOOGLE_LATENCY_MS / 1000)
+
+
+def _scripted_reply(prompt: str) -> str:
+    # Title generation, summaries etc. are not agent calls — answer with plain text.
+    if "Respond ONLY with valid JSON" not in prompt:
+        return "Benchmark summary"
+
+    user_part = prompt.rsplit("\nUser: ", 1)[-1]
+    if "\nTool: " in user_part:
+        return json.dumps({"action": "chat", "response": _script["final_response"]})
+
+    message = user_part.lower()
+    for rule in _script["rules"]:
+        if rule["match"] in message:
+            return json.dumps({"action": "tool", "tool_name": rule["tool_name"], "params": rule["params"],
+                               "final": rule.get("final", False)})
+    return json.dumps({"action": "chat", "response": _script["default_response"]})
+
+
+def _cached_prefix_chars(prompt: str) -> int:
+    """Emulate provider prompt caching: the prefix shared with the previous prompt is "cached"."""
+    previous, _last_prompt["text"] = _last_prompt["text"], prompt
+    return len(os.path.commonprefix([previous, prompt]))
+
+
+def _rate_limit_headers() -> dict:
+    """Sliding one-minute window, reported the way Groq does."""
+    if not GROQ_RPM:
+        return {}
+    now = time.monotonic()
+    while _groq_calls and now - _groq_calls[0] > 60:
+        _groq_calls.popleft()
+    reset = 60 - (now - _groq_calls[0]) if _groq_calls else 0
+    return {
+        "x-ratelimit-limit-requests": str(GROQ_RPM),
+        "x-ratelimit-remaining-requests": str(max(0, GROQ_RPM - len(_groq_calls))),
+        "x-ratelimit-reset-requests": f"{reset:.2f}s",
+    }
+
+
+# ── Groq ───────────────────────────────────────────────
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request, response: Response):
+    headers = _rate_limit_headers()
+    if GROQ_RPM and len(_groq_calls) >= GROQ_RPM:
+        headers["retry-after"] = str(round(float(headers["x-ratelimit-reset-requests"][:-1]), 2))
+        return Response(
+            content=json.dumps({"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}),
+            status_code=429, headers=headers, media_type="application/json",
+        )
+    _groq_calls.append(time.monotonic())
+    headers = _rate_limit_headers()
+    response.headers.update(headers)
+
+    payload = await request.json()
+    prompt = payload["messages"][-1]["content"]
+    content = _scripted_reply(prompt)
+    usage = {
+        "prompt_tokens": len(prompt) // 4,
+        "completion_tokens": len(content) // 4,
+        "total_tokens": (len(prompt) + len(content)) // 4,
+        "prompt_tokens_details": {"cached_tokens": _cached_prefix_chars(prompt) // 4},
+    }
+    if payload.get("stream"):
+        return StreamingResponse(
+            _stream_chunks(payload.get("model"), content, usage),
+            media_type="text/event-stream", headers=headers,
+        )
+
+    await _groq_delay()
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "model": payload.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": usage,
+    }
+
+
+async def _stream_chunks(model: str, content: str, usage: dict):
+    """Groq-style SSE: time to first chunk, then the rest of the latency spread over the chunks."""
+    latency = _groq_latency()
+    pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)] or [""]
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    await asyncio.sleep(latency * GROQ_TTFT_RATIO)
+    for i, piece in enumerate(pieces):
+        if i:
+            await asyncio.sleep(latency * (1 - GROQ_TTFT_RATIO) / len(pieces))
+        chunk = {"id": completion_id, "model": model,
+                 "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+    final = {"id": completion_id, "model": model,
+             "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"usage": usage}}
+    yield f"data: {json.dumps(final)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+# ── Google Tasks ───────────────────────────────────────
+@app.get("/tasks/v1/users/@me/lists")
+async def tasklists():
+    await _google_delay()
+    return {"items": [{"id": "bench-list", "title": "My Tasks"}]}
+
+
+@app.post("/tasks/v1/lists/{tasklist}/tasks")
+async def insert_task(tasklist: str, request: Request):
+    await _google_delay()
+    body = await request.json()
+    task = {"id": uuid.uuid4().hex, **body}
+    _tasks[task["id"]] = task
+    return task
+
+
+@app.get("/tasks/v1/lists/{tasklist}/tasks/{task_id}")
+async def get_task(tasklist: str, task_id: str):
+    await _google_delay()
+    return _tasks.get(task_id, {"id": task_id, "title": "unknown"})
+
+
+@app.put("/tasks/v1/lists/{tasklist}/tasks/{task_id}")
+async def update_task(tasklist: str, task_id: str, request: Request):
+    await _google_delay()
+    _tasks[task_id] = await request.json()
+    return _tasks[task_id]
+
+
+@app.delete("/tasks/v1/lists/{tasklist}/tasks/{task_id}")
+async def delete_task(tasklist: str, task_id: str):
+    await _google_delay()
+    _tasks.pop(task_id, None)
+    return Response(status_code=204)
+
+
+# ── Google Calendar ────────────────────────────────────
+def _sample_events() -> list:
+    start = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    return [
+        {
+            "id": f"evt{i}",
+            "summary": f"Benchmark meeting {i}",
+            "start": {"dateTime": (start + timedelta(hours=i + 1)).isoformat() + "Z"},
+            "end": {"dateTime": (start + timedelta(hours=i + 2)).isoformat() + "Z"},
+        }
+        for i in range(4)
+    ]
+
+
+@app.get("/calendar/v3/calendars/{calendar_id}/events")
+async def list_events():
+    await _google_delay()
+    return {"items": _sample_events() + list(_events.values())}
+
+
+@app.post("/calendar/v3/calendars/{calendar_id}/events")
+async def insert_event(calendar_id: str, request: Request):
+    await _google_delay()
+    event = {"id": uuid.uuid4().hex, **(await request.json())}
+    _events[event["id"]] = event
+    return {**event, "htmlLink": f"http://fake.calendar/{event['id']}"}
+
+
+@app.get("/calendar/v3/calendars/{calendar_id}/events/{event_id}")
+async def get_event(calendar_id: str, event_id: str):
+    await _google_delay()
+    return _events.get(event_id, {"id": event_id, "summary": "Benchmark meeting"})
+
+
+@app.put("/calendar/v3/calendars/{calendar_id}/events/{event_id}")
+async def update_event(calendar_id: str, event_id: str, request: Request):
+    await _google_delay()
+    _events[event_id] = {"id": event_id, **(await request.json())}
+    return _events[event_id]
+
+
+@app.delete("/calendar/v3/calendars/{calendar_id}/events/{event_id}")
+async def delete_event(calendar_id: str, event_id: str):
+    await _google_delay()
+    _events.pop(event_id, None)
+    return Response(status_code=204)
+
+
+# ── Gmail ──────────────────────────────────────────────
+@app.get("/gmail/v1/users/{user_id}/messages")
+async def list_messages(maxResults: int = 5):
+    await _google_delay()
+    return {"messages": [{"id": f"msg{i}", "threadId": f"thr{i}"} for i in range(maxResults)]}
+
+
+@app.post("/gmail/v1/users/{user_id}/messages/send")
+async def send_message():
+    await _google_delay()
+    return {"id": uuid.uuid4().hex, "labelIds": ["SENT"]}
+
+
+@app.get("/gmail/v1/users/{user_id}/messages/{message_id}")
+async def get_message(message_id: str):
+    await _google_delay()
+    return {
+        "id": message_id,
+        "snippet": "Lorem ipsum dolor sit amet " * 8,
+        "payload": {"headers": [
+            {"name": "From", "value": "Bench Sender <bench@example.com>"},
+            {"name": "Subject", "value": f"Benchmark subject {message_id}"},
+            {"name": "Date", "value": datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S +0000")},
+        ]},
+    }
+
+
+# ── Slack ──────────────────────────────────────────────
+@app.post("/slack")
+async def slack_webhook():
+    await _google_delay()
+    return Response(content="ok", media_type="text/plain")
@@ -0,0 +1,382 @@
+"""End-to-end latency/throughput benchmark for the API against local fakes.
+
+    python -m benchmarks.load                       # run all scenarios, write benchmarks/results/latest.json
+    python -m benchmarks.load --save-baseline       # also store the run as benchmarks/baseline.json
+    python -m benchmarks.load --compare             # fail if p95 regressed beyond --tolerance
+
+The app runs in a throwaway directory (its own memory.db and a fake google_token.json),
+with Groq, Google and Slack pointed at benchmarks.fake_services.
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+import sqlite3
+import subprocess
+from datetime import datetime, timedelta
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_EXAMPLE = os.path.join(REPO_ROOT, ".env.example")
+# Only these are inherited from the caller's environment; settings come from .env.example.
+# Per-tool timings are read back from /debug/traces, which needs the admin token.
+BENCH_ADMIN_TOKEN = "bench-admin"
+INHERITED_ENV = ("PATH", "HOME", "LANG", "LC_ALL", "TMPDIR", "TEMP", "TMP", "SYSTEMROOT", "VIRTUAL_ENV")
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+BASELINE_PATH = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+
+# name -> (method, path template, prompt). {session} is filled per request.
+SCENARIOS = {
+    "agent_run": ("POST", "/agent/run", "hello there"),
+    "agent_daily_summary": ("POST", "/agent/run", "what's on my plate today?"),
+    "agent_bulk_add": ("POST", "/agent/run", "add these tasks for the launch"),
+    "chat_history": ("GET", "/chats/{session}/history", None),
+}
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return round(ordered[rank], 2)
+
+
+def _latency_stats(latencies: list) -> dict:
+    return {
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+    }
+
+
+# ── Processes ──────────────────────────────────────────
+def _base_env() -> dict:
+    """A clean environment: the defaults from .env.example, never the developer's .env or shell settings."""
+    env = {k: os.environ[k] for k in INHERITED_ENV if k in os.environ}
+    with open(ENV_EXAMPLE) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#") and "=" in line:
+                key, _, value = line.partition("=")
+                env[key.strip()] = value.strip()
+    # Keys set above (even to "") already win over .env; this also skips the file entirely.
+    env["PYTHON_DOTENV_DISABLED"] = "1"
+    env["PYTHONPATH"] = REPO_ROOT
+    return env
+
+
+def _start(module_app: str, port: int, cwd: str, env: dict, log_path: str) -> subprocess.Popen:
+    # stderr goes to a file: a pipe nobody reads would block the server once it fills.
+    with open(log_path, "wb") as log:
+        return subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", module_app, "--port", str(port), "--log-level", "warning"],
+            cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, log_path: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        code = proc.poll()
+        if code is not None:
+            with open(log_path, errors="replace") as f:
+                output = f.read()[-4000:]
+            raise RuntimeError(f"{' '.join(proc.args[2:4])} exited with code {code} before {url} came up:\n{output}")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+# ── Data ───────────────────────────────────────────────
+def seed(db_path: str, args, rng: random.Random) -> list:
+    """Fill the app database with realistic volumes. Returns the seeded session ids."""
+    now = datetime.utcnow()
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+
+    sessions = [f"bench-{i}" for i in range(args.sessions)]
+    cur.executemany(
+        "INSERT INTO chats (id, name, created_at) VALUES (?, ?, ?)",
+        [(s, f"Bench chat {i}", now.isoformat()) for i, s in enumerate(sessions)],
+    )
+    cur.executemany(
+        "INSERT INTO history (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+        [
+            (s, "user" if m % 2 == 0 else "assistant", f"message {m} " + "lorem ipsum " * rng.randint(3, 40), now.isoformat())
+            for s in sessions
+            for m in range(args.messages_per_session)
+        ],
+    )
+
+    cur.executemany(
+        "INSERT INTO todos (task, priority, due_date, done, created_at) VALUES (?, ?, ?, ?, ?)",
+        [
+            (
+                f"seeded task {i}",
+                rng.choice(["low", "normal", "normal", "high"]),
+                (now + timedelta(days=rng.randint(-10, 30))).date().isoformat() if rng.random() < 0.6 else None,
+                1 if rng.random() < 0.3 else 0,
+                (now - timedelta(days=rng.randint(0, 60))).isoformat(),
+            )
+            for i in range(args.todos)
+        ],
+    )
+    cur.executemany(
+        "INSERT INTO notes (title, body, summary, tags, created_at) VALUES (?, ?, ?, ?, ?)",
+        [
+            (f"note {i}", "body text " * rng.randint(10, 150), "", rng.choice(["", "work", "home,ideas"]),
+             (now - timedelta(days=rng.randint(0, 60))).isoformat())
+            for i in range(args.notes)
+        ],
+    )
+    cur.executemany(
+        "INSERT INTO reminders (message, remind_at, recurrence, done, created_at) VALUES (?, ?, ?, ?, ?)",
+        [
+            (f"reminder {i}", (now + timedelta(days=rng.randint(1, 30))).strftime("%Y-%m-%d %H:%M"), "none", 0, now.isoformat())
+            for i in range(args.reminders)
+        ],
+    )
+    for h in range(args.habits):
+        cur.execute(
+            "INSERT INTO habits (name, frequency, created_at) VALUES (?, ?, ?)",
+            (f"habit {h}", "daily" if h % 4 else "weekly", (now - timedelta(days=365)).isoformat()),
+        )
+        habit_id = cur.lastrowid
+        cur.executemany(
+            "INSERT INTO habit_logs (habit_id, logged_date, created_at) VALUES (?, ?, ?)",
+            [
+                (habit_id, (now - timedelta(days=d)).date().isoformat(), now.isoformat())
+                for d in range(365) if rng.random() < 0.7
+            ],
+        )
+
+    conn.commit()
+    conn.close()
+    return sessions
+
+
+# ── Load generation ────────────────────────────────────
+async def run_scenario(client: httpx.AsyncClient, name: str, sessions: list, args, rng: random.Random) -> dict:
+    method, path, prompt = SCENARIOS[name]
+    latencies, trace_ids = [], []
+    errors = 0
+    remaining = 0
+
+    async def one(measure: bool):
+        nonlocal errors
+        session = rng.choice(sessions)
+        url = path.format(session=session)
+        start = time.perf_counter()
+        try:
+            if method == "POST":
+                resp = await client.post(url, json={"prompt": prompt, "session_id": session})
+            else:
+                resp = await client.get(url)
+            ok = resp.status_code == 200
+        except httpx.HTTPError:
+            resp, ok = None, False
+        elapsed = (time.perf_counter() - start) * 1000
+        if not measure:
+            return
+        if not ok:
+            errors += 1
+            return
+        latencies.append(elapsed)
+        if resp.headers.get("x-trace-id"):
+            trace_ids.append(resp.headers["x-trace-id"])
+
+    async def worker(measure: bool):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await one(measure)
+
+    remaining = args.warmup
+    await asyncio.gather(*(worker(False) for _ in range(args.concurrency)))
+
+    remaining = args.requests
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(True) for _ in range(args.concurrency)))
+    wall = time.perf_counter() - started
+
+    result = {
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": args.concurrency,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        **_latency_stats(latencies),
+    }
+    tools = await _tool_latencies(client, trace_ids)
+    if tools:
+        result["tools"] = tools
+    return result
+
+
+def _collect_spans(node: dict, name: str, out: list):
+    if node["name"] == name:
+        out.append(node)
+    for child in node.get("children", []):
+        _collect_spans(child, name, out)
+
+
+async def _tool_latencies(client: httpx.AsyncClient, trace_ids: list) -> dict:
+    """Per-tool latency, read back from the server's traces after the scenario."""
+    by_tool = {}
+    for trace_id in trace_ids:
+        resp = await client.get(f"/debug/traces/{trace_id}")
+        if resp.status_code != 200:
+            continue
+        spans = []
+        _collect_spans(resp.json(), "tool.execute", spans)
+        for s in spans:
+            by_tool.setdefault(s["attrs"].get("tool_name"), []).append(s["duration_ms"])
+    return {tool: {"calls": len(v), **_latency_stats(v)} for tool, v in by_tool.items()}
+
+
+# ── Baselines ──────────────────────────────────────────
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, stats in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if base[key] and stats[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}.{key}: {base[key]} -> {stats[key]}")
+        if base["throughput_rps"] and stats["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}.throughput_rps: {base['throughput_rps']} -> {stats['throughput_rps']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--messages-per-session", type=int, default=200)
+    parser.add_argument("--todos", type=int, default=2000)
+    parser.add_argument("--notes", type=int, default=500)
+    parser.add_argument("--reminders", type=int, default=100)
+    parser.add_argument("--habits", type=int, default=15)
+    parser.add_argument("--groq-latency-ms", type=float, default=300)
+    parser.add_argument("--groq-jitter-ms", type=float, default=100)
+    parser.add_argument("--google-latency-ms", type=float, default=80)
+    parser.add_argument("--groq-rpm", type=int, default=0, help="make the fake Groq answer 429 above this rate")
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression for --compare")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="agent-bench-")
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    with open(os.path.join(workdir, "google_token.json"), "w") as f:
+        json.dump({"token": "bench", "refresh_token": "bench", "client_id": "bench", "client_secret": "bench"}, f)
+
+    base_env = _base_env()
+    fake_env = {
+        **base_env,
+        "FAKE_GROQ_LATENCY_MS": str(args.groq_latency_ms),
+        "FAKE_GROQ_JITTER_MS": str(args.groq_jitter_ms),
+        "FAKE_GOOGLE_LATENCY_MS": str(args.google_latency_ms),
+        "FAKE_GROQ_RPM": str(args.groq_rpm),
+        "FAKE_SEED": str(args.seed),
+    }
+    app_env = {
+        **base_env,
+        "GROQ_API_KEY": "bench",
+        "GROQ_API_URL": f"{fake_url}/openai/v1/chat/completions",
+        "GOOGLE_API_ENDPOINT": f"{fake_url}/",
+        "SLACK_WEBHOOK_URL": f"{fake_url}/slack",
+        "ADMIN_TOKEN": BENCH_ADMIN_TOKEN,
+        "TRACE_BUFFER_SIZE": str(args.requests + args.warmup + 100),
+        "TRACE_FILE": "",
+    }
+
+    procs = []
+    fake_log = os.path.join(workdir, "fake_services.log")
+    app_log = os.path.join(workdir, "app.log")
+    try:
+        procs.append(_start("benchmarks.fake_services:app", args.fake_port, REPO_ROOT, fake_env, fake_log))
+        procs.append(_start("main:app", args.app_port, workdir, app_env, app_log))
+        _wait_ready(f"{fake_url}/docs", procs[0], fake_log)
+        _wait_ready(f"http://127.0.0.1:{args.app_port}/health", procs[1], app_log)
+
+        sessions = seed(os.path.join(workdir, "memory.db"), args, rng)
+
+        async def run_all():
+            limits = httpx.Limits(max_connections=args.concurrency * 2)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.app_port}", timeout=120, limits=limits,
+                                         headers={"X-Admin-Token": BENCH_ADMIN_TOKEN}) as client:
+                results = {}
+                for name in names:
+                    print(f"Running {name} ...", flush=True)
+                    results[name] = await run_scenario(client, name, sessions, args, rng)
+                return results
+
+        scenarios = asyncio.run(run_all())
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "save_baseline", "compare")},
+        "scenarios": scenarios,
+    }
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, stats in scenarios.items():
+        print(f"{name:<22} p50 {stats['p50_ms']:>8}ms  p95 {stats['p95_ms']:>8}ms  p99 {stats['p99_ms']:>8}ms  "
+              f"{stats['throughput_rps']:>7} req/s  errors {stats['errors']}")
+        for tool, t in stats.get("tools", {}).items():
+            print(f"    tool {tool:<20} p50 {t['p50_ms']:>8}ms  p95 {t['p95_ms']:>8}ms  calls {t['calls']}")
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {BASELINE_PATH}")
+
+    if args.compare:
+        if not os.path.exists(BASELINE_PATH):
+            sys.exit("No baseline found. Run with --save-baseline first.")
+        with open(BASELINE_PATH) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Micro-benchmarks for the storage and tool hot paths at different table sizes.
+
+    python -m benchmarks.micro                         # 1k, 100k and 1M rows
+    python -m benchmarks.micro --sizes 1000,100000 --ops list_todos,get_notes
+
+For each size a database is generated once (cached under benchmarks/data/) with that
+many rows in history, todos, notes and habit_logs. Every operation runs against a
+fresh copy of it, so destructive ones (save_message, clear_completed) stay comparable.
+Reported per op: ops/sec, mean latency, tracemalloc peak and blocks still held after the call.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import memory  # noqa: E402
+from tools import productivity  # noqa: E402
+
+DATA_DIR = os.path.join(REPO_ROOT, "benchmarks", "data")
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+DEFAULT_SIZES = "1000,100000,1000000"
+SESSIONS = 100
+HABITS = 50
+CHUNK = 50_000
+
+
+def _use_db(path: str):
+    memory.DB_PATH = path
+    productivity.DB_PATH = path
+
+
+def _chunks(rows_iter, size=CHUNK):
+    batch = []
+    for row in rows_iter:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate_db(path: str, rows: int, seed: int = 1):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    _use_db(path)
+    memory.init_db()
+    productivity.init_productivity_db()
+
+    conn = sqlite3.connect(path)
+    cur = conn.cursor()
+    ts = lambda days: (now - timedelta(days=days)).isoformat()  # noqa: E731
+
+    for batch in _chunks(
+        (f"s{i % SESSIONS}", "user" if i % 2 == 0 else "assistant", "message text " * rng.randint(2, 30), ts(rng.randint(0, 365)))
+        for i in range(rows)
+    ):
+        cur.executemany("INSERT INTO history (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)", batch)
+
+    for batch in _chunks(
+        (f"task {i}", rng.choice(["low", "normal", "high"]),
+         (now + timedelta(days=rng.randint(-30, 60))).date().isoformat() if rng.random() < 0.6 else None,
+         1 if rng.random() < 0.5 else 0, ts(rng.randint(0, 365)))
+        for i in range(rows)
+    ):
+        cur.executemany("INSERT INTO todos (task, priority, due_date, done, created_at) VALUES (?, ?, ?, ?, ?)", batch)
+
+    for batch in _chunks(
+        (f"note {i}", "note body words " * rng.randint(5, 60), "", rng.choice(["", "work", "home,ideas"]), ts(rng.randint(0, 365)))
+        for i in range(rows)
+    ):
+        cur.executemany("INSERT INTO notes (title, body, summary, tags, created_at) VALUES (?, ?, ?, ?, ?)", batch)
+
+    cur.executemany(
+        "INSERT INTO habits (name, frequency, created_at) VALUES (?, ?, ?)",
+        [(f"habit {h}", "daily", ts(3650)) for h in range(HABITS)],
+    )
+    for batch in _chunks(
+        (i % HABITS + 1, (now - timedelta(days=i // HABITS)).date().isoformat(), ts(0))
+        for i in range(rows)
+    ):
+        cur.executemany("INSERT INTO habit_logs (habit_id, logged_date, created_at) VALUES (?, ?, ?)", batch)
+
+    conn.commit()
+    conn.close()
+
+
+def _connect_only():
+    sqlite3.connect(memory.DB_PATH).close()
+
+
+# name -> (callable, destructive). Destructive ops get a fresh database copy per call.
+OPS = {
+    "sqlite3.connect": (_connect_only, False),
+    "get_history": (lambda: memory.get_history("s1", limit=6), False),
+    "get_history_100": (lambda: memory.get_history("s1", limit=100), False),
+    "search_history": (lambda: memory.search_history("message text"), False),
+    "save_message": (lambda: memory.save_message("s1", "user", "benchmark message"), False),
+    "list_todos": (productivity.list_todos, False),
+    "get_priority_inbox": (productivity.get_priority_inbox, False),
+    "get_habits": (productivity.get_habits, False),
+    "get_notes": (productivity.get_notes, False),
+    "get_notes_keyword": (lambda: productivity.get_notes(keyword="words 42"), False),
+    "get_weekly_review": (productivity.get_weekly_review, False),
+    "get_review_year": (lambda: productivity.get_review("year"), False),
+    "clear_completed": (productivity.clear_completed, True),
+}
+
+
+def measure(op, destructive: bool, template: str, workdir: str, min_time: float, max_iters: int) -> dict:
+    work_db = os.path.join(workdir, "work.db")
+    shutil.copy(template, work_db)
+    _use_db(work_db)
+
+    # Allocation profile of a single call (its own warm copy for destructive ops).
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = op()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    retained = sum(s.count_diff for s in after.compare_to(before, "filename") if s.count_diff > 0)
+    del result
+
+    iterations, elapsed = 0, 0.0
+    while iterations < max_iters and (elapsed < min_time or iterations == 0):
+        if destructive:
+            shutil.copy(template, work_db)
+        start = time.perf_counter()
+        op()
+        elapsed += time.perf_counter() - start
+        iterations += 1
+
+    return {
+        "iterations": iterations,
+        "ops_per_sec": round(iterations / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(elapsed / iterations * 1000, 3),
+        "peak_kib": round(peak / 1024, 1),
+        "retained_blocks": retained,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated row counts")
+    parser.add_argument("--ops", default=",".join(OPS), help="comma separated subset of: " + ", ".join(OPS))
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds to spend per op and size")
+    parser.add_argument("--max-iters", type=int, default=10_000)
+    parser.add_argument("--regenerate", action="store_true", help="rebuild cached databases")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "micro.json"))
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    ops = [o.strip() for o in args.ops.split(",") if o.strip()]
+    unknown = [o for o in ops if o not in OPS]
+    if unknown:
+        parser.error(f"unknown ops: {', '.join(unknown)}")
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    workdir = os.path.join(DATA_DIR, "work")
+    os.makedirs(workdir, exist_ok=True)
+
+    results = {}
+    for size in sizes:
+        template = os.path.join(DATA_DIR, f"bench_{size}.db")
+        if args.regenerate or not os.path.exists(template):
+            if os.path.exists(template):
+                os.remove(template)
+            print(f"Generating {size:,}-row database ...", flush=True)
+            generate_db(template, size)
+
+        results[size] = {}
+        for name in ops:
+            func, destructive = OPS[name]
+            stats = measure(func, destructive, template, workdir, args.min_time, args.max_iters)
+            results[size][name] = stats
+            print(f"{size:>9,} rows  {name:<20} {stats['ops_per_sec']:>11} ops/s  {stats['mean_ms']:>10} ms  "
+                  f"peak {stats['peak_kib']:>9} KiB  retained {stats['retained_blocks']:>8} blocks", flush=True)
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"created_at": datetime.utcnow().isoformat(), "results": results}, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import time
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+AGENT_DEADLINE_SECONDS = float(os.getenv("AGENT_DEADLINE_SECONDS", "60"))
+
+# Absolute time.monotonic() by which the current request must finish, or None.
+_deadline = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Set a deadline for everything awaited inside this block (and tasks it spawns)."""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """Seconds left before the deadline, or None when no deadline is set."""
+    at = _deadline.get()
+    if at is None:
+        return None
+    return at - time.monotonic()
+
+
+def check():
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+def clip(timeout: float) -> float:
+    """Shorten a per-call timeout so it never outlives the request deadline."""
+    left = remaining()
+    if left is None:
+        return timeout
+    return max(0.001, min(timeout, left))
+
+
+async def within(awaitable):
+    """Await something, cancelling it and raising DeadlineExceeded if the deadline passes first."""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded("Request deadline exceeded")
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        if remaining() > 0:
+            raise
+        raise DeadlineExceeded("Request deadline exceeded") from None
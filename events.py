@@ -0,0 +1,129 @@
+"""Server push: an in-process hub fanning events out to WebSocket subscribers.
+
+publish() may be called from any thread (scheduler jobs, tools running in worker
+threads); delivery hops onto each subscriber's event loop. Every subscriber has a
+bounded buffer. When a client reads too slowly, the oldest droppable event
+(progress and other informational pushes) is discarded, and the client gets a
+{"type": "dropped"} marker in its place. Run results, errors and reminders are
+never dropped.
+"""
+import os
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+import metrics
+
+EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", "100"))
+
+DROPPABLE = frozenset({"progress", "summary_ready", "google_sync", "chats_changed"})
+
+
+class Subscription:
+    """One connection's buffered event stream. put() and get() run on its loop."""
+
+    def __init__(self, session_id: str, maxsize: int = EVENTS_BUFFER_SIZE):
+        self.session_id = session_id
+        self.loop = asyncio.get_running_loop()
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._events = deque()
+        self._ready = asyncio.Event()
+
+    def put(self, event: dict):
+        if len(self._events) >= self.maxsize:
+            self._drop_oldest()
+        self._events.append(event)
+        self._ready.set()
+
+    def _drop_oldest(self):
+        for i, queued in enumerate(self._events):
+            if queued.get("type") in DROPPABLE:
+                del self._events[i]
+                self.dropped += 1
+                metrics.incr("events.dropped")
+                return
+        # Nothing droppable: go over the limit rather than lose a result.
+
+    async def get(self) -> dict:
+        while not self._events:
+            self._ready.clear()
+            await self._ready.wait()
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            return {"type": "dropped", "count": dropped}
+        return self._events.popleft()
+
+
+class EventHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # session_id -> set of Subscription
+
+    def subscribe(self, session_id: str) -> Subscription:
+        sub = Subscription(session_id)
+        with self._lock:
+            self._subscribers.setdefault(session_id, set()).add(sub)
+        metrics.incr("events.subscribed")
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subscribers.get(sub.session_id)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.session_id]
+
+    def count(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def publish(self, event: dict, session_id: str = None) -> int:
+        """Send event to one session's subscribers, or to everyone. Returns how many it reached."""
+        with self._lock:
+            if session_id is None:
+                targets = [sub for subs in self._subscribers.values() for sub in subs]
+            else:
+                targets = list(self._subscribers.get(session_id, ()))
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for sub in targets:
+            if sub.loop is running:
+                sub.put(event)
+            else:
+                try:
+                    sub.loop.call_soon_threadsafe(sub.put, event)
+                except RuntimeError:
+                    pass  # loop closed during shutdown
+        if targets:
+            metrics.incr(f"events.published.{event.get('type', 'unknown')}")
+        return len(targets)
+
+
+hub = EventHub()
+publish = hub.publish
+metrics.register_gauge("events.subscribers", hub.count)
+
+
+# Progress of the current agent run, for transports that can stream it (the WebSocket).
+_progress = contextvars.ContextVar("progress", default=None)
+
+
+@contextmanager
+def reporting_progress(emit):
+    """Within this block (and tasks/threads started from it), progress() calls emit(event)."""
+    token = _progress.set(emit)
+    try:
+        yield
+    finally:
+        _progress.reset(token)
+
+
+def progress(stage: str, **data):
+    emit = _progress.get()
+    if emit:
+        emit({"type": "progress", "stage": stage, **data})
@@ -11,6 +11,7 @@ export default function App() {
     activeChat,
     activeMessages,
     loading,
+    progress,
     createChat,
     renameChat,
     deleteChat,
@@ -33,6 +34,7 @@ export default function App() {
           chat={activeChat}
           messages={activeMessages}
           loading={loading}
+          progress={progress}
           onSend={sendMessage}
         />
         <ChatInput
@@ -8,7 +8,7 @@ const SUGGESTIONS = [
   "Set a reminder for tomorrow",
 ]
 
-export default function ChatWindow({ chat, messages, loading, onSend }) {
+export default function ChatWindow({ chat, messages, loading, progress, onSend }) {
   const bottomRef = useRef(null)
 
   useEffect(() => {
@@ -54,7 +54,7 @@ export default function ChatWindow({ chat, messages, loading, onSend }) {
             ))}
             {loading && (
               <div className={`${styles.msgWrap} ${styles.assistant}`}>
-                <div className={styles.label}>Agent</div>
+                <div className={styles.label}>Agent{progress ? ` · ${progress}` : ''}</div>
                 <div className={styles.thinking}>
                   <span /><span /><span />
                 </div>
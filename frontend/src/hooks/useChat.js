@@ -2,12 +2,57 @@ import { useState, useEffect, useCallback, useRef } from 'react'
 
 const API = ''
 
+// url -> { etag, data }. Repeat GETs send If-None-Match and reuse data on 304.
+const etagCache = new Map()
+
+async function getJSON(url) {
+  const cached = etagCache.get(url)
+  const res = await fetch(url, {
+    headers: cached ? { 'If-None-Match': cached.etag } : {},
+    // Let our own cache handle revalidation; a 304 must reach this code.
+    cache: 'no-store',
+  })
+  if (res.status === 304 && cached) return cached.data
+  if (!res.ok) throw new Error(`GET ${url} failed: ${res.status}`)
+  const data = await res.json()
+  const etag = res.headers.get('ETag')
+  if (etag) etagCache.set(url, { etag, data })
+  return data
+}
+
+// One WebSocket per chat with a run in flight or on screen: agent runs, their
+// progress, and server pushes (reminders, chat list changes). POST /agent/run
+// remains the fallback while a socket is down.
+const WS_RECONNECT_MAX_MS = 10000
+
+function socketURL(sessionId) {
+  const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws'
+  return `${scheme}://${window.location.host}${API}/ws/${sessionId}`
+}
+
+// A socket run whose socket closed before the reply arrived. The server may have
+// saved the message and run tools, so it is never resent.
+class RunInterrupted extends Error {}
+
+const PROGRESS_LABELS = {
+  thinking: () => 'thinking',
+  tool: e => `running ${e.tool_name}`,
+  tool_done: e => `${e.tool_name} ${e.success === false ? 'failed' : 'done'}`,
+}
+
 export function useChat() {
   const [chats, setChats] = useState([])
   const [activeId, setActiveId] = useState(null)
   const [messages, setMessages] = useState({})
   const [loading, setLoading] = useState(false)
+  const [progress, setProgress] = useState(null)
   const initialized = useRef(false)
+  const activeRef = useRef(null)
+  const sockets = useRef(new Map())   // session id -> { ws, retries, timer }
+  const pending = useRef(new Map())   // run id -> { sessionId, resolve, reject }
+  const nextRunId = useRef(1)
+
+  activeRef.current = activeId
 
   useEffect(() => {
     if (!initialized.current) {
@@ -16,10 +61,129 @@ export function useChat() {
     }
   }, [])
 
+  const refreshChats = async () => {
+    try {
+      setChats(await getJSON(`${API}/chats`))
+    } catch (_) {}
+  }
+
+  const handleEvent = (sessionId, event) => {
+    const run = event.id != null ? pending.current.get(event.id) : null
+    switch (event.type) {
+      case 'progress':
+        if (run && sessionId === activeRef.current) {
+          setProgress((PROGRESS_LABELS[event.stage] || (() => event.stage))(event))
+        }
+        break
+      case 'result':
+      case 'error':
+      case 'cancelled':
+        if (run) {
+          pending.current.delete(event.id)
+          run.resolve(event)
+        }
+        break
+      case 'reminder':
+        // Pushed to every socket; show it once, in the chat on screen.
+        if (sessionId === activeRef.current) {
+          setMessages(prev => ({
+            ...prev,
+            [sessionId]: [...(prev[sessionId] || []), { role: 'assistant', content: `Reminder: ${event.message}` }]
+          }))
+        }
+        break
+      case 'chats_changed':
+        if (sessionId === activeRef.current) refreshChats()
+        break
+      default:
+        break
+    }
+  }
+
+  const openSocket = (sessionId) => {
+    const existing = sockets.current.get(sessionId)
+    if (existing?.ws && existing.ws.readyState <= WebSocket.OPEN) return existing.ws
+    const entry = existing || { retries: 0, timer: null }
+    const ws = new WebSocket(socketURL(sessionId))
+    entry.ws = ws
+    sockets.current.set(sessionId, entry)
+
+    ws.onopen = () => { entry.retries = 0 }
+    ws.onmessage = (msg) => {
+      try {
+        handleEvent(sessionId, JSON.parse(msg.data))
+      } catch (e) {
+        console.error('Bad socket message', e)
+      }
+    }
+    ws.onclose = () => {
+      // The server cancels a socket's runs when it closes, possibly part-way through.
+      for (const [id, run] of pending.current) {
+        if (run.sessionId === sessionId) {
+          pending.current.delete(id)
+          run.reject(new RunInterrupted('socket closed during run'))
+        }
+      }
+      if (sockets.current.get(sessionId) !== entry || entry.ws !== ws) return
+      entry.ws = null
+      if (sessionId !== activeRef.current) {
+        sockets.current.delete(sessionId)
+        return
+      }
+      const delay = Math.min(WS_RECONNECT_MAX_MS, 500 * 2 ** entry.retries++)
+      entry.timer = setTimeout(() => {
+        if (sessionId === activeRef.current) openSocket(sessionId)
+        else sockets.current.delete(sessionId)
+      }, delay)
+    }
+    return ws
+  }
+
+  // Keep a socket for the chat on screen; close others once their runs have finished.
+  useEffect(() => {
+    if (activeId) openSocket(activeId)
+    for (const [sessionId, entry] of sockets.current) {
+      if (sessionId === activeId) continue
+      const busy = [...pending.current.values()].some(run => run.sessionId === sessionId)
+      if (!busy) {
+        clearTimeout(entry.timer)
+        sockets.current.delete(sessionId)
+        entry.ws?.close()
+      }
+    }
+  }, [activeId])
+
+  useEffect(() => () => {
+    for (const entry of sockets.current.values()) {
+      clearTimeout(entry.timer)
+      entry.ws?.close()
+    }
+    sockets.current.clear()
+  }, [])
+
+  const runOverSocket = (ws, sessionId, prompt) => new Promise((resolve, reject) => {
+    const id = nextRunId.current++
+    pending.current.set(id, { sessionId, resolve, reject })
+    ws.send(JSON.stringify({ type: 'run', id, prompt }))
+  })
+
+  const runAgent = async (prompt, sessionId) => {
+    const ws = sockets.current.get(sessionId)?.ws
+    if (ws?.readyState === WebSocket.OPEN) {
+      // No HTTP retry if this fails: the run may already have had side effects.
+      return runOverSocket(ws, sessionId, prompt)
+    }
+    const res = await fetch(`${API}/agent/run`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ prompt, session_id: sessionId })
+    })
+    return res.json()
+  }
+
   const loadChats = async () => {
     try {
-      const res = await fetch(`${API}/chats`)
-      const data = await res.json()
+      const data = await getJSON(`${API}/chats`)
       if (data.length === 0) {
         // No chats exist — create a default one
         const createRes = await fetch(`${API}/chats`, {
@@ -35,8 +199,7 @@ export function useChat() {
         setChats(data)
         const first = data[0]
         setActiveId(first.id)
-        const histRes = await fetch(`${API}/chats/${first.id}/history`)
-        const histData = await histRes.json()
+        const histData = await getJSON(`${API}/chats/${first.id}/history`)
         setMessages({ [first.id]: histData })
       }
     } catch (e) {
@@ -84,8 +247,7 @@ export function useChat() {
           const next = remaining[0] || null
           setActiveId(next?.id || null)
           if (next) {
-            fetch(`${API}/chats/${next.id}/history`)
-              .then(r => r.json())
+            getJSON(`${API}/chats/${next.id}/history`)
               .then(data => setMessages(prev2 => ({ ...prev2, [next.id]: data })))
               .catch(() => {})
           }
@@ -105,10 +267,10 @@ export function useChat() {
   const switchChat = useCallback(async (id) => {
     if (id === activeId) return
     setActiveId(id)
-    // Always fetch fresh from server — never trust stale local state
+    // Always revalidate with the server — never trust stale local state.
+    // Unchanged history comes back as a 304 with no body.
     try {
-      const res = await fetch(`${API}/chats/${id}/history`)
-      const data = await res.json()
+      const data = await getJSON(`${API}/chats/${id}/history`)
       setMessages(prev => ({ ...prev, [id]: data }))
     } catch (e) {
       setMessages(prev => ({ ...prev, [id]: [] }))
@@ -144,23 +306,34 @@ export function useChat() {
     setLoading(true)
 
     try {
-      const res = await fetch(`${API}/agent/run`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ prompt, session_id: sessionId })
-      })
-      const data = await res.json()
+      const data = await runAgent(prompt, sessionId)
       setMessages(prev => ({
         ...prev,
         [sessionId]: [...(prev[sessionId] || []), { role: 'assistant', content: data.response || 'Something went wrong.' }]
       }))
     } catch (e) {
-      setMessages(prev => ({
-        ...prev,
-        [sessionId]: [...(prev[sessionId] || []), { role: 'assistant', content: 'Could not reach agent. Is the server running?' }]
-      }))
+      if (e instanceof RunInterrupted) {
+        // Show what the server actually saved, then say what happened.
+        let history = null
+        try {
+          history = await getJSON(`${API}/chats/${sessionId}/history`)
+        } catch (_) {}
+        setMessages(prev => ({
+          ...prev,
+          [sessionId]: [...(history || prev[sessionId] || []), {
+            role: 'assistant',
+            content: 'Lost the connection while working on that. Some steps may already be done — check before sending it again.'
+          }]
+        }))
+      } else {
+        setMessages(prev => ({
+          ...prev,
+          [sessionId]: [...(prev[sessionId] || []), { role: 'assistant', content: 'Could not reach agent. Is the server running?' }]
+        }))
+      }
     } finally {
       setLoading(false)
+      setProgress(null)
     }
   }, [activeId, loading, messages])
 
@@ -170,6 +343,7 @@ export function useChat() {
     activeChat: chats.find(c => c.id === activeId),
     activeMessages: messages[activeId] || [],
     loading,
+    progress,
     createChat,
     renameChat,
     deleteChat,
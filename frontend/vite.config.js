@@ -13,6 +13,9 @@ export default defineConfig({
       '/tools': 'http://localhost:8000',
       '/health': 'http://localhost:8000',
       '/auth': 'http://localhost:8000',
+      '/search': 'http://localhost:8000',
+      '/summary': 'http://localhost:8000',
+      '/ws': { target: 'ws://localhost:8000', ws: true },
     }
   },
   build: {
@@ -0,0 +1,179 @@
+import re
+import time
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from collections import OrderedDict, deque
+
+PRIORITIES = ("interactive", "background")
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+
+
+def parse_reset(value: str) -> float:
+    """Groq reset headers look like '2m59.56s', '7.66s' or '120ms'. Returns seconds."""
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    return sum(float(n) * _UNIT_SECONDS[unit] for n, unit in _DURATION_PART.findall(value))
+
+
+def parse_retry_after(value: str) -> float:
+    """Retry-After is delay-seconds or an HTTP-date (RFC 9110). Returns seconds; 0 if absent or unreadable."""
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return 0.0
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimitGovernor:
+    """Client-side admission control for Groq calls.
+
+    Callers wait in per-session queues; interactive waiters are always admitted
+    before background ones, and sessions within a priority are served round-robin
+    so one chatty session cannot starve the rest. A call is admitted while fewer
+    than `max_concurrency` are in flight and the last seen x-ratelimit-* headers
+    say there is request and token budget left; otherwise it waits for the reset.
+    """
+
+    def __init__(self, max_concurrency: int = 4):
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.remaining_requests = None
+        self.remaining_tokens = None
+        self.requests_reset_at = 0.0
+        self.tokens_reset_at = 0.0
+        self.blocked_until = 0.0
+        self._queues = {p: OrderedDict() for p in PRIORITIES}
+        self._timer = None
+
+    def queued(self) -> int:
+        return sum(len(q) for queues in self._queues.values() for q in queues.values())
+
+    async def acquire(self, session_key: str, priority: str = "interactive", tokens: int = 0) -> float:
+        """Wait for a slot. Returns the time spent queued, in ms."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._queues.get(priority, self._queues["interactive"])
+        queue.setdefault(session_key, deque()).append((future, tokens))
+        start = time.perf_counter()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        return (time.perf_counter() - start) * 1000
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """Take a slot only if one is free right now and nobody is queued for it."""
+        if self.in_flight >= self.max_concurrency or self.queued() or self._budget_wait(tokens) > 0:
+            return False
+        self._take(tokens)
+        return True
+
+    def release(self):
+        self.in_flight = max(0, self.in_flight - 1)
+        self._dispatch()
+
+    def update(self, headers):
+        """Refresh the budget from a Groq response's rate-limit headers."""
+        now = time.monotonic()
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        if remaining is not None:
+            self.remaining_requests = int(float(remaining))
+            self.requests_reset_at = now + parse_reset(headers.get("x-ratelimit-reset-requests", ""))
+        remaining = headers.get("x-ratelimit-remaining-tokens")
+        if remaining is not None:
+            self.remaining_tokens = int(float(remaining))
+            self.tokens_reset_at = now + parse_reset(headers.get("x-ratelimit-reset-tokens", ""))
+        self._dispatch()
+
+    def penalize(self, retry_after: float):
+        """Stop admitting anything until retry_after seconds from now (after a 429)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def state(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued(),
+            "remaining_requests": self.remaining_requests,
+            "remaining_tokens": self.remaining_tokens,
+            "blocked_for_s": round(max(0.0, self.blocked_until - time.monotonic()), 2),
+        }
+
+    def _budget_wait(self, tokens: int) -> float:
+        """Seconds until a call needing `tokens` may start, 0 if it may start now."""
+        now = time.monotonic()
+        if now >= self.requests_reset_at:
+            self.remaining_requests = None
+        if now >= self.tokens_reset_at:
+            self.remaining_tokens = None
+
+        wait = max(0.0, self.blocked_until - now)
+        if self.remaining_requests is not None and self.remaining_requests <= 0:
+            wait = max(wait, self.requests_reset_at - now)
+        if self.remaining_tokens is not None and self.remaining_tokens < tokens:
+            wait = max(wait, self.tokens_reset_at - now)
+        return wait
+
+    def _next_waiter(self):
+        for priority in PRIORITIES:
+            queues = self._queues[priority]
+            while queues:
+                session_key, waiters = next(iter(queues.items()))
+                while waiters and waiters[0][0].cancelled():
+                    waiters.popleft()
+                if not waiters:
+                    del queues[session_key]
+                    continue
+                return queues, session_key, waiters
+        return None
+
+    def _dispatch(self):
+        while self.in_flight < self.max_concurrency:
+            picked = self._next_waiter()
+            if picked is None:
+                return
+            queues, session_key, waiters = picked
+            future, tokens = waiters[0]
+
+            wait = self._budget_wait(tokens)
+            if wait > 0:
+                self._schedule(wait)
+                return
+
+            waiters.popleft()
+            # Round-robin: the session goes to the back of its priority queue.
+            queues.move_to_end(session_key)
+            if not waiters:
+                del queues[session_key]
+
+            self._take(tokens)
+            future.set_result(None)
+
+    def _take(self, tokens: int):
+        self.in_flight += 1
+        if self.remaining_requests is not None:
+            self.remaining_requests -= 1
+        if self.remaining_tokens is not None:
+            self.remaining_tokens -= tokens
+
+    def _schedule(self, delay: float):
+        if self._timer:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
@@ -1,37 +1,369 @@
 import os
+import re
+import json
+import time
+import random
+import asyncio
+from collections import deque
 import httpx
 from dotenv import load_dotenv
+from tracing import span, current_trace_id
+from llm.governor import RateLimitGovernor, parse_retry_after
+from deadline import DeadlineExceeded, check, clip, remaining, within
+import metrics
 
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+GROQ_FAST_MODEL = os.getenv("GROQ_FAST_MODEL", "llama-3.1-8b-instant")
+GROQ_FALLBACK_MODEL = os.getenv("GROQ_FALLBACK_MODEL", "")
+GROQ_FALLBACK_API_KEY = os.getenv("GROQ_FALLBACK_API_KEY", "")
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "30"))
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "4"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+GROQ_BACKOFF_BASE_MS = float(os.getenv("GROQ_BACKOFF_BASE_MS", "500"))
+GROQ_BACKOFF_MAX_MS = float(os.getenv("GROQ_BACKOFF_MAX_MS", "8000"))
+# Hedging: if a call is still running after the model's recent p95 latency, send a
+# duplicate and take whichever answers first. Costs extra tokens, so off by default.
+GROQ_HEDGE = os.getenv("GROQ_HEDGE", "0") == "1"
+GROQ_HEDGE_PERCENTILE = float(os.getenv("GROQ_HEDGE_PERCENTILE", "95"))
+GROQ_HEDGE_MIN_SAMPLES = int(os.getenv("GROQ_HEDGE_MIN_SAMPLES", "20"))
 
+# Rough completion budget used when checking the token allowance before a call.
+EXPECTED_COMPLETION_TOKENS = 256
 
-async def generate(prompt: str, json_mode: bool = False) -> str:
+MODEL_TIERS = {
+    "default": GROQ_MODEL,
+    "fast": GROQ_FAST_MODEL,
+}
+
+# Call site -> model tier. Agent planning needs the big model; titles and
+# one-paragraph summaries do not. Override with GROQ_ROUTES="chat_title=default,...".
+ROUTES = {
+    "agent": "default",
+    "conversation_summary": "fast",
+    "chat_title": "fast",
+    "note_summary": "fast",
+    "summarize_text": "fast",
+}
+for _rule in filter(None, os.getenv("GROQ_ROUTES", "").split(",")):
+    _purpose, _, _tier = _rule.partition("=")
+    ROUTES[_purpose.strip()] = _tier.strip()
+
+# Groq rate limits are per model and per account, so each gets its own governor.
+_governors = {}
+# Recent successful call latencies per model, in seconds, for the hedge threshold.
+_latencies = {}
+# Models that rejected a streaming request (e.g. streaming + JSON mode); stream() skips them.
+_stream_unsupported = set()
+_STREAM_REJECTED = re.compile(r"stream\w*\b.{0,80}\b(not supported|unsupported|not available|not allowed)"
+                              r"|(not supported|unsupported) (with|for|in|when) stream"
+                              r"|(does not|doesn't|cannot|can't) (support )?stream", re.I | re.S)
+
+
+class GroqError(Exception):
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _governor(model: str, api_key: str) -> RateLimitGovernor:
+    key = model if api_key == GROQ_API_KEY else f"{model}@fallback-key"
+    if key not in _governors:
+        _governors[key] = RateLimitGovernor(GROQ_MAX_CONCURRENCY)
+        metrics.register_gauge(f"groq.governor.{key}", _governors[key].state)
+    return _governors[key]
+
+
+def model_for(purpose: str) -> str:
+    tier = ROUTES.get(purpose, "default")
+    return MODEL_TIERS.get(tier, GROQ_MODEL)
+
+
+def _fallback_target(model: str):
+    """The (model, api_key) to try when the primary call fails, or None."""
+    if not (GROQ_FALLBACK_MODEL or GROQ_FALLBACK_API_KEY):
+        return None
+    return GROQ_FALLBACK_MODEL or model, GROQ_FALLBACK_API_KEY or GROQ_API_KEY
+
+
+def _hedge_delay(model: str) -> float | None:
+    samples = _latencies.get(model)
+    if not GROQ_HEDGE or not samples or len(samples) < GROQ_HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * GROQ_HEDGE_PERCENTILE / 100))]
+
+
+async def _post(client: httpx.AsyncClient, headers: dict, payload: dict, governor: RateLimitGovernor,
+                tokens: int, llm_span) -> httpx.Response:
+    primary = asyncio.create_task(client.post(GROQ_API_URL, headers=headers, json=payload))
+    hedge_after = _hedge_delay(payload["model"])
+    if hedge_after is None:
+        return await primary
+
+    done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+    # Never hedge by jumping the queue or spending rate-limit budget others are waiting for.
+    if done or not governor.try_acquire(tokens):
+        return await primary
+
+    metrics.incr("groq.hedged")
+    llm_span.set(hedged_after_ms=round(hedge_after * 1000, 1))
+    hedge = asyncio.create_task(client.post(GROQ_API_URL, headers=headers, json=payload))
+    pending = {primary, hedge}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        metrics.incr("groq.hedge_won")
+                        llm_span.set(hedge_won=True)
+                    return task.result()
+        return primary.result()
+    finally:
+        for task in (primary, hedge):
+            if not task.done():
+                task.cancel()
+        governor.release()
+
+
+def _record_usage(llm_span, model: str, usage: dict):
+    # cached_tokens: prompt prefix the provider served from its prompt cache.
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    llm_span.set(
+        prompt_tokens=usage.get("prompt_tokens"),
+        completion_tokens=usage.get("completion_tokens"),
+        cached_tokens=cached,
+    )
+    metrics.incr(f"groq.tokens.{model}", usage.get("total_tokens") or 0)
+    metrics.incr("groq.prompt_tokens", usage.get("prompt_tokens") or 0)
+    metrics.incr("groq.cached_tokens", cached)
+
+
+def _retryable(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+def _backoff_seconds(attempt: int) -> float:
+    # Full jitter: spread retries from concurrent requests instead of syncing them up.
+    cap = min(GROQ_BACKOFF_MAX_MS, GROQ_BACKOFF_BASE_MS * 2 ** attempt)
+    return random.uniform(0, cap) / 1000
+
+
+async def _complete(payload: dict, api_key: str, session_key: str, priority: str, tokens: int,
+                    llm_span, retry_transport_errors: bool = True) -> httpx.Response:
+    """POST with governor admission and retries. Returns the final non-retryable response."""
     headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
+    governor = _governor(payload["model"], api_key)
+    queue_wait_ms = 0.0
+
+    for attempt in range(GROQ_MAX_RETRIES + 1):
+        check()
+        queue_wait_ms += await within(governor.acquire(session_key, priority, tokens))
+        try:
+            started = time.perf_counter()
+            async with httpx.AsyncClient(timeout=clip(GROQ_TIMEOUT)) as client:
+                response = await _post(client, headers, payload, governor, tokens, llm_span)
+            if response.status_code == 200:
+                _latencies.setdefault(payload["model"], deque(maxlen=200)).append(time.perf_counter() - started)
+        except httpx.TransportError as e:
+            error = GroqError(f"Groq request failed: {type(e).__name__}: {e}")
+            response = None
+        finally:
+            governor.release()
+
+        if response is not None:
+            governor.update(response.headers)
+            if not _retryable(response.status_code):
+                break
+            error = GroqError(f"Groq error {response.status_code}: {response.text[:500]}", response.status_code)
+            if response.status_code == 429:
+                metrics.incr("groq.rate_limited")
+                governor.penalize(parse_retry_after(response.headers.get("retry-after", "")))
 
+        if attempt == GROQ_MAX_RETRIES or (response is None and not retry_transport_errors):
+            llm_span.set(attempts=attempt + 1, queue_wait_ms=round(queue_wait_ms, 2))
+            raise error
+        backoff = _backoff_seconds(attempt)
+        left = remaining()
+        if left is not None and left <= backoff:
+            raise DeadlineExceeded(f"Request deadline exceeded while retrying: {error}")
+        metrics.incr("groq.retries")
+        await asyncio.sleep(backoff)
+
+    metrics.observe(f"groq.queue_wait.{priority}", queue_wait_ms)
+    llm_span.set(status_code=response.status_code, attempts=attempt + 1, queue_wait_ms=round(queue_wait_ms, 2))
+    return response
+
+
+async def generate(prompt: str, json_mode: bool = False, priority: str = "interactive",
+                   session_id: str = None, purpose: str = "agent") -> str:
+    """Call Groq chat completions through the rate-limit governor.
+
+    purpose: the call site, mapped to a model tier by ROUTES.
+    priority: "interactive" for steps a user is waiting on, "background" for
+    summaries that can yield to them. Calls are queued fairly per session_id
+    (falling back to the current trace) and retried on 429/5xx/transport errors.
+    If GROQ_FALLBACK_MODEL / GROQ_FALLBACK_API_KEY is set, a call that still fails
+    is retried once more against the fallback.
+    """
+    model = model_for(purpose)
     payload = {
-        "model": GROQ_MODEL,
+        "model": model,
         "messages": [{"role": "user", "content": prompt}],
     }
 
     if json_mode:
         payload["response_format"] = {"type": "json_object"}
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        response = await client.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers=headers,
-            json=payload,
-        )
+    session_key = session_id or current_trace_id() or "anonymous"
+    tokens = len(prompt) // 4 + EXPECTED_COMPLETION_TOKENS
+    fallback = _fallback_target(model)
+
+    with span("llm.generate", model=model, purpose=purpose, json_mode=json_mode,
+              prompt_chars=len(prompt), priority=priority) as llm_span:
+        used_model = model
+        try:
+            # With a fallback available, a timeout moves on to it instead of retrying the primary.
+            response = await _complete(payload, GROQ_API_KEY, session_key, priority, tokens, llm_span,
+                                       retry_transport_errors=fallback is None)
+        except GroqError as e:
+            if not fallback or (remaining() is not None and remaining() <= 0):
+                metrics.incr("groq.failed")
+                raise
+            used_model, fallback_key = fallback
+            llm_span.set(fallback_from=model, fallback_reason=str(e)[:200], model=used_model)
+            metrics.incr("groq.fallbacks")
+            try:
+                response = await _complete({**payload, "model": used_model}, fallback_key,
+                                           session_key, priority, tokens, llm_span)
+            except GroqError:
+                metrics.incr("groq.failed")
+                raise
+
+        data = response.json()
+
+        if "choices" not in data:
+            raise GroqError(f"Groq error: {data}", response.status_code)
+
+        content = data["choices"][0]["message"]["content"]
+        usage = data.get("usage") or {}
+        llm_span.set(response_chars=len(content or ""))
+        _record_usage(llm_span, used_model, usage)
+        return content
+
+
+async def stream(prompt: str, json_mode: bool = False, priority: str = "interactive",
+                 session_id: str = None, purpose: str = "agent"):
+    """Like generate(), but yield the completion text as it arrives (server-sent events).
+
+    Streams go through the same governor but are not retried or hedged: if the
+    stream cannot be opened, or breaks before the first chunk, the call falls back
+    to generate() and its full text is yielded as a single chunk.
+    """
+    # The request runs in its own task so its span and governor slot never leak
+    # into the consumer's context between yields.
+    queue = asyncio.Queue()
+    producer = asyncio.create_task(_stream_into(queue, prompt, json_mode, priority, session_id, purpose))
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == "error":
+                raise value
+            if kind == "done":
+                return
+            yield value
+    finally:
+        producer.cancel()
+
+
+async def _stream_into(queue: asyncio.Queue, prompt: str, json_mode: bool, priority: str,
+                       session_id: str, purpose: str):
+    try:
+        if not await _stream_once(queue, prompt, json_mode, priority, session_id, purpose):
+            content = await generate(prompt, json_mode=json_mode, priority=priority,
+                                     session_id=session_id, purpose=purpose)
+            queue.put_nowait(("chunk", content))
+        queue.put_nowait(("done", None))
+    except Exception as e:
+        queue.put_nowait(("error", e))
+
+
+async def _stream_once(queue: asyncio.Queue, prompt: str, json_mode: bool, priority: str,
+                       session_id: str, purpose: str) -> bool:
+    """Stream one completion into `queue`. False if it failed before any output."""
+    model = model_for(purpose)
+    if model in _stream_unsupported:
+        return False
+
+    payload = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "stream": True,
+    }
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
+
+    headers = {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json",
+    }
+    governor = _governor(model, GROQ_API_KEY)
+    session_key = session_id or current_trace_id() or "anonymous"
+    tokens = len(prompt) // 4 + EXPECTED_COMPLETION_TOKENS
+    chars = 0
 
-    data = response.json()
+    with span("llm.stream", model=model, purpose=purpose, json_mode=json_mode,
+              prompt_chars=len(prompt), priority=priority) as llm_span:
+        check()
+        queue_wait_ms = await within(governor.acquire(session_key, priority, tokens))
+        metrics.observe(f"groq.queue_wait.{priority}", queue_wait_ms)
+        started = time.perf_counter()
+        try:
+            async with httpx.AsyncClient(timeout=clip(GROQ_TIMEOUT)) as client:
+                async with client.stream("POST", GROQ_API_URL, headers=headers, json=payload) as response:
+                    governor.update(response.headers)
+                    llm_span.set(status_code=response.status_code, queue_wait_ms=round(queue_wait_ms, 2))
+                    if response.status_code != 200:
+                        body = (await response.aread()).decode(errors="replace")
+                        if response.status_code == 429:
+                            metrics.incr("groq.rate_limited")
+                            governor.penalize(parse_retry_after(response.headers.get("retry-after", "")))
+                        elif response.status_code == 400 and _STREAM_REJECTED.search(body):
+                            # Other 400s (context length, bad params) fall back for this call only.
+                            _stream_unsupported.add(model)
+                        raise GroqError(f"Groq error {response.status_code}: {body[:500]}", response.status_code)
 
-    if "choices" not in data:
-        raise Exception(f"Groq error: {data}")
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        event = json.loads(data)
+                        usage = (event.get("x_groq") or {}).get("usage") or event.get("usage")
+                        if usage:
+                            _record_usage(llm_span, model, usage)
+                        delta = (event.get("choices") or [{}])[0].get("delta", {}).get("content")
+                        if delta:
+                            if not chars:
+                                llm_span.set(first_chunk_ms=round((time.perf_counter() - started) * 1000, 2))
+                            chars += len(delta)
+                            queue.put_nowait(("chunk", delta))
+        except (GroqError, httpx.TransportError) as e:
+            if chars:
+                raise GroqError(f"Groq stream broke after {chars} chars: {e}") from e
+            llm_span.set(stream_fallback=str(e)[:200])
+            metrics.incr("groq.stream_fallbacks")
+            return False
+        finally:
+            governor.release()
 
-    return data["choices"][0]["message"]["content"]
\ No newline at end of file
+        llm_span.set(response_chars=chars)
+    return True
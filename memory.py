@@ -1,7 +1,10 @@
+import re
 import sqlite3
 from datetime import datetime
 
 DB_PATH = "memory.db"
+FTS_AVAILABLE = True
+SEARCH_CANDIDATES = 5000
 
 
 def init_db():
@@ -33,10 +36,70 @@ def init_db():
         )
     """)
 
+    # get_history and the history ETag read one session's rows newest first
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_history_session ON history(session_id, id)")
+
+    # Version counters for cheap ETags. chats_version moves on any change to chats.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER DEFAULT 0
+        )
+    """)
+    cur.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('chats_version', 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS chats_version_{event.lower()} AFTER {event} ON chats BEGIN
+                UPDATE meta SET value = value + 1 WHERE key = 'chats_version';
+            END
+        """)
+
+    _init_history_fts(cur)
+
     conn.commit()
     conn.close()
 
 
+def _init_history_fts(cur):
+    """Full-text index over history.content, kept in sync by triggers.
+
+    External-content table: the text lives only in history, the index stores
+    tokens. Existing rows are indexed once, when the table is first created.
+    """
+    global FTS_AVAILABLE
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name='history_fts'")
+    exists = cur.fetchone() is not None
+    try:
+        cur.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+                content, content='history', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+    except sqlite3.OperationalError:
+        FTS_AVAILABLE = False
+        print("SQLite built without FTS5 — chat search falls back to LIKE scans")
+        return
+
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+            INSERT INTO history_fts (rowid, content) VALUES (new.id, new.content);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN
+            INSERT INTO history_fts (history_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS history_fts_update AFTER UPDATE OF content ON history BEGIN
+            INSERT INTO history_fts (history_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO history_fts (rowid, content) VALUES (new.id, new.content);
+        END
+    """)
+    if not exists:
+        cur.execute("INSERT INTO history_fts (history_fts) VALUES ('rebuild')")
+
+
 def create_chat(session_id: str, name: str):
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
@@ -57,6 +120,15 @@ def get_chats():
     return [{"id": r[0], "name": r[1], "created_at": r[2]} for r in rows]
 
 
+def get_chats_version() -> int:
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.execute("SELECT value FROM meta WHERE key='chats_version'")
+    row = cur.fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+
 def rename_chat(session_id: str, name: str):
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
@@ -98,6 +170,16 @@ def get_history(session_id: str, limit: int = 6):
     return [{"role": r[0], "content": r[1]} for r in reversed(rows)]
 
 
+def get_last_message_id(session_id: str) -> int:
+    """Id of the session's newest message (0 if none) — history is append-only, so this versions it."""
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.execute("SELECT MAX(id) FROM history WHERE session_id=?", (session_id,))
+    row = cur.fetchone()
+    conn.close()
+    return row[0] or 0
+
+
 def save_summary(session_id: str, content: str):
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
@@ -118,4 +200,93 @@ def get_summary(session_id: str) -> str:
     cur.execute("SELECT content FROM summary WHERE session_id=?", (session_id,))
     row = cur.fetchone()
     conn.close()
-    return row[0] if row else ""
\ No newline at end of file
+    return row[0] if row else ""
+
+
+def _search_terms(text: str) -> list:
+    return [w.lower() for w in re.findall(r"\w+", text)]
+
+
+def _fts_query(terms: list) -> str:
+    """FTS5 query: every term must match, the last one as a prefix.
+
+    Terms are quoted so operators and punctuation in the user's text (AND, -, ",
+    :) are searched for literally instead of breaking the query.
+    """
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _snippet(content: str, terms: list, width: int = 12) -> str:
+    """About `width` words around the first match, matches wrapped in [ ]."""
+    words = content.split()
+
+    def hit(word):
+        word = word.lower()
+        return any(t in word for t in terms)
+
+    first = next((i for i, w in enumerate(words) if hit(w)), 0)
+    start = max(0, first - width // 3)
+    window = words[start:start + width]
+    text = " ".join(f"[{w}]" if hit(w) else w for w in window)
+    if start > 0:
+        text = "…" + text
+    if start + width < len(words):
+        text += "…"
+    return text
+
+
+def search_history(query: str, limit: int = 20, session_id: str = None):
+    """Ranked messages from every chat (or just session_id) matching query, best first."""
+    terms = _search_terms(query)
+    if not terms:
+        return []
+    limit = max(1, min(int(limit), 100))
+    args = [session_id] if session_id else []
+
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    if FTS_AVAILABLE:
+        # bm25 is computed for every row that gets ranked, so a common word
+        # over millions of messages would score them all. Rank only the newest
+        # SEARCH_CANDIDATES matches; doclists are in rowid order, so that is cheap.
+        join = "JOIN history h ON h.id = f.rowid" if session_id else ""
+        session_filter = "AND h.session_id = ?" if session_id else ""
+        cur.execute(
+            f"""
+            SELECT f.rowid, f.rank FROM history_fts f {join}
+            WHERE f.history_fts MATCH ? {session_filter}
+            ORDER BY f.rowid DESC
+            LIMIT ?
+            """,
+            (_fts_query(terms), *args, SEARCH_CANDIDATES),
+        )
+        ids = [row_id for row_id, _ in sorted(cur.fetchall(), key=lambda r: r[1])[:limit]]
+    else:
+        session_filter = "AND session_id = ?" if session_id else ""
+        cur.execute(
+            f"SELECT id FROM history WHERE content LIKE ? {session_filter} ORDER BY id DESC LIMIT ?",
+            (f"%{query.strip()}%", *args, limit),
+        )
+        ids = [r[0] for r in cur.fetchall()]
+
+    rows = {}
+    if ids:
+        marks = ",".join("?" * len(ids))
+        cur.execute(
+            f"""
+            SELECT h.id, h.session_id, c.name, h.role, h.timestamp, h.content
+            FROM history h LEFT JOIN chats c ON c.id = h.session_id
+            WHERE h.id IN ({marks})
+            """,
+            ids,
+        )
+        rows = {r[0]: r for r in cur.fetchall()}
+    conn.close()
+
+    return [
+        {"message_id": r[0], "session_id": r[1], "chat_name": r[2] or r[1], "role": r[3],
+         "timestamp": r[4], "snippet": _snippet(r[5] or "", terms)}
+        for r in (rows[i] for i in ids if i in rows)
+    ]
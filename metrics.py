@@ -0,0 +1,48 @@
+from collections import Counter, deque
+
+TIMING_WINDOW = 1000
+
+_counters = Counter()
+_timings = {}
+_gauges = {}
+
+
+def incr(name: str, value: int = 1):
+    _counters[name] += value
+
+
+def observe(name: str, ms: float):
+    """Record a duration; the last TIMING_WINDOW values are kept per name."""
+    if name not in _timings:
+        _timings[name] = deque(maxlen=TIMING_WINDOW)
+    _timings[name].append(ms)
+
+
+def register_gauge(name: str, func):
+    """Expose a callable's current value (e.g. a queue length) in the snapshot."""
+    _gauges[name] = func
+
+
+def _percentile(ordered: list, pct: float) -> float:
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return round(ordered[index], 2)
+
+
+def snapshot() -> dict:
+    timings = {}
+    for name, values in _timings.items():
+        ordered = sorted(values)
+        if not ordered:
+            continue
+        timings[name] = {
+            "count": len(ordered),
+            "p50_ms": _percentile(ordered, 50),
+            "p95_ms": _percentile(ordered, 95),
+            "p99_ms": _percentile(ordered, 99),
+            "max_ms": round(ordered[-1], 2),
+        }
+    return {
+        "counters": dict(_counters),
+        "timings": timings,
+        "gauges": {name: func() for name, func in _gauges.items()},
+    }
@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import time
+import linecache
+import threading
+from collections import Counter
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+# Leaf frames that mean "this thread is parked", not doing work for the request.
+_IDLE_THREAD_LEAVES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+# Leaf frames of the event loop blocked in select — i.e. awaiting network I/O (Groq, Google, Slack).
+_EVENT_LOOP_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("base_events.py", "_run_once"),
+}
+_SQLITE_MARKERS = (".execute(", ".executemany(", "sqlite3.connect(", ".fetchall(", ".fetchone(", ".commit(")
+
+
+def _frame_key(frame) -> tuple:
+    code = frame.f_code
+    return os.path.basename(code.co_filename), code.co_name
+
+
+def _is_sqlite_call(frame) -> bool:
+    line = linecache.getline(frame.f_code.co_filename, frame.f_lineno)
+    return any(marker in line for marker in _SQLITE_MARKERS)
+
+
+class SamplingProfiler:
+    """Periodically snapshots every thread's Python stack while a request runs.
+
+    Stacks are aggregated in folded format ("a;b;c <count>"), which flamegraph.pl,
+    speedscope and inferno read directly. Samples are process-wide, so concurrent
+    requests show up too — profile on a quiet instance when possible.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.categories = Counter()
+        self.samples = 0
+        self.wall_ms = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.wall_ms = round((time.perf_counter() - self._start) * 1000, 2)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self._sample(frame)
+
+    def _sample(self, leaf):
+        leaf_key = _frame_key(leaf)
+        if leaf_key in _IDLE_THREAD_LEAVES:
+            return
+
+        frames = []
+        frame = leaf
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+        frames.reverse()
+
+        names = [f"{f.f_code.co_name} ({os.path.basename(f.f_code.co_filename)})" for f in frames]
+        self.stacks[";".join(names)] += 1
+        self.categories[self._categorize(frames, leaf_key)] += 1
+        self.samples += 1
+
+    @staticmethod
+    def _categorize(frames, leaf_key) -> str:
+        func_names = {f.f_code.co_name for f in frames}
+        if leaf_key in _EVENT_LOOP_IDLE_LEAVES:
+            return "awaiting_io"
+        if "extract_json" in func_names:
+            return "extract_json"
+        if any(os.path.basename(os.path.dirname(f.f_code.co_filename)) == "json" for f in frames):
+            return "json_serialization"
+        if _is_sqlite_call(frames[-1]):
+            return "sqlite"
+        return "other_cpu"
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def breakdown(self) -> dict:
+        """Approximate time per category, scaled from sample counts."""
+        per_sample = self.interval * 1000
+        return {name: round(count * per_sample, 1) for name, count in self.categories.most_common()}
+
+
+def _sum_spans(node: dict, *names: str) -> float:
+    # A matching span's own children are inside its time already (e.g. a stream's fallback call).
+    if node["name"] in names:
+        return node["duration_ms"] or 0
+    return sum(_sum_spans(child, *names) for child in node.get("children", []))
+
+
+def save_profile(profile_id: str, profiler: SamplingProfiler, trace: dict = None) -> dict:
+    """Write the folded stacks and a summary to PROFILE_DIR, return the summary."""
+    summary = {
+        "profile_id": profile_id,
+        "wall_ms": profiler.wall_ms,
+        "samples": profiler.samples,
+        "interval_ms": profiler.interval * 1000,
+        "sampled_ms_by_category": profiler.breakdown(),
+    }
+    if trace:
+        summary["groq_wall_ms"] = round(_sum_spans(trace, "llm.generate", "llm.stream"), 2)
+        summary["tool_wall_ms"] = round(_sum_spans(trace, "tool.execute"), 2)
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), "w") as f:
+        f.write(profiler.folded())
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def load_profile(profile_id: str) -> str | None:
+    path = os.path.join(PROFILE_DIR, f"{os.path.basename(profile_id)}.folded")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read()
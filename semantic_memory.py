@@ -0,0 +1,379 @@
+"""Long-term recall over chat history and notes, CPU only.
+
+Text is embedded with feature hashing (word unigrams and bigrams, signed, L2
+normalised) — no model download, stable across processes. Vectors live in
+memory-mapped NumPy files under MEMORY_INDEX_DIR and are appended incrementally.
+catch_up() (a background thread started with the app) indexes the backlog; each
+recall only indexes a few new rows, and skips that while a catch-up is running.
+
+A query scores only the caller's session messages plus notes (a mask over a
+uint32 key column), so latency tracks the session's size rather than the whole
+index. Snippets are read back from SQLite, so deleted chats and notes never
+surface. Notes edited in place are queued by a trigger and re-embedded on the next
+sync. Rebuild after editing the database by hand: python -m semantic_memory --rebuild
+"""
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import argparse
+import threading
+import memory
+import metrics
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    print("NumPy not installed — semantic memory disabled. Run: pip install numpy")
+
+MEMORY_INDEX_DIR = os.getenv("MEMORY_INDEX_DIR", "memory_index")
+MEMORY_RECALL_K = int(os.getenv("MEMORY_RECALL_K", "4"))
+MEMORY_MIN_SCORE = float(os.getenv("MEMORY_MIN_SCORE", "0.2"))
+
+DIM = 256
+SYNC_BATCH = 5000
+RECALL_SYNC_BATCH = 50  # rows a recall indexes inline: about one exchange
+SNIPPET_CHARS = 200
+NOTES_KEY = 0  # session key of note vectors: visible from every session
+
+KIND_MESSAGE = 0
+KIND_NOTE = 1
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by do does for from has have i if in is it its me my of on or so "
+    "that the this to was we what when where which who will with you your".split()
+)
+
+
+def _session_key(session_id: str) -> int:
+    # 0 is reserved for notes
+    return zlib.crc32(session_id.encode()) or 1
+
+
+def embed(text: str):
+    """Hashed bag of unigrams and bigrams, L2 normalised, float32[DIM]."""
+    vector = np.zeros(DIM, dtype=np.float32)
+    words = [w for w in _TOKEN.findall(text.lower()) if w not in _STOPWORDS]
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for feature in features:
+        h = zlib.crc32(feature.encode())
+        vector[h % DIM] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+
+class VectorIndex:
+    """Append-only vectors plus (kind, row id, session key) columns, memory-mapped from disk."""
+
+    def __init__(self, directory: str = MEMORY_INDEX_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()  # the arrays and state
+        self._sync_lock = threading.Lock()  # one sync at a time; embedding runs outside _lock
+        self._state_path = os.path.join(directory, "state.json")
+        self._load()
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        state = {"count": 0, "capacity": 0, "dim": DIM, "last_history_id": 0, "last_note_id": 0}
+        if os.path.exists(self._state_path):
+            with open(self._state_path) as f:
+                state.update(json.load(f))
+        if state["dim"] != DIM:
+            state = {"count": 0, "capacity": 0, "dim": DIM, "last_history_id": 0, "last_note_id": 0}
+        self.state = state
+        self._open(state["capacity"])
+
+    def _columns(self):
+        return (
+            ("vectors", np.float32, (DIM,)),
+            ("keys", np.uint32, ()),
+            ("rows", np.int64, ()),
+            ("kinds", np.uint8, ()),
+        )
+
+    def _open(self, capacity: int):
+        for name, dtype, shape in self._columns():
+            path = os.path.join(self.directory, f"{name}.bin")
+            size = capacity * np.dtype(dtype).itemsize * (shape[0] if shape else 1)
+            with open(path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            array = np.memmap(path, dtype=dtype, mode="r+", shape=(capacity, *shape)) if capacity else \
+                np.zeros((0, *shape), dtype=dtype)
+            setattr(self, name, array)
+        self.state["capacity"] = capacity
+
+    def _reserve(self, extra: int):
+        needed = self.state["count"] + extra
+        if needed <= self.state["capacity"]:
+            return
+        for name, _, _ in self._columns():
+            array = getattr(self, name)
+            if isinstance(array, np.memmap):
+                array.flush()
+            setattr(self, name, None)
+        self._open(max(needed, self.state["capacity"] * 2, 1024))
+
+    def _save_state(self):
+        for name, _, _ in self._columns():
+            array = getattr(self, name)
+            if isinstance(array, np.memmap):
+                array.flush()
+        tmp = self._state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self._state_path)
+
+    def _append(self, items: list, vectors):
+        """items: (kind, row_id, session_key, text); vectors: their embeddings."""
+        self._reserve(len(items))
+        start = self.state["count"]
+        end = start + len(items)
+        self.vectors[start:end] = vectors
+        self.kinds[start:end] = [kind for kind, _, _, _ in items]
+        self.rows[start:end] = [row_id for _, row_id, _, _ in items]
+        self.keys[start:end] = [key for _, _, key, _ in items]
+        self.state["count"] = end
+
+    def sync(self, batch: int = SYNC_BATCH, wait: bool = True) -> int:
+        """Index history and notes rows added since the last sync, and re-embed notes
+        edited since (queued in notes_reindex by a trigger). Returns rows (re)indexed.
+
+        With wait=False, returns 0 at once if another sync is running.
+        """
+        if not self._sync_lock.acquire(blocking=wait):
+            return 0
+        try:
+            conn = sqlite3.connect(memory.DB_PATH)
+            try:
+                cur = conn.cursor()
+                cur.execute(
+                    "SELECT id, session_id, content FROM history WHERE id > ? ORDER BY id LIMIT ?",
+                    (self.state["last_history_id"], batch),
+                )
+                messages = cur.fetchall()
+                try:
+                    cur.execute(
+                        "SELECT id, title, body FROM notes WHERE id > ? ORDER BY id LIMIT ?",
+                        (self.state["last_note_id"], batch),
+                    )
+                    notes = cur.fetchall()
+                except sqlite3.OperationalError:
+                    notes = []  # productivity tables not created yet
+                try:
+                    edited = self._take_edited_notes(conn, batch)
+                except sqlite3.OperationalError:
+                    edited = []  # no notes_reindex yet, or the database is busy: next sync
+
+            finally:
+                conn.close()
+
+            items = [(KIND_MESSAGE, i, _session_key(s or ""), c or "") for i, s, c in messages]
+            items += [(KIND_NOTE, i, NOTES_KEY, f"{t or ''}\n{b or ''}") for i, t, b in notes]
+            if not items and not edited:
+                return 0
+            vectors = np.stack([embed(text) for _, _, _, text in items]) if items else None
+            replaced = {i: embed(f"{t or ''}\n{b or ''}") for i, t, b in edited}
+            with self._lock:
+                if items:
+                    self._append(items, vectors)
+                self._replace_notes(replaced)
+                if messages:
+                    self.state["last_history_id"] = messages[-1][0]
+                if notes:
+                    self.state["last_note_id"] = notes[-1][0]
+                self._save_state()
+            return len(items) + len(edited)
+        finally:
+            self._sync_lock.release()
+
+    def _take_edited_notes(self, conn, batch: int) -> list:
+        """Dequeue up to `batch` edited notes that are already indexed: (id, title, body)."""
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.execute("SELECT note_id FROM notes_reindex LIMIT ?", (batch,))
+            ids = [row[0] for row in cur.fetchall()]
+            if not ids:
+                conn.rollback()
+                return []
+            marks = ",".join("?" * len(ids))
+            # Deleted notes just leave the queue; _snippets already drops them.
+            cur.execute(f"SELECT id, title, body FROM notes WHERE id IN ({marks}) AND id <= ?",
+                        (*ids, self.state["last_note_id"]))
+            edited = cur.fetchall()
+            # Same transaction: an edit committed after this re-queues the note.
+            cur.execute(f"DELETE FROM notes_reindex WHERE note_id IN ({marks})", ids)
+            conn.commit()
+            return edited
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def _replace_notes(self, vectors: dict):
+        """Overwrite the vectors of already-indexed notes (note id -> new vector)."""
+        if not vectors:
+            return
+        count = self.state["count"]
+        positions = np.flatnonzero(self.kinds[:count] == KIND_NOTE)
+        for position in positions:
+            vector = vectors.get(int(self.rows[position]))
+            if vector is not None:
+                self.vectors[position] = vector
+
+    def search(self, query: str, session_id: str, k: int):
+        """Top-k (kind, row_id, score) among this session's messages and all notes."""
+        with self._lock:
+            count = self.state["count"]
+            if not count or k <= 0:
+                return []
+            keys = self.keys[:count]
+            candidates = np.flatnonzero((keys == _session_key(session_id)) | (keys == NOTES_KEY))
+            if not len(candidates):
+                return []
+            scores = self.vectors[candidates] @ embed(query)
+            top = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (int(self.kinds[candidates[i]]), int(self.rows[candidates[i]]), float(scores[i]))
+                for i in top
+            ]
+
+    def rebuild(self):
+        with self._sync_lock, self._lock:
+            self.state = {"count": 0, "capacity": self.state["capacity"], "dim": DIM,
+                          "last_history_id": 0, "last_note_id": 0}
+            self._save_state()
+        while self.sync():
+            pass
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _get_index() -> "VectorIndex | None":
+    global _index
+    if not NUMPY_AVAILABLE:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = VectorIndex()
+    return _index
+
+
+def _snippets(hits: list, session_id: str) -> dict:
+    """(kind, row_id) -> snippet dict, read from SQLite so deleted rows drop out.
+
+    Messages must belong to session_id: the index only keys them by a crc32 of it.
+    """
+    by_kind = {KIND_MESSAGE: [], KIND_NOTE: []}
+    for kind, row_id, _ in hits:
+        by_kind[kind].append(row_id)
+
+    found = {}
+    conn = sqlite3.connect(memory.DB_PATH)
+    try:
+        cur = conn.cursor()
+        if by_kind[KIND_MESSAGE]:
+            marks = ",".join("?" * len(by_kind[KIND_MESSAGE]))
+            cur.execute(f"SELECT id, role, content, timestamp FROM history WHERE id IN ({marks}) AND session_id = ?",
+                        (*by_kind[KIND_MESSAGE], session_id))
+            for row_id, role, content, timestamp in cur.fetchall():
+                found[(KIND_MESSAGE, row_id)] = {"source": role, "text": content, "when": timestamp}
+        if by_kind[KIND_NOTE]:
+            marks = ",".join("?" * len(by_kind[KIND_NOTE]))
+            cur.execute(f"SELECT id, title, body, created_at FROM notes WHERE id IN ({marks})",
+                        by_kind[KIND_NOTE])
+            for row_id, title, body, created_at in cur.fetchall():
+                found[(KIND_NOTE, row_id)] = {"source": f"note {row_id}: {title}", "text": body, "when": created_at}
+    finally:
+        conn.close()
+    return found
+
+
+def recall(query: str, session_id: str, k: int = MEMORY_RECALL_K, exclude: list = ()) -> list:
+    """Top-k snippets from this session's older messages and from notes, most relevant first.
+
+    exclude: texts already in the prompt (e.g. the recent history window).
+    """
+    index = _get_index()
+    if index is None or k <= 0 or not query.strip():
+        return []
+
+    start = time.perf_counter()
+    # Index the latest exchange; a backlog is left to catch_up().
+    index.sync(RECALL_SYNC_BATCH, wait=False)
+    hits = [hit for hit in index.search(query, session_id, k + len(exclude)) if hit[2] >= MEMORY_MIN_SCORE]
+    found = _snippets(hits, session_id)
+    skip = set(exclude)
+
+    results = []
+    for kind, row_id, score in hits:
+        snippet = found.get((kind, row_id))
+        if not snippet or snippet["text"] in skip:
+            continue
+        text = snippet["text"] or ""
+        if len(text) > SNIPPET_CHARS:
+            text = text[:SNIPPET_CHARS].rstrip() + "…"
+        results.append({**snippet, "text": text, "score": round(score, 3)})
+        if len(results) == k:
+            break
+    metrics.observe("memory.recall", (time.perf_counter() - start) * 1000)
+    return results
+
+
+def catch_up():
+    """Index everything not yet in the index. Run in a background thread at startup."""
+    index = _get_index()
+    if index is None:
+        return
+    start = time.perf_counter()
+    total = 0
+    try:
+        while True:
+            indexed = index.sync()
+            if not indexed:
+                break
+            total += indexed
+    except Exception as e:
+        print(f"Semantic memory catch-up failed: {e}")
+    if total:
+        print(f"Semantic memory: indexed {total} rows in {time.perf_counter() - start:.1f}s")
+
+
+def start_catch_up() -> threading.Thread:
+    thread = threading.Thread(target=catch_up, name="semantic-memory-sync", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="re-index all history and notes from scratch")
+    parser.add_argument("--query", help="print what recall() returns for this text")
+    parser.add_argument("--session", default="default")
+    args = parser.parse_args()
+
+    index = _get_index()
+    if index is None:
+        sys.exit(1)
+    if args.rebuild:
+        start = time.perf_counter()
+        index.rebuild()
+        print(f"Indexed {index.state['count']} rows in {time.perf_counter() - start:.1f}s")
+    if args.query:
+        for hit in recall(args.query, args.session):
+            print(f"{hit['score']:.3f}  [{hit['source']}] {hit['text']}")
+
+
+if __name__ == "__main__":
+    main()
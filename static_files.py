@@ -0,0 +1,227 @@
+"""Serving the built frontend: precompressed assets and a cached index.html.
+
+`npm run build` writes static/, then runs `python -m static_files static` to put
+.br and .gz files next to each compressible asset. At request time the best
+variant the client accepts is sent with Content-Encoding, so nothing is
+compressed per request. Vite puts a content hash in asset filenames, so those
+are cached for a year as immutable. index.html names the current hashes: it is
+kept in memory (raw and compressed) and always revalidated by ETag.
+
+The build also stamps static/ with a hash of the frontend sources it came from,
+so a bundle that no longer matches frontend/ is reported at startup and fails
+`python -m static_files static --check`.
+"""
+import os
+import re
+import sys
+import gzip
+import hashlib
+import mimetypes
+import argparse
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+INDEX_CACHE_CONTROL = "no-cache"
+
+# Preferred first. Suffix of the precompressed file next to the original.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE = frozenset({".js", ".mjs", ".css", ".html", ".svg", ".json", ".map", ".txt", ".xml", ".wasm"})
+MIN_COMPRESS_BYTES = 1024
+
+# Inputs that change what `vite build` writes; node_modules is pinned by the lockfile.
+SOURCE_FILES = ("index.html", "package.json", "package-lock.json", "vite.config.js")
+SOURCE_DIRS = ("src", "public")
+STAMP_FILE = ".source-hash"
+
+# Vite output names look like index-B0hDnPsR.js.
+_HASHED_NAME = re.compile(r"-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+
+
+def _accepted_encodings(header: str) -> set:
+    """Codings in an Accept-Encoding header, minus any refused with q=0."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = params.strip().lower()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(coding)
+    return accepted
+
+
+def _pick_encoding(accept_encoding: str, available) -> tuple:
+    """(coding, suffix) of the preferred variant the client accepts, or (None, "")."""
+    accepted = _accepted_encodings(accept_encoding)
+    for coding, suffix in ENCODINGS:
+        if coding in available and (coding in accepted or "*" in accepted):
+            return coding, suffix
+    return None, ""
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves file.br / file.gz when present and accepted, with immutable caching for hashed names."""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = os.fspath(full_path)
+        cache_control = ASSET_CACHE_CONTROL if _HASHED_NAME.search(full_path) else INDEX_CACHE_CONTROL
+        headers = {"Cache-Control": cache_control}
+
+        variants = {}
+        for coding, suffix in ENCODINGS:
+            try:
+                variants[coding] = os.stat(full_path + suffix)
+            except OSError:
+                pass
+        if variants:
+            headers["Vary"] = "Accept-Encoding"
+        coding, suffix = _pick_encoding(request_headers.get("accept-encoding", ""), variants)
+
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+        if coding:
+            headers["Content-Encoding"] = coding
+            response = FileResponse(full_path + suffix, status_code=status_code, headers=headers,
+                                    media_type=media_type, stat_result=variants[coding])
+        else:
+            response = FileResponse(full_path, status_code=status_code, headers=headers,
+                                    media_type=media_type, stat_result=stat_result)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class CachedIndex:
+    """index.html held in memory with its compressed forms; re-read when the file changes on disk."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime = None
+        self._bodies = {}
+        self._etags = {}
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        bodies = {None: raw, "gzip": gzip.compress(raw, mtime=0)}
+        if BROTLI_AVAILABLE:
+            bodies["br"] = brotli.compress(raw)
+        digest = hashlib.sha1(raw).hexdigest()[:16]
+        # One tag per representation, so a cache never pairs a gzip body with the identity tag.
+        self._etags = {coding: f'"{digest}-{coding}"' if coding else f'"{digest}"' for coding in bodies}
+        self._bodies = bodies
+        self._mtime = mtime
+
+    def response(self, request: Request) -> Response:
+        self._load()
+        coding, _ = _pick_encoding(request.headers.get("accept-encoding", ""), self._bodies)
+        headers = {"ETag": self._etags[coding], "Cache-Control": INDEX_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+        if coding:
+            headers["Content-Encoding"] = coding
+        sent = {tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")}
+        if self._etags[coding] in sent:
+            return Response(status_code=304, headers=headers)
+        return Response(self._bodies[coding], media_type="text/html", headers=headers)
+
+
+def compress_directory(directory: str, min_bytes: int = MIN_COMPRESS_BYTES) -> list:
+    """Write .gz (and .br, if brotli is installed) next to each compressible file. Returns files written."""
+    written = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE or os.path.getsize(path) < min_bytes:
+                continue
+            with open(path, "rb") as f:
+                raw = f.read()
+            outputs = {".gz": gzip.compress(raw, compresslevel=9, mtime=0)}
+            if BROTLI_AVAILABLE:
+                outputs[".br"] = brotli.compress(raw, quality=11)
+            for suffix, data in outputs.items():
+                # Not worth a variant (and a Vary) if it does not save anything.
+                if len(data) >= len(raw):
+                    continue
+                with open(path + suffix, "wb") as f:
+                    f.write(data)
+                written.append((path + suffix, len(raw), len(data)))
+    return written
+
+
+def source_fingerprint(frontend_dir: str) -> str:
+    """sha256 over the frontend build inputs (relative paths and contents)."""
+    paths = [name for name in SOURCE_FILES if os.path.isfile(os.path.join(frontend_dir, name))]
+    for sub in SOURCE_DIRS:
+        for root, _, files in os.walk(os.path.join(frontend_dir, sub)):
+            paths += [os.path.relpath(os.path.join(root, name), frontend_dir) for name in files]
+    digest = hashlib.sha256()
+    for rel in sorted(p.replace(os.sep, "/") for p in paths):
+        with open(os.path.join(frontend_dir, rel), "rb") as f:
+            data = f.read()
+        digest.update(f"{rel}\0{len(data)}\0".encode())
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def write_stamp(static_dir: str, frontend_dir: str) -> str:
+    fingerprint = source_fingerprint(frontend_dir)
+    with open(os.path.join(static_dir, STAMP_FILE), "w") as f:
+        f.write(fingerprint + "\n")
+    return fingerprint
+
+
+def bundle_is_current(static_dir: str, frontend_dir: str):
+    """True if static/ was built from the sources now in frontend/, False if not,
+    None when there are no sources to compare against (a deploy without frontend/)."""
+    if not os.path.isdir(os.path.join(frontend_dir, "src")):
+        return None
+    try:
+        with open(os.path.join(static_dir, STAMP_FILE)) as f:
+            stamped = f.read().strip()
+    except OSError:
+        return False
+    return stamped == source_fingerprint(frontend_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", nargs="?", default="static")
+    parser.add_argument("--min-bytes", type=int, default=MIN_COMPRESS_BYTES)
+    parser.add_argument("--stamp", metavar="FRONTEND_DIR",
+                        help="record that the directory was just built from these sources (npm postbuild)")
+    parser.add_argument("--check", metavar="FRONTEND_DIR",
+                        help="exit 1 if the directory was not built from these sources; writes nothing")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"{args.directory} is not a directory — build the frontend first.")
+        sys.exit(1)
+    if args.check:
+        if bundle_is_current(args.directory, args.check) is False:
+            print(f"{args.directory} is out of date with {args.check} — run `npm run build` in {args.check}.")
+            sys.exit(1)
+        print(f"{args.directory} matches {args.check}.")
+        return
+    if not BROTLI_AVAILABLE:
+        print("brotli not installed — writing gzip only. Run: pip install brotli")
+    for path, before, after in compress_directory(args.directory, args.min_bytes):
+        print(f"{path}  {before} -> {after} bytes")
+    if args.stamp:
+        print(f"{args.directory}/{STAMP_FILE}  {write_stamp(args.directory, args.stamp)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import productivity  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh productivity database in a temp dir."""
+    monkeypatch.setattr(productivity, "DB_PATH", str(tmp_path / "memory.db"))
+    productivity.init_productivity_db()
+    return productivity.DB_PATH
@@ -0,0 +1,103 @@
+import time
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import pytest
+from llm.governor import RateLimitGovernor, parse_reset, parse_retry_after
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("2m59.56s", 179.56), ("7.66s", 7.66), ("120ms", 0.12), ("1h2m", 3720), ("3", 3.0), ("", 0.0),
+])
+def test_parse_reset(value, seconds):
+    assert parse_reset(value) == pytest.approx(seconds)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after("") == 0.0
+    assert parse_retry_after("soon") == 0.0
+    past = datetime.now(timezone.utc) - timedelta(minutes=5)
+    assert parse_retry_after(format_datetime(past, usegmt=True)) == 0.0
+    future = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 < parse_retry_after(format_datetime(future, usegmt=True)) <= 30
+
+
+def admission_order(governor, waiters):
+    """Hold the only slot, queue (session, priority) waiters, then release one at a time."""
+    async def run():
+        await governor.acquire("holder")
+        order = []
+
+        async def wait(session, priority):
+            await governor.acquire(session, priority)
+            order.append(session)
+
+        tasks = []
+        for session, priority in waiters:
+            tasks.append(asyncio.create_task(wait(session, priority)))
+            await asyncio.sleep(0)
+        for _ in range(len(waiters) + 1):
+            governor.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return order
+
+    return asyncio.run(run())
+
+
+def test_interactive_admitted_before_background():
+    order = admission_order(RateLimitGovernor(max_concurrency=1), [
+        ("nightly", "background"), ("user", "interactive"),
+    ])
+    assert order == ["user", "nightly"]
+
+
+def test_sessions_served_round_robin():
+    order = admission_order(RateLimitGovernor(max_concurrency=1), [
+        ("a", "interactive"), ("a", "interactive"), ("a", "interactive"), ("b", "interactive"),
+    ])
+    assert order == ["a", "b", "a", "a"]
+
+
+def test_waits_for_request_budget_reset():
+    governor = RateLimitGovernor(max_concurrency=4)
+    governor.update({"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "80ms"})
+    assert not governor.try_acquire()
+
+    async def run():
+        start = time.monotonic()
+        await governor.acquire("s")
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.05
+    assert governor.in_flight == 1
+
+
+def test_token_budget_and_penalty_block_try_acquire():
+    governor = RateLimitGovernor(max_concurrency=4)
+    governor.update({"x-ratelimit-remaining-tokens": "100", "x-ratelimit-reset-tokens": "10s"})
+    assert not governor.try_acquire(tokens=500)
+    assert governor.try_acquire(tokens=50)
+    assert governor.remaining_tokens == 50
+    governor.penalize(10)
+    assert not governor.try_acquire()
+    assert governor.state()["blocked_for_s"] > 9
+
+
+def test_cancelled_waiter_does_not_keep_a_slot():
+    governor = RateLimitGovernor(max_concurrency=1)
+
+    async def run():
+        await governor.acquire("holder")
+        waiter = asyncio.create_task(governor.acquire("gone"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        governor.release()
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert governor.in_flight == 0
+    assert governor.queued() == 0
@@ -0,0 +1,78 @@
+import sqlite3
+from datetime import datetime, timedelta
+from tools import productivity
+
+TODAY = datetime.utcnow().date()
+
+
+def add_habit(db, name, frequency="daily", created_days_ago=30, logged_days_ago=()):
+    conn = sqlite3.connect(db)
+    cur = conn.execute(
+        "INSERT INTO habits (name, frequency, created_at) VALUES (?, ?, ?)",
+        (name, frequency, (TODAY - timedelta(days=created_days_ago)).isoformat()),
+    )
+    habit_id = cur.lastrowid
+    conn.executemany(
+        "INSERT INTO habit_logs (habit_id, logged_date, created_at) VALUES (?, ?, ?)",
+        [(habit_id, (TODAY - timedelta(days=n)).isoformat(), "") for n in logged_days_ago],
+    )
+    conn.commit()
+    conn.close()
+    return habit_id
+
+
+def stats(habit_id, days=365):
+    return productivity.get_habit_stats(habit_id, days)["habits"][0]
+
+
+def test_daily_streaks(db):
+    hid = add_habit(db, "run", logged_days_ago=[0, 1, 2, 10, 11, 12, 13, 14])
+    s = stats(hid)
+    assert (s["current_streak"], s["longest_streak"], s["streak_unit"]) == (3, 5, "days")
+    assert s["logs_in_period"] == 8
+
+
+def test_streak_ending_yesterday_is_still_current(db):
+    assert stats(add_habit(db, "a", logged_days_ago=[1, 2]))["current_streak"] == 2
+    assert stats(add_habit(db, "b", logged_days_ago=[2, 3]))["current_streak"] == 0
+
+
+def test_duplicate_logs_count_once(db):
+    s = stats(add_habit(db, "dup", logged_days_ago=[0, 0, 1]))
+    assert (s["current_streak"], s["logs_in_period"]) == (2, 2)
+
+
+def test_weekly_streak_counts_weeks(db):
+    monday = TODAY.weekday()  # days ago
+    # This week, last week, twice the week before, and five weeks ago.
+    logged = [0, monday + 3, monday + 8, monday + 9, monday + 29]
+    hid = add_habit(db, "review", frequency="weekly", created_days_ago=60, logged_days_ago=logged)
+    s = stats(hid)
+    assert (s["current_streak"], s["longest_streak"], s["streak_unit"]) == (3, 3, "weeks")
+
+
+def test_completion_rate_counts_from_creation(db):
+    s = stats(add_habit(db, "floss", created_days_ago=9, logged_days_ago=[0, 2, 4, 6, 8]))
+    assert s["completion_rate"] == 0.5
+    # Logs older than created_at (an import) move the start back.
+    s = stats(add_habit(db, "old", created_days_ago=0, logged_days_ago=[0, 3]))
+    assert s["completion_rate"] == 0.5
+
+
+def test_weekday_counts_and_heatmap(db):
+    s = stats(add_habit(db, "walk", logged_days_ago=[0, 7]), days=28)
+    assert sum(s["by_weekday"].values()) == 2
+    assert s["by_weekday"][productivity.WEEKDAYS[TODAY.weekday()]] == 2
+    weeks = s["heatmap"]["weeks"]
+    assert all(len(week) == 7 for week in weeks)
+    assert "".join(weeks).count("1") == 2
+    assert datetime.fromisoformat(s["heatmap"]["start"]).weekday() == 0
+
+
+def test_all_habits_and_unknown_habit(db):
+    add_habit(db, "x", logged_days_ago=[0])
+    add_habit(db, "y")
+    result = productivity.get_habit_stats()
+    assert [h["name"] for h in result["habits"]] == ["x", "y"]
+    assert result["habits"][1]["longest_streak"] == 0
+    assert productivity.get_habit_stats(999)["success"] is False
@@ -0,0 +1,51 @@
+from agent.json_stream import DecisionParser
+
+
+def feed_all(text, size=1):
+    parser = DecisionParser()
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+    return parser
+
+
+def test_tool_call_ready_before_object_closes():
+    parser = DecisionParser()
+    parser.feed('```json\n{"action": "tool", "tool_name": "list_todos", "params": {"priority": "high"}')
+    assert not parser.closed
+    assert parser.tool_call() == ("list_todos", {"priority": "high"})
+
+
+def test_byte_by_byte_matches_whole_text():
+    text = '{"action": "tool", "tool_name": "add_note", "params": {"title": "a, b", "tags": ["x", "y"]}, "why": "ok"}'
+    parser = feed_all(text)
+    assert parser.closed
+    assert parser.fields == feed_all(text, size=len(text)).fields
+    assert parser.fields["params"] == {"title": "a, b", "tags": ["x", "y"]}
+    assert parser.fields["why"] == "ok"
+
+
+def test_missing_params_only_default_once_closed():
+    parser = DecisionParser()
+    parser.feed('{"action": "tool", "tool_name": "get_habits"')
+    assert parser.tool_call() is None
+    parser.feed("}")
+    assert parser.tool_call() == ("get_habits", {})
+
+
+def test_braces_and_escaped_quotes_inside_strings():
+    parser = feed_all('{"action": "chat", "response": "use {x} and \\"}\\" here"}', size=3)
+    assert parser.closed
+    assert parser.fields["response"] == 'use {x} and "}" here'
+    assert parser.tool_call() is None
+
+
+def test_params_must_be_an_object():
+    parser = feed_all('{"action": "tool", "tool_name": "list_todos", "params": "all"}')
+    assert parser.tool_call() is None
+
+
+def test_text_after_close_is_ignored():
+    parser = DecisionParser()
+    parser.feed('{"action": "chat", "response": "hi"} {"action": "tool"}')
+    parser.feed('{"tool_name": "x"}')
+    assert parser.fields == {"action": "chat", "response": "hi"}
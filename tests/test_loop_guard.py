@@ -0,0 +1,67 @@
+import tools.catalog  # noqa: F401 — registers the tools the guard looks up
+from agent.orchestrator import EXPAND_RESULT, STEP_BUDGETS, _LoopGuard
+
+OK = {"success": True, "result": {"success": True, "message": "done"}}
+
+
+class FakeSpan:
+    """Stands in for the run span: records what set() was given."""
+
+    def __init__(self):
+        self.attrs = {}
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+def guard(max_steps=6):
+    return _LoopGuard(max_steps, FakeSpan())
+
+
+def test_intent_sets_the_budget_once():
+    g = guard()
+    g.classify("list_todos")
+    g.classify("bulk_add_todos")
+    assert (g.intent, g.budget) == ("lookup", STEP_BUDGETS["lookup"])
+    assert g._run_span.attrs["intent"] == "lookup"
+
+    g = guard()
+    g.classify("bulk_add_todos")
+    assert g.intent == "bulk"
+    g = guard()
+    g.classify("add_todo")
+    assert g.intent == "action"
+
+
+def test_read_repeat_until_a_write_succeeds():
+    g = guard()
+    g.record(1, "list_todos", {}, {"success": True, "result": {"todos": []}})
+    assert g.repeat_of("list_todos", {}) == 1
+    assert g.repeat_of("list_todos", {"priority": "high"}) is None
+
+    g.record(2, "add_todo", {"task": "x"}, OK)
+    assert g.repeat_of("list_todos", {}) is None
+    # A write is never worth repeating, whatever happened since.
+    assert g.repeat_of("add_todo", {"task": "x"}) == 2
+
+
+def test_failed_unknown_and_expand_calls_keep_repeat_detection():
+    g = guard()
+    g.record(1, "list_todos", {}, {"success": True, "result": {"todos": []}})
+    g.record(2, "complete_todo", {"todo_id": 9}, {"success": True, "result": {"success": False, "message": "No todo"}})
+    g.record(3, "delete_todo", {"todo_id": 9}, {"success": False, "error": "boom"})
+    g.record(4, "no_such_tool", {}, {"success": False, "error": "Unknown tool"})
+    g.record(5, EXPAND_RESULT, {"ref": "r1"}, {"success": True, "result": {"todos": []}})
+    assert g.repeat_of("list_todos", {}) == 1
+
+
+def test_same_result_is_wasted_new_result_earns_a_step():
+    g = guard(max_steps=4)
+    g.classify("list_todos")
+    g.record(1, "list_todos", {}, {"success": True, "result": {"todos": []}})
+    assert (g.budget, g.wasted) == (STEP_BUDGETS["lookup"] + 1, 0)
+    g.record(2, "list_todos", {}, {"success": True, "result": {"todos": []}})
+    assert (g.budget, g.wasted) == (STEP_BUDGETS["lookup"] + 1, 1)
+    g.record(3, "get_habits", {}, {"success": True, "result": {"habits": []}})
+    g.record(4, "get_notes", {}, {"success": True, "result": {"notes": []}})
+    assert g.budget == 4
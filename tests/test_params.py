@@ -0,0 +1,58 @@
+import pytest
+from tools.params import InvalidParams, ParamValidator
+
+
+def update_todo(todo_id: int, task: str = "", priority: str = "normal", tags: list = None):
+    pass
+
+
+def flexible(name: str, **extra):
+    pass
+
+
+SCHEMA = {"todo_id": "integer (required)", "priority": "high | normal | low"}
+
+
+def problems(validator, params):
+    with pytest.raises(InvalidParams) as e:
+        validator.validate(params)
+    return e.value.problems
+
+
+def test_coerces_common_shapes():
+    validator = ParamValidator("update_todo", update_todo, SCHEMA)
+    assert validator.validate({"todo_id": "5", "task": 12, "tags": "a, b,"}) == {
+        "todo_id": 5, "task": "12", "tags": ["a", "b"],
+    }
+    assert validator.validate({"todo_id": 1, "tags": "solo"})["tags"] == ["solo"]
+
+
+def test_null_optional_means_default():
+    validator = ParamValidator("update_todo", update_todo, SCHEMA)
+    assert validator.validate({"todo_id": 3, "priority": None}) == {"todo_id": 3}
+
+
+def test_unknown_param_suggests_the_closest_name():
+    validator = ParamValidator("update_todo", update_todo, SCHEMA)
+    assert problems(validator, {"todo_id": 1, "prority": "high"}) == [
+        {"param": "prority", "problem": "unknown parameter", "did_you_mean": "priority"},
+    ]
+
+
+def test_missing_and_wrong_type_are_all_reported():
+    validator = ParamValidator("update_todo", update_todo, SCHEMA)
+    assert problems(validator, {}) == [{"param": "todo_id", "problem": "missing", "expected": "integer (required)"}]
+    [problem] = problems(validator, {"todo_id": "abc"})
+    assert problem["param"] == "todo_id"
+    assert problem["got"] == "abc"
+    assert problem["expected"] == "integer (required)"
+
+
+def test_params_must_be_an_object():
+    validator = ParamValidator("update_todo", update_todo, SCHEMA)
+    assert problems(validator, ["todo_id", 1]) == [{"problem": "params must be a JSON object"}]
+
+
+def test_var_keyword_accepts_extra_params():
+    validator = ParamValidator("flexible", flexible)
+    assert validator.validate({"name": "x", "color": "red"}) == {"name": "x", "color": "red"}
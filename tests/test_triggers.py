@@ -0,0 +1,82 @@
+import sqlite3
+from datetime import datetime
+from tools import productivity
+
+
+def query(db, sql, *args):
+    conn = sqlite3.connect(db)
+    rows = conn.execute(sql, args).fetchall()
+    conn.commit()
+    conn.close()
+    return rows
+
+
+def rollup(db, metric):
+    return dict(query(db, "SELECT key, SUM(count) FROM daily_rollup WHERE metric=? GROUP BY key", metric))
+
+
+def dirty(db):
+    return dict(query(db, "SELECT section, dirty FROM daily_summary"))
+
+
+def test_completion_rollup_follows_done(db):
+    tid = productivity.add_todo("ship it", priority="high")["id"]
+    productivity.add_todo("later")
+    assert rollup(db, "todos_completed") == {}
+
+    productivity.complete_todo(tid)
+    [(completed_at,)] = query(db, "SELECT completed_at FROM todos WHERE id=?", tid)
+    assert completed_at.startswith(datetime.utcnow().date().isoformat())
+    assert rollup(db, "todos_completed") == {0: 1}
+
+    query(db, "UPDATE todos SET done=0 WHERE id=?", tid)
+    assert query(db, "SELECT completed_at FROM todos WHERE id=?", tid) == [(None,)]
+    assert rollup(db, "todos_completed") == {0: 0}
+
+
+def test_completions_stay_counted_after_clear(db):
+    productivity.complete_todo(productivity.add_todo("a")["id"])
+    productivity.clear_completed()
+    assert query(db, "SELECT COUNT(*) FROM todos") == [(0,)]
+    review = productivity.get_review("week")["review"]
+    assert review["completed_count"] == 1
+    assert review["completed_by_priority"]["normal"] == 1
+
+
+def test_notes_and_habit_logs_roll_up(db):
+    query(db, "INSERT INTO notes (title, body, created_at) VALUES ('n', 'b', ?)", datetime.utcnow().isoformat())
+    assert rollup(db, "notes_created") == {0: 1}
+
+    hid = productivity.add_habit("read")["id"]
+    productivity.log_habit(hid)
+    productivity.log_habit(hid)
+    assert rollup(db, "habit_logs") == {hid: 1}
+    query(db, "DELETE FROM habit_logs WHERE habit_id=?", hid)
+    assert rollup(db, "habit_logs") == {hid: 0}
+
+
+def test_summary_rebuilds_only_the_section_that_changed(db):
+    productivity.add_todo("first")
+    summary = productivity.get_daily_summary()["daily_summary"]
+    assert summary["pending_todos"] == 1
+    assert set(dirty(db).values()) == {0}
+
+    productivity.add_todo("second", due_date="2000-01-01")
+    productivity.add_todo("someday", due_date="next week")
+    assert dirty(db) == {**dict.fromkeys(productivity.SUMMARY_SECTIONS, 0), "todos": 1}
+
+    summary = productivity.get_daily_summary()["daily_summary"]
+    assert summary["pending_todos"] == 3
+    assert summary["overdue_todos"] == 1
+    assert dirty(db)["todos"] == 0
+
+
+def test_stale_rebuild_does_not_overwrite_a_newer_one(db):
+    productivity._rebuild_summary_section("todos")
+    [(generation,)] = query(db, "SELECT generation FROM daily_summary WHERE section='todos'")
+    productivity.add_todo("meanwhile")
+    productivity._rebuild_summary_section("todos")
+    # A rebuild that started at the old generation finishing late must be a no-op.
+    query(db, "UPDATE daily_summary SET payload='[]' WHERE section='todos' AND generation=?", generation)
+    [(payload,)] = query(db, "SELECT payload FROM daily_summary WHERE section='todos'")
+    assert "meanwhile" in payload
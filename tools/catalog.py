@@ -0,0 +1,375 @@
+"""Every tool the agent can call, registered on the shared registry.
+
+Importing this module only fills in tools.registry.registry: no database setup,
+scheduler or network. main.py imports it to serve the app, and the replayer
+(python -m agent.recording) to rebuild the same tool catalog offline.
+"""
+from tools.registry import registry
+from tools.reducers import reducer
+from tools.summarizer import summarize_text
+from tools.chat_search import search_chats
+from tools.productivity import (
+    # Todos
+    add_todo, bulk_add_todos, list_todos, complete_todo,
+    bulk_complete_todos, delete_todo,
+    # Notes
+    add_note, get_notes, update_note, delete_note,
+    # Reminders
+    set_reminder, list_reminders, snooze_reminder, delete_reminder,
+    # Habits
+    add_habit, log_habit, get_habits, get_habit_stats, delete_habit,
+    # Google Auth
+    get_google_auth_url, google_auth_status,
+    # Google Calendar
+    list_events, create_event, delete_event, update_event,
+    # Gmail
+    get_unread_emails, send_email, get_email_summary,
+    # Cross-tool
+    get_daily_summary, get_priority_inbox, get_weekly_review, get_review, clear_completed,
+    # Slack
+    send_slack_message, send_slack_daily_summary,
+)
+
+# ── Summarization ──────────────────────────────────────
+registry.register(
+    name="summarize_text",
+    description="Summarizes a long piece of text concisely",
+    func=summarize_text,
+    schema={"text": "string"},
+    touches=(),
+)
+
+# ── Chat search ────────────────────────────────────────
+registry.register(
+    name="search_chats",
+    description="Search past messages in all chats by keyword. Use when the user asks what was said or decided earlier, or in another chat.",
+    func=search_chats,
+    schema={"query": "string keywords", "limit": "integer (optional, default 10)"},
+    read_only=True,
+    memoize=False,
+    touches=("history",),
+    reducer=reducer(max_items=10, drop=("message_id",)),
+)
+
+# ── Todos ──────────────────────────────────────────────
+registry.register(
+    name="add_todo",
+    description="Add a single todo. Automatically syncs to Google Tasks if connected.",
+    func=add_todo,
+    schema={"task": "string", "priority": "string low/normal/high (optional)", "due_date": "string YYYY-MM-DD (optional)"},
+    touches=("todos",),
+    reply='Done — added "{task}".',
+)
+registry.register(
+    name="bulk_add_todos",
+    description="Add multiple todos at once. Use when user lists 2 or more tasks. Each syncs to Google Tasks if connected.",
+    func=bulk_add_todos,
+    schema={"tasks": "list of strings or objects with task/priority/due_date"},
+    touches=("todos",),
+    terminal=True,
+)
+registry.register(
+    name="list_todos",
+    description="List all pending todos sorted by priority and due date. Flags overdue items.",
+    func=list_todos,
+    schema={},
+    read_only=True,
+    touches=("todos",),
+    reducer=reducer(max_items=30, drop=("google_task_id", "created_at")),
+)
+registry.register(
+    name="complete_todo",
+    description="Mark a single todo as complete. Syncs to Google Tasks if connected.",
+    func=complete_todo,
+    schema={"todo_id": "integer"},
+    touches=("todos",),
+    idempotent=True,
+    reply="Done — marked complete.",
+)
+registry.register(
+    name="bulk_complete_todos",
+    description="Mark multiple todos complete at once. Syncs to Google Tasks if connected.",
+    func=bulk_complete_todos,
+    schema={"todo_ids": "list of integers"},
+    touches=("todos",),
+    idempotent=True,
+    terminal=True,
+)
+registry.register(
+    name="delete_todo",
+    description="Delete a todo. Also removes from Google Tasks if connected.",
+    func=delete_todo,
+    schema={"todo_id": "integer"},
+    touches=("todos",),
+    idempotent=True,
+    reply="Done — deleted.",
+)
+
+# ── Notes ──────────────────────────────────────────────
+registry.register(
+    name="add_note",
+    description="Save a note with title, body, optional tags. Auto-summarizes long notes.",
+    func=add_note,
+    schema={"title": "string", "body": "string", "tags": "string comma separated (optional)"},
+    touches=("notes",),
+    reply='Saved note "{title}".',
+)
+registry.register(
+    name="get_notes",
+    description="Retrieve notes. Optionally filter by keyword or tag.",
+    func=get_notes,
+    schema={"keyword": "string (optional)", "tag": "string (optional)"},
+    read_only=True,
+    touches=("notes",),
+    reducer=reducer(max_items=10, max_text=160, drop=("created_at",)),
+)
+registry.register(
+    name="update_note",
+    description="Update an existing note's title or body by its ID.",
+    func=update_note,
+    schema={"note_id": "integer", "title": "string (optional)", "body": "string (optional)"},
+    touches=("notes",),
+    idempotent=True,
+    terminal=True,
+)
+registry.register(
+    name="delete_note",
+    description="Delete a note by its ID.",
+    func=delete_note,
+    schema={"note_id": "integer"},
+    touches=("notes",),
+    idempotent=True,
+    terminal=True,
+)
+
+# ── Reminders ──────────────────────────────────────────
+registry.register(
+    name="set_reminder",
+    description="Set a reminder that fires at the given time with optional Slack notification. remind_at: YYYY-MM-DD HH:MM. recurrence: none | daily | weekly",
+    func=set_reminder,
+    schema={"message": "string", "remind_at": "string YYYY-MM-DD HH:MM", "recurrence": "string (optional)"},
+    touches=("reminders",),
+    terminal=True,
+)
+registry.register(
+    name="list_reminders",
+    description="List all upcoming reminders.",
+    func=list_reminders,
+    schema={},
+    read_only=True,
+    touches=("reminders",),
+    reducer=reducer(max_items=20),
+)
+registry.register(
+    name="snooze_reminder",
+    description="Push a reminder forward by X minutes.",
+    func=snooze_reminder,
+    schema={"reminder_id": "integer", "minutes": "integer (optional, default 15)"},
+    touches=("reminders",),
+    terminal=True,
+)
+registry.register(
+    name="delete_reminder",
+    description="Delete a reminder by its ID.",
+    func=delete_reminder,
+    schema={"reminder_id": "integer"},
+    touches=("reminders",),
+    idempotent=True,
+    terminal=True,
+)
+
+# ── Habits ──────────────────────────────────────────────
+registry.register(
+    name="add_habit",
+    description="Start tracking a new habit. frequency: daily | weekly",
+    func=add_habit,
+    schema={"name": "string", "frequency": "string daily/weekly (optional, default daily)"},
+    touches=("habits",),
+    terminal=True,
+)
+registry.register(
+    name="log_habit",
+    description="Mark a habit as done for today by its ID.",
+    func=log_habit,
+    schema={"habit_id": "integer"},
+    touches=("habit_logs",),
+    idempotent=True,
+    terminal=True,
+)
+registry.register(
+    name="get_habits",
+    description="Show all tracked habits with current streaks and today's completion status.",
+    func=get_habits,
+    schema={},
+    read_only=True,
+    touches=("habits", "habit_logs"),
+    reducer=reducer(max_items=20),
+)
+registry.register(
+    name="get_habit_stats",
+    description="Habit analytics: current and longest streak (in weeks for weekly habits), completion rate, weekday distribution and a heatmap of Monday-Sunday weeks. habit_id 0 = all habits; days = period length (default 365).",
+    func=get_habit_stats,
+    schema={"habit_id": "integer (optional, default all)", "days": "integer (optional, default 365)"},
+    read_only=True,
+    touches=("habits", "habit_logs"),
+    reducer=reducer(max_items=53),
+)
+registry.register(
+    name="delete_habit",
+    description="Stop tracking a habit by its ID.",
+    func=delete_habit,
+    schema={"habit_id": "integer"},
+    touches=("habits", "habit_logs"),
+    idempotent=True,
+    terminal=True,
+)
+
+# ── Google Auth ────────────────────────────────────────
+registry.register(
+    name="get_google_auth_url",
+    description="Get the Google OAuth URL so the user can connect their Google account. Use when user says 'connect Google' or Google tools fail.",
+    func=get_google_auth_url,
+    schema={},
+    touches=(),
+)
+registry.register(
+    name="google_auth_status",
+    description="Check if Google account is connected.",
+    func=google_auth_status,
+    schema={},
+    read_only=True,
+    touches=("google",),
+)
+
+# ── Google Calendar ────────────────────────────────────
+registry.register(
+    name="list_events",
+    description="List upcoming Google Calendar events. days_ahead: how many days to look ahead (default 7).",
+    func=list_events,
+    schema={"days_ahead": "integer (optional, default 7)"},
+    read_only=True,
+    memoize=False,
+    touches=("calendar",),
+    reducer=reducer(max_items=15, max_text=120),
+)
+registry.register(
+    name="create_event",
+    description="Create a Google Calendar event. date: YYYY-MM-DD, time: HH:MM, duration_minutes: optional.",
+    func=create_event,
+    schema={"title": "string", "date": "string YYYY-MM-DD", "time": "string HH:MM (optional)", "duration_minutes": "integer (optional)", "description": "string (optional)"},
+    touches=("calendar",),
+    terminal=True,
+)
+registry.register(
+    name="delete_event",
+    description="Delete a Google Calendar event by its ID.",
+    func=delete_event,
+    schema={"event_id": "string"},
+    touches=("calendar",),
+    idempotent=True,
+    terminal=True,
+)
+registry.register(
+    name="update_event",
+    description="Update a Google Calendar event's title, date, or time.",
+    func=update_event,
+    schema={"event_id": "string", "title": "string (optional)", "date": "string YYYY-MM-DD (optional)", "time": "string HH:MM (optional)", "duration_minutes": "integer (optional)"},
+    touches=("calendar",),
+    idempotent=True,
+    terminal=True,
+)
+
+# ── Gmail ──────────────────────────────────────────────
+registry.register(
+    name="get_unread_emails",
+    description="Get unread emails from Gmail inbox.",
+    func=get_unread_emails,
+    schema={"max_results": "integer (optional, default 5)"},
+    read_only=True,
+    memoize=False,
+    touches=("gmail",),
+    reducer=reducer(max_text=120),
+)
+registry.register(
+    name="get_email_summary",
+    description="Get a quick summary of unread emails — who they're from and subjects.",
+    func=get_email_summary,
+    schema={},
+    read_only=True,
+    memoize=False,
+    touches=("gmail",),
+    reducer=reducer(max_text=1000, drop=("snippet",)),
+)
+registry.register(
+    name="send_email",
+    description="Send an email via Gmail.",
+    func=send_email,
+    schema={"to": "string email address", "subject": "string", "body": "string"},
+    touches=(),
+    terminal=True,
+)
+
+# ── Cross-tool ─────────────────────────────────────────
+registry.register(
+    name="get_daily_summary",
+    description="Full picture of the day: todos, reminders, calendar events, habits, recent notes. Use when user asks what's on their plate or what they have today.",
+    func=get_daily_summary,
+    schema={},
+    read_only=True,
+    memoize=False,
+    touches=("todos", "reminders", "habits", "habit_logs", "notes", "calendar"),
+    reducer=reducer(max_items=8, max_text=120, drop=("google_task_id", "created_at", "description")),
+)
+registry.register(
+    name="get_priority_inbox",
+    description="What should I focus on right now? Returns top 5 items ranked by urgency, overdue status, and priority.",
+    func=get_priority_inbox,
+    schema={"limit": "integer (optional, default 5)"},
+    read_only=True,
+    touches=("todos",),
+    reducer=reducer(drop=("google_task_id", "created_at")),
+)
+registry.register(
+    name="get_weekly_review",
+    description="Summary of the past 7 days: completed todos, notes created, habits tracked.",
+    func=get_weekly_review,
+    schema={},
+    read_only=True,
+    touches=("todos", "notes", "habits", "habit_logs"),
+    reducer=reducer(max_items=15),
+)
+registry.register(
+    name="get_review",
+    description="Activity over a longer range: todos completed (by priority), notes created and habit completion rates, with a timeline. period: week | month | year",
+    func=get_review,
+    schema={"period": "string week/month/year (optional, default week)"},
+    read_only=True,
+    touches=("todos", "notes", "habits", "habit_logs"),
+    reducer=reducer(max_items=31),
+)
+registry.register(
+    name="clear_completed",
+    description="Clean up by deleting all completed todos and fired reminders.",
+    func=clear_completed,
+    schema={},
+    touches=("todos", "reminders"),
+    terminal=True,
+)
+
+# ── Slack ──────────────────────────────────────────────
+registry.register(
+    name="send_slack_message",
+    description="Send a custom message to Slack.",
+    func=send_slack_message,
+    schema={"message": "string"},
+    touches=(),
+    terminal=True,
+)
+registry.register(
+    name="send_slack_daily_summary",
+    description="Push the full daily summary including calendar events and habits to Slack.",
+    func=send_slack_daily_summary,
+    schema={},
+    touches=(),
+    terminal=True,
+)
@@ -0,0 +1,9 @@
+from memory import search_history
+
+
+def search_chats(query: str, limit: int = 10) -> dict:
+    """Find past messages across all chats by keyword."""
+    hits = search_history(query, limit=limit)
+    if not hits:
+        return {"success": True, "results": [], "message": f"No messages matching '{query}'"}
+    return {"success": True, "results": hits}
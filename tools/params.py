@@ -0,0 +1,97 @@
+import difflib
+import inspect
+from typing import Annotated, Any
+from pydantic import BeforeValidator, ConfigDict, ValidationError, create_model
+
+
+class InvalidParams(Exception):
+    def __init__(self, tool_name: str, problems: list):
+        super().__init__(f"Invalid parameters for {tool_name}")
+        self.problems = problems
+
+
+def _split_list(value):
+    """'a, b' -> ['a', 'b']; a lone value -> [value]."""
+    if isinstance(value, str):
+        return [part.strip() for part in value.split(",") if part.strip()]
+    if value is not None and not isinstance(value, (list, tuple, set)):
+        return [value]
+    return value
+
+
+def _to_str(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+# Pydantic's lax mode already turns "5" into 5 for int fields; these cover the
+# other shapes the model commonly sends.
+_COERCIONS = {list: _split_list, str: _to_str}
+
+
+class ParamValidator:
+    """A tool's parameters, compiled once from its function signature.
+
+    validate() coerces what it safely can and returns the keyword arguments to
+    call the tool with; otherwise it raises InvalidParams listing every problem
+    (missing, unknown with a did_you_mean, or wrong type with the expected schema).
+    """
+
+    def __init__(self, tool_name: str, func, schema: dict = None):
+        self.tool_name = tool_name
+        self.schema = schema or {}
+        self.optional = set()
+        fields = {}
+        accepts_extra = False
+
+        for param in inspect.signature(func).parameters.values():
+            if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+                accepts_extra = True
+                continue
+            annotation = param.annotation
+            if annotation is param.empty or isinstance(annotation, str):
+                annotation = Any
+            coerce = _COERCIONS.get(getattr(annotation, "__origin__", annotation))
+            if coerce:
+                annotation = Annotated[annotation, BeforeValidator(coerce)]
+            if param.default is param.empty:
+                fields[param.name] = (annotation, ...)
+            else:
+                fields[param.name] = (annotation, param.default)
+                self.optional.add(param.name)
+
+        self.names = list(fields)
+        self.model = create_model(
+            f"{tool_name}_params",
+            __config__=ConfigDict(extra="allow" if accepts_extra else "forbid"),
+            **fields,
+        )
+
+    def validate(self, params: dict) -> dict:
+        if not isinstance(params, dict):
+            raise InvalidParams(self.tool_name, [{"problem": "params must be a JSON object"}])
+        # null for an optional param means "use the default"
+        params = {k: v for k, v in params.items() if not (v is None and k in self.optional)}
+        try:
+            return self.model.model_validate(params).model_dump(exclude_unset=True)
+        except ValidationError as e:
+            raise InvalidParams(self.tool_name, [self._describe(error, params) for error in e.errors()]) from None
+
+    def _describe(self, error: dict, params: dict) -> dict:
+        name = str(error["loc"][0]) if error["loc"] else ""
+        if error["type"] == "extra_forbidden":
+            problem = {"param": name, "problem": "unknown parameter"}
+            unused = [n for n in self.names if n not in params]
+            match = difflib.get_close_matches(name, unused or self.names, n=1, cutoff=0.6)
+            if match:
+                problem["did_you_mean"] = match[0]
+            return problem
+        if error["type"] == "missing":
+            return {"param": name, "problem": "missing", "expected": self.schema.get(name, "required")}
+        return {
+            "param": name,
+            "problem": error["msg"],
+            "got": error.get("input"),
+            "expected": self.schema.get(name, ""),
+        }
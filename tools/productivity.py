@@ -1,11 +1,15 @@
 import sqlite3
 import asyncio
 import os
+import re
 import json
 import httpx
 from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 from llm.groq_client import generate
+from tracing import traced
+from events import publish
+from tools.registry import registry
 
 try:
     from dotenv import load_dotenv
@@ -24,11 +28,22 @@ except ImportError:
     GOOGLE_AVAILABLE = False
     print("Google libraries not installed. Run: pip install google-auth google-auth-oauthlib google-auth-httplib2 google-api-python-client")
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
 DB_PATH = "memory.db"
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL", "")
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET", "")
 GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI", "http://localhost:8000/auth/google/callback")
+# Point the Google clients at another host (e.g. the benchmark fakes). Empty = Google's own endpoints.
+GOOGLE_API_ENDPOINT = os.getenv("GOOGLE_API_ENDPOINT", "")
+# Hour (server local time) the scheduler precomputes the daily summary, and how often its calendar part refreshes
+DAILY_SUMMARY_HOUR = int(os.getenv("DAILY_SUMMARY_HOUR", "6"))
+DAILY_SUMMARY_CALENDAR_MINUTES = int(os.getenv("DAILY_SUMMARY_CALENDAR_MINUTES", "30"))
 CREDENTIALS_FILE = "credentials.json"
 TOKEN_FILE = "google_token.json"
 
@@ -49,6 +64,17 @@ scheduler = BackgroundScheduler()
 def start_scheduler():
     scheduler.start()
     _reload_pending_reminders()
+    scheduler.add_job(
+        refresh_daily_summary, "cron",
+        hour=DAILY_SUMMARY_HOUR, minute=0,
+        id="daily_summary", replace_existing=True,
+    )
+    if DAILY_SUMMARY_CALENDAR_MINUTES > 0:
+        scheduler.add_job(
+            refresh_daily_summary, "interval",
+            minutes=DAILY_SUMMARY_CALENDAR_MINUTES, args=[("calendar",)],
+            id="daily_summary_calendar", replace_existing=True,
+        )
 
 
 def _reload_pending_reminders():
@@ -79,6 +105,7 @@ def _reload_pending_reminders():
 # SLACK
 # ─────────────────────────────────────────
 
+@traced("slack.send")
 def _send_slack(message: str, blocks: list = None) -> bool:
     if not SLACK_WEBHOOK_URL:
         print(f"SLACK_WEBHOOK_URL not set. Message: {message}")
@@ -108,6 +135,7 @@ def _fire_reminder(reminder_id: int, message: str):
     slack_sent = _send_slack(f"Reminder: {message}", blocks=blocks)
     status = "Slack sent" if slack_sent else "Slack failed"
     print(f"\nREMINDER [{reminder_id}]: {message} | {status}\n")
+    publish({"type": "reminder", "id": reminder_id, "message": message})
 
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
@@ -133,6 +161,8 @@ def _fire_reminder(reminder_id: int, message: str):
         cur.execute("UPDATE reminders SET done=1 WHERE id=?", (reminder_id,))
         conn.commit()
         conn.close()
+    # The reminder changed outside any tool call, so the registry did not see it.
+    registry.invalidate("reminders")
 
 
 # ─────────────────────────────────────────
@@ -161,6 +191,20 @@ def init_productivity_db():
     except Exception:
         pass
 
+    # Numeric priority (PRIORITY_ORDER) computed by SQLite, so ranking queries
+    # can sort and seek on an index instead of loading every todo into Python.
+    try:
+        cur.execute(f"ALTER TABLE todos ADD COLUMN priority_rank INTEGER GENERATED ALWAYS AS ({PRIORITY_RANK_SQL}) VIRTUAL")
+    except Exception:
+        pass
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_todos_pending ON todos(priority_rank, {DUE_KEY_SQL}) WHERE done=0")
+
+    try:
+        cur.execute("ALTER TABLE todos ADD COLUMN completed_at TEXT")
+    except Exception:
+        pass
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_todos_completed_at ON todos(completed_at) WHERE completed_at IS NOT NULL")
+
     cur.execute("""
         CREATE TABLE IF NOT EXISTS notes (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -202,14 +246,135 @@ def init_productivity_db():
         )
     """)
 
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_notes_created_at ON notes(created_at)")
+    # Edited notes to re-embed; semantic_memory's sync drains this queue.
+    cur.execute("CREATE TABLE IF NOT EXISTS notes_reindex (note_id INTEGER PRIMARY KEY)")
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS notes_reindex_on_update AFTER UPDATE OF title, body ON notes BEGIN
+            INSERT OR IGNORE INTO notes_reindex (note_id) VALUES (new.id);
+        END
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_habit_logs_habit_day ON habit_logs(habit_id, logged_date)")
+    _init_rollups(cur)
+
+    # Daily summary snapshot, one row per section. Triggers flag a section dirty
+    # when its tables change; readers rebuild only dirty sections (see below).
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS daily_summary (
+            section TEXT PRIMARY KEY,
+            payload TEXT,
+            day TEXT,
+            dirty INTEGER DEFAULT 1,
+            generation INTEGER DEFAULT 0,
+            updated_at TEXT
+        )
+    """)
+    cur.executemany(
+        "INSERT OR IGNORE INTO daily_summary (section) VALUES (?)",
+        [(section,) for section in SUMMARY_SECTIONS],
+    )
+    for section, tables in SUMMARY_TABLES.items():
+        for table in tables:
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                cur.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS daily_summary_{table}_{event.lower()} AFTER {event} ON {table} BEGIN
+                        UPDATE daily_summary SET dirty=1 WHERE section='{section}' AND dirty=0;
+                    END
+                """)
+
     conn.commit()
     conn.close()
 
 
+def _init_rollups(cur):
+    """daily_rollup: per-day counts kept up to date by triggers, for reviews over any range.
+
+    metric/key: todos_completed/priority_rank, notes_created/0, habit_logs/habit_id.
+    Completions and notes stay counted after the rows are deleted (clear_completed,
+    delete_note); habit logs go away with their habit.
+    """
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name='daily_rollup'")
+    exists = cur.fetchone() is not None
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            day TEXT,
+            metric TEXT,
+            key INTEGER DEFAULT 0,
+            count INTEGER DEFAULT 0,
+            PRIMARY KEY (day, metric, key)
+        ) WITHOUT ROWID
+    """)
+
+    def bump(day, metric, key, delta):
+        return f"""
+            INSERT INTO daily_rollup (day, metric, key, count) VALUES ({day}, '{metric}', {key}, {delta})
+            ON CONFLICT (day, metric, key) DO UPDATE SET count = count + ({delta});
+        """
+
+    now = "strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS rollup_todo_completed AFTER UPDATE OF done ON todos
+        WHEN new.done = 1 AND old.done = 0 BEGIN
+            UPDATE todos SET completed_at = COALESCE(new.completed_at, {now}) WHERE id = new.id;
+            {bump("date(COALESCE(new.completed_at, 'now'))", "todos_completed", "new.priority_rank", 1)}
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS rollup_todo_reopened AFTER UPDATE OF done ON todos
+        WHEN new.done = 0 AND old.done = 1 AND old.completed_at IS NOT NULL BEGIN
+            UPDATE todos SET completed_at = NULL WHERE id = new.id;
+            {bump("date(old.completed_at)", "todos_completed", "old.priority_rank", -1)}
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS rollup_todo_inserted_done AFTER INSERT ON todos
+        WHEN new.done = 1 BEGIN
+            UPDATE todos SET completed_at = COALESCE(new.completed_at, new.created_at, {now}) WHERE id = new.id;
+            {bump("date(COALESCE(new.completed_at, new.created_at, 'now'))", "todos_completed", "new.priority_rank", 1)}
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS rollup_note_created AFTER INSERT ON notes BEGIN
+            {bump("date(COALESCE(new.created_at, 'now'))", "notes_created", 0, 1)}
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS rollup_habit_logged AFTER INSERT ON habit_logs BEGIN
+            {bump("new.logged_date", "habit_logs", "new.habit_id", 1)}
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS rollup_habit_unlogged AFTER DELETE ON habit_logs BEGIN
+            {bump("old.logged_date", "habit_logs", "old.habit_id", -1)}
+        END
+    """)
+
+    if not exists:
+        # Backfill. Completion times were never recorded before this table
+        # existed, so old completed todos count on the day they were created.
+        cur.execute("UPDATE todos SET completed_at = created_at WHERE done = 1 AND completed_at IS NULL")
+        cur.execute("""
+            INSERT INTO daily_rollup (day, metric, key, count)
+            SELECT date(completed_at), 'todos_completed', priority_rank, COUNT(*)
+            FROM todos WHERE done = 1 AND date(completed_at) IS NOT NULL GROUP BY 1, 3
+        """)
+        cur.execute("""
+            INSERT INTO daily_rollup (day, metric, key, count)
+            SELECT date(created_at), 'notes_created', 0, COUNT(*)
+            FROM notes WHERE date(created_at) IS NOT NULL GROUP BY 1
+        """)
+        cur.execute("""
+            INSERT INTO daily_rollup (day, metric, key, count)
+            SELECT logged_date, 'habit_logs', habit_id, COUNT(*)
+            FROM habit_logs WHERE logged_date IS NOT NULL GROUP BY 1, 3
+        """)
+
+
 # ─────────────────────────────────────────
 # GOOGLE AUTH
 # ─────────────────────────────────────────
 
+@traced("google.credentials")
 def _get_google_creds() -> "Credentials | None":
     """Load and refresh Google credentials from token file."""
     if not GOOGLE_AVAILABLE:
@@ -277,6 +442,7 @@ def complete_google_auth(code: str) -> dict:
         creds = flow.credentials
         with open(TOKEN_FILE, "w") as f:
             f.write(creds.to_json())
+        _mark_summary_dirty("calendar")
         return {"success": True, "message": "Google account connected successfully"}
     except Exception as e:
         return {"success": False, "message": str(e)}
@@ -290,17 +456,25 @@ def google_auth_status() -> dict:
     return {"success": True, "connected": False, "message": "Google not connected. Ask me to connect Google to get started."}
 
 
+def _build_google_service(api: str, version: str, creds):
+    if GOOGLE_API_ENDPOINT:
+        return build(api, version, credentials=creds, client_options={"api_endpoint": GOOGLE_API_ENDPOINT})
+    return build(api, version, credentials=creds)
+
+
 # ─────────────────────────────────────────
 # GOOGLE TASKS HELPERS
 # ─────────────────────────────────────────
 
+@traced("google.tasks.build")
 def _get_tasks_service():
     creds = _get_google_creds()
     if not creds:
         return None
-    return build("tasks", "v1", credentials=creds)
+    return _build_google_service("tasks", "v1", creds)
 
 
+@traced("google.tasks.default_list")
 def _get_default_tasklist_id(service) -> str:
     """Get the ID of the default Google Tasks list."""
     try:
@@ -313,13 +487,17 @@ def _get_default_tasklist_id(service) -> str:
     return "@default"
 
 
-def _create_google_task(task: str, due_date: str = "") -> str | None:
-    """Create a task in Google Tasks, return the task ID."""
-    service = _get_tasks_service()
+@traced("google.tasks.create")
+def _create_google_task(task: str, due_date: str = "", service=None, tasklist_id: str = None) -> str | None:
+    """Create a task in Google Tasks, return the task ID.
+
+    Bulk callers pass a service and tasklist_id built once for the whole batch.
+    """
+    service = service or _get_tasks_service()
     if not service:
         return None
     try:
-        tasklist_id = _get_default_tasklist_id(service)
+        tasklist_id = tasklist_id or _get_default_tasklist_id(service)
         body = {"title": task}
         if due_date:
             try:
@@ -334,9 +512,10 @@ def _create_google_task(task: str, due_date: str = "") -> str | None:
         return None
 
 
-def _complete_google_task(google_task_id: str) -> bool:
+@traced("google.tasks.complete")
+def _complete_google_task(google_task_id: str, service=None) -> bool:
     """Mark a Google Task as complete."""
-    service = _get_tasks_service()
+    service = service or _get_tasks_service()
     if not service:
         return False
     try:
@@ -350,6 +529,7 @@ def _complete_google_task(google_task_id: str) -> bool:
         return False
 
 
+@traced("google.tasks.delete")
 def _delete_google_task(google_task_id: str) -> bool:
     """Delete a Google Task."""
     service = _get_tasks_service()
@@ -368,7 +548,26 @@ def _delete_google_task(google_task_id: str) -> bool:
 # ─────────────────────────────────────────
 
 PRIORITY_ORDER = {"high": 0, "normal": 1, "low": 2}
+PRIORITY_RANK_SQL = "CASE priority WHEN 'high' THEN 0 WHEN 'low' THEN 2 ELSE 1 END"
+# Sort key for due dates: ISO strings compare in date order, undated todos last.
+DUE_KEY_SQL = "COALESCE(NULLIF(due_date, ''), '9999')"
+# Only ISO dates can be overdue; free text like "next week" has no date order.
+ISO_DUE_SQL = "due_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'"
+ISO_DUE = re.compile(r"\d{4}-\d{2}-\d{2}")
+TODO_COLUMNS = "id, task, priority, due_date, google_task_id, created_at"
+
 
+def _todo_from_row(row, today: str) -> dict:
+    tid, task, priority, due_date, google_task_id, created_at = row
+    return {
+        "id": tid,
+        "task": task,
+        "priority": priority,
+        "due_date": due_date or "none",
+        "overdue": bool(due_date and ISO_DUE.match(due_date)) and due_date < today,
+        "google_task_id": google_task_id,
+        "created_at": created_at,
+    }
 
 def add_todo(task: str, priority: str = "normal", due_date: str = "") -> dict:
     """Add a todo and sync to Google Tasks if connected."""
@@ -396,75 +595,90 @@ def add_todo(task: str, priority: str = "normal", due_date: str = "") -> dict:
 
 def bulk_add_todos(tasks: list) -> dict:
     """Add multiple todos at once, each synced to Google Tasks."""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    added = []
-
-    for item in tasks:
+    rows = []
+    skipped = []
+    for index, item in enumerate(tasks):
         if isinstance(item, str):
             task, priority, due_date = item, "normal", ""
-        else:
+        elif isinstance(item, dict):
             task = item.get("task", "")
-            priority = item.get("priority", "normal")
+            priority = item.get("priority", "normal") or "normal"
             due_date = item.get("due_date", "") or ""
-
+        else:
+            task = ""
         if not task:
+            skipped.append(index)
             continue
+        rows.append((task, priority, due_date))
 
-        google_task_id = _create_google_task(task, due_date)
-        cur.execute(
-            "INSERT INTO todos (task, priority, due_date, google_task_id, created_at) VALUES (?, ?, ?, ?, ?)",
-            (task, priority, due_date or None, google_task_id, datetime.utcnow().isoformat()),
-        )
-        added.append({"id": cur.lastrowid, "task": task, "priority": priority, "google_synced": bool(google_task_id)})
+    if not rows:
+        return {"success": False, "message": "No valid tasks to add", "skipped": skipped}
 
+    # One short write transaction; the ids are read back inside it, while the
+    # write lock keeps anyone else from inserting between our rows.
+    created_at = datetime.utcnow().isoformat()
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM todos")
+    last_id = cur.fetchone()[0]
+    cur.executemany(
+        "INSERT INTO todos (task, priority, due_date, created_at) VALUES (?, ?, ?, ?)",
+        [(task, priority, due_date or None, created_at) for task, priority, due_date in rows],
+    )
+    cur.execute("SELECT id FROM todos WHERE id > ? ORDER BY id", (last_id,))
+    ids = [r[0] for r in cur.fetchall()]
     conn.commit()
     conn.close()
 
+    # Remote sync after the commit: a slow Google call never holds the database.
+    google_ids = [None] * len(rows)
+    service = _get_tasks_service()
+    if service:
+        tasklist_id = _get_default_tasklist_id(service)
+        google_ids = [
+            _create_google_task(task, due_date, service=service, tasklist_id=tasklist_id)
+            for task, _, due_date in rows
+        ]
+        synced_rows = [(gid, tid) for gid, tid in zip(google_ids, ids) if gid]
+        if synced_rows:
+            conn = sqlite3.connect(DB_PATH)
+            conn.executemany("UPDATE todos SET google_task_id=? WHERE id=?", synced_rows)
+            conn.commit()
+            conn.close()
+
+    added = [
+        {"id": tid, "task": task, "priority": priority, "google_synced": bool(gid)}
+        for tid, (task, priority, _), gid in zip(ids, rows, google_ids)
+    ]
     synced = sum(1 for t in added if t["google_synced"])
     msg = f"Added {len(added)} todos"
     if synced:
         msg += f" ({synced} synced to Google Tasks)"
+        publish({"type": "google_sync", "service": "tasks", "synced": synced})
+    if skipped:
+        msg += f" — skipped {len(skipped)} entries without a task"
 
-    return {"success": True, "message": msg, "todos": added}
+    result = {"success": True, "message": msg, "todos": added}
+    if skipped:
+        result["skipped"] = skipped
+    return result
 
 
 def list_todos() -> dict:
     """List all pending todos sorted by priority then due date."""
+    today = datetime.utcnow().date().isoformat()
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
-    cur.execute("SELECT id, task, priority, due_date, google_task_id, created_at FROM todos WHERE done=0")
+    # Walks idx_todos_pending in order: no sort step.
+    cur.execute(f"SELECT {TODO_COLUMNS} FROM todos WHERE done=0 ORDER BY priority_rank, {DUE_KEY_SQL}")
     rows = cur.fetchall()
     conn.close()
 
     if not rows:
         return {"success": True, "todos": [], "message": "No pending todos"}
 
-    now = datetime.utcnow().date()
-    todos = []
-    for r in rows:
-        tid, task, priority, due_date, google_task_id, created_at = r
-        overdue = False
-        if due_date:
-            try:
-                overdue = datetime.fromisoformat(due_date).date() < now
-            except Exception:
-                pass
-        todos.append({
-            "id": tid,
-            "task": task,
-            "priority": priority,
-            "due_date": due_date or "none",
-            "overdue": overdue,
-            "google_task_id": google_task_id,
-            "created_at": created_at,
-        })
-
-    todos.sort(key=lambda x: (
-        PRIORITY_ORDER.get(x["priority"], 1),
-        x["due_date"] if x["due_date"] != "none" else "9999",
-    ))
-
+    todos = [_todo_from_row(r, today) for r in rows]
     overdue_count = sum(1 for t in todos if t["overdue"])
     return {"success": True, "todos": todos, "overdue_count": overdue_count}
 
@@ -496,28 +710,79 @@ def complete_todo(todo_id: int) -> dict:
     return {"success": True, "message": msg, "google_synced": google_synced}
 
 
+# UPDATE ... RETURNING needs SQLite 3.35+
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+SQL_BATCH = 500  # ids per IN (...) — well under SQLite's bound-parameter limit
+
+
+def _mark_todos_done(cur, ids: list) -> dict:
+    """Set done=1 on pending todos among ids. Returns {id: google_task_id} of the rows it changed."""
+    marks = ",".join("?" * len(ids))
+    if _HAS_RETURNING:
+        cur.execute(f"UPDATE todos SET done=1 WHERE id IN ({marks}) AND done=0 RETURNING id, google_task_id", ids)
+        return dict(cur.fetchall())
+    cur.execute(f"SELECT id, google_task_id FROM todos WHERE id IN ({marks}) AND done=0", ids)
+    changed = dict(cur.fetchall())
+    cur.execute(f"UPDATE todos SET done=1 WHERE id IN ({marks}) AND done=0", ids)
+    return changed
+
+
 def bulk_complete_todos(todo_ids: list) -> dict:
     """Mark multiple todos complete and sync to Google Tasks."""
+    ids = []
+    invalid = []
+    for value in todo_ids:
+        try:
+            tid = int(value)
+        except (TypeError, ValueError):
+            invalid.append(value)
+            continue
+        if tid not in ids:
+            ids.append(tid)
+
+    completed = {}
+    existing = set()
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
-
-    google_synced = 0
-    for tid in todo_ids:
-        cur.execute("SELECT google_task_id FROM todos WHERE id=?", (tid,))
-        row = cur.fetchone()
-        if row and row[0]:
-            if _complete_google_task(row[0]):
-                google_synced += 1
-        cur.execute("UPDATE todos SET done=1 WHERE id=?", (tid,))
-
+    for start in range(0, len(ids), SQL_BATCH):
+        batch = ids[start:start + SQL_BATCH]
+        changed = _mark_todos_done(cur, batch)
+        completed.update(changed)
+        rest = [tid for tid in batch if tid not in changed]
+        if rest:
+            cur.execute(f"SELECT id FROM todos WHERE id IN ({','.join('?' * len(rest))})", rest)
+            existing.update(r[0] for r in cur.fetchall())
     conn.commit()
     conn.close()
 
-    msg = f"Completed {len(todo_ids)} todos"
-    if google_synced:
-        msg += f" ({google_synced} synced to Google Tasks)"
+    # Remote sync after the commit, with one Tasks client for the whole batch.
+    synced = set()
+    if any(completed.values()):
+        service = _get_tasks_service()
+        if service:
+            synced = {tid for tid, gid in completed.items() if gid and _complete_google_task(gid, service=service)}
+
+    results = []
+    for tid in ids:
+        if tid in completed:
+            results.append({"id": tid, "status": "completed", "google_synced": tid in synced})
+        elif tid in existing:
+            results.append({"id": tid, "status": "already_done"})
+        else:
+            results.append({"id": tid, "status": "not_found"})
+    results += [{"id": value, "status": "invalid_id"} for value in invalid]
 
-    return {"success": True, "message": msg}
+    not_found = [r["id"] for r in results if r["status"] in ("not_found", "invalid_id")]
+    msg = f"Completed {len(completed)} todos"
+    if synced:
+        msg += f" ({len(synced)} synced to Google Tasks)"
+        publish({"type": "google_sync", "service": "tasks", "synced": len(synced)})
+    if existing:
+        msg += f"; {len(existing)} already done"
+    if not_found:
+        msg += f"; not found: {', '.join(str(i) for i in not_found)}"
+
+    return {"success": bool(completed) or not not_found, "message": msg, "results": results}
 
 
 def delete_todo(todo_id: int) -> dict:
@@ -556,7 +821,7 @@ async def add_note(title: str, body: str, tags: str = "") -> dict:
     summary = ""
     if len(body.split()) > 40:
         try:
-            summary = await generate(f"Summarize in one sentence:\n\n{body}")
+            summary = await generate(f"Summarize in one sentence:\n\n{body}", priority="background", purpose="note_summary")
             summary = summary.strip()
         except Exception:
             summary = ""
@@ -835,6 +1100,134 @@ def get_habits() -> dict:
     return {"success": True, "habits": result}
 
 
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def _week_of(days):
+    """Monday-based week number of day numbers (days since 1970-01-01, a Thursday)."""
+    return (days + 3) // 7
+
+
+def get_habit_stats(habit_id: int = 0, days: int = 365) -> dict:
+    """Longest/current streak, completion rate, weekday distribution and heatmap per habit.
+
+    Weekly habits count in weeks: one log in a Monday-Sunday week keeps the streak.
+    All habits are computed together over one sorted (habit, day) array.
+    """
+    if not NUMPY_AVAILABLE:
+        return {"success": False, "message": "NumPy not installed. Run: pip install numpy"}
+    days = max(7, min(int(days), 3660))
+
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    if habit_id:
+        cur.execute("SELECT id, name, frequency, created_at FROM habits WHERE id=?", (habit_id,))
+    else:
+        cur.execute("SELECT id, name, frequency, created_at FROM habits ORDER BY id")
+    habits = cur.fetchall()
+    if not habits:
+        conn.close()
+        if habit_id:
+            return {"success": False, "message": f"No habit found with id {habit_id}"}
+        return {"success": True, "habits": [], "message": "No habits tracked yet"}
+    # Day numbers (days since 1970-01-01) straight from SQLite; a covering index scan.
+    day_number = "CAST(julianday(logged_date) - 2440587.5 AS INTEGER)"
+    if habit_id:
+        cur.execute(f"SELECT DISTINCT habit_id, {day_number} FROM habit_logs WHERE habit_id=? AND {day_number} IS NOT NULL", (habit_id,))
+    else:
+        cur.execute(f"SELECT DISTINCT habit_id, {day_number} FROM habit_logs WHERE {day_number} IS NOT NULL")
+    logs = cur.fetchall()
+    conn.close()
+
+    ids = np.array([h[0] for h in habits], dtype=np.int64)
+    weekly = np.array([h[2] == "weekly" for h in habits])
+    today = np.datetime64(datetime.utcnow().date(), "D").astype(np.int64)
+    start = today - days + 1
+
+    # Log rows -> (habit index, day number); rows of unknown habits or bad dates are dropped.
+    pairs = np.array(logs, dtype=np.int64).reshape(-1, 2)
+    hid, day = pairs[:, 0], pairs[:, 1]
+    idx = np.searchsorted(ids, hid)
+    known = (idx < len(ids)) & (ids[np.minimum(idx, len(ids) - 1)] == hid) if len(ids) else np.zeros(0, bool)
+    idx, day = idx[known], day[known]
+
+    # Streaks: runs of consecutive units (days, or weeks for weekly habits) per habit.
+    unit = np.where(weekly[idx], _week_of(day), day)
+    order = np.lexsort((unit, idx))
+    h_sorted, u_sorted = idx[order], unit[order]
+    distinct = np.ones(len(order), bool)
+    distinct[1:] = (np.diff(h_sorted) != 0) | (np.diff(u_sorted) != 0)
+    h_sorted, u_sorted = h_sorted[distinct], u_sorted[distinct]
+
+    longest = np.zeros(len(ids), np.int64)
+    current = np.zeros(len(ids), np.int64)
+    if len(h_sorted):
+        run_start = np.ones(len(h_sorted), bool)
+        run_start[1:] = (np.diff(h_sorted) != 0) | (np.diff(u_sorted) != 1)
+        starts = np.flatnonzero(run_start)
+        lengths = np.diff(np.append(starts, len(h_sorted)))
+        run_habit = h_sorted[starts]
+        run_end = u_sorted[starts + lengths - 1]
+        np.maximum.at(longest, run_habit, lengths)
+        # The current period is still open, so a run ending in the previous one counts too.
+        today_unit = np.where(weekly[run_habit], _week_of(today), today)
+        alive = run_end >= today_unit - 1
+        current[run_habit[alive]] = lengths[alive]
+
+    # Window stats over the last `days` days.
+    in_window = (day >= start) & (day <= today)
+    w_idx, w_day = idx[in_window], day[in_window]
+    heat = np.zeros((len(ids), days), bool)
+    heat[w_idx, w_day - start] = True
+    weekdays = np.zeros((len(ids), 7), np.int64)
+    np.add.at(weekdays, (w_idx, (w_day + 3) % 7), 1)
+
+    # Heatmap rows are Monday-Sunday weeks, "1" = logged; the first week is padded before the window.
+    pad = (start + 3) % 7
+    grid = np.concatenate([np.zeros((len(ids), pad), bool), heat], axis=1)
+    grid = np.concatenate([grid, np.zeros((len(ids), -grid.shape[1] % 7), bool)], axis=1)
+    grid = grid.reshape(len(ids), -1, 7)
+    grid_start = str(np.datetime64(int(start - pad), "D"))
+
+    created = np.array(
+        [np.datetime64(h[3][:10], "D").astype(np.int64) if h[3] else start for h in habits], dtype=np.int64
+    )
+    # Logs can predate created_at (imports); count from whichever came first.
+    first_log = np.full(len(ids), today, np.int64)
+    np.minimum.at(first_log, idx, day)
+    since = np.maximum(np.minimum(created, first_log), start)
+
+    cells = (grid.reshape(len(ids), -1).astype(np.uint8) + ord("0")).tobytes().decode()
+    row_len = grid.shape[1] * 7
+
+    result = []
+    for i, (hid_, name, frequency, _) in enumerate(habits):
+        row = cells[i * row_len:(i + 1) * row_len]
+        if weekly[i]:
+            weeks_logged = len(np.unique(_week_of(np.flatnonzero(heat[i]) + start)))
+            possible = _week_of(today) - _week_of(since[i]) + 1
+            rate = weeks_logged / possible
+        else:
+            rate = heat[i, since[i] - start:].sum() / (today - since[i] + 1)
+        result.append({
+            "id": hid_,
+            "name": name,
+            "frequency": frequency,
+            "current_streak": int(current[i]),
+            "longest_streak": int(longest[i]),
+            "streak_unit": "weeks" if weekly[i] else "days",
+            "completion_rate": round(float(min(rate, 1.0)), 2),
+            "logs_in_period": int(heat[i].sum()),
+            "by_weekday": dict(zip(WEEKDAYS, weekdays[i].tolist())),
+            "heatmap": {
+                "start": grid_start,
+                "weeks": [row[j:j + 7] for j in range(0, row_len, 7)],
+            },
+        })
+
+    return {"success": True, "period_days": days, "habits": result}
+
+
 def delete_habit(habit_id: int) -> dict:
     """Remove a habit from tracking."""
     conn = sqlite3.connect(DB_PATH)
@@ -853,13 +1246,15 @@ def delete_habit(habit_id: int) -> dict:
 # GOOGLE CALENDAR
 # ─────────────────────────────────────────
 
+@traced("google.calendar.build")
 def _get_calendar_service():
     creds = _get_google_creds()
     if not creds:
         return None
-    return build("calendar", "v3", credentials=creds)
+    return _build_google_service("calendar", "v3", creds)
 
 
+@traced("google.calendar.list_events")
 def list_events(days_ahead: int = 7) -> dict:
     """List upcoming Google Calendar events."""
     service = _get_calendar_service()
@@ -901,6 +1296,7 @@ def list_events(days_ahead: int = 7) -> dict:
         return {"success": False, "message": f"Calendar error: {str(e)}"}
 
 
+@traced("google.calendar.create_event")
 def create_event(title: str, date: str, time: str = "09:00", duration_minutes: int = 60, description: str = "") -> dict:
     """Create a Google Calendar event. date: YYYY-MM-DD, time: HH:MM"""
     service = _get_calendar_service()
@@ -919,6 +1315,7 @@ def create_event(title: str, date: str, time: str = "09:00", duration_minutes: i
         }
 
         result = service.events().insert(calendarId="primary", body=event).execute()
+        _mark_summary_dirty("calendar")
         return {
             "success": True,
             "message": f"Event created: '{title}' on {date} at {time}",
@@ -929,6 +1326,7 @@ def create_event(title: str, date: str, time: str = "09:00", duration_minutes: i
         return {"success": False, "message": f"Calendar error: {str(e)}"}
 
 
+@traced("google.calendar.delete_event")
 def delete_event(event_id: str) -> dict:
     """Delete a Google Calendar event by ID."""
     service = _get_calendar_service()
@@ -937,11 +1335,13 @@ def delete_event(event_id: str) -> dict:
 
     try:
         service.events().delete(calendarId="primary", eventId=event_id).execute()
+        _mark_summary_dirty("calendar")
         return {"success": True, "message": "Event deleted"}
     except Exception as e:
         return {"success": False, "message": f"Calendar error: {str(e)}"}
 
 
+@traced("google.calendar.update_event")
 def update_event(event_id: str, title: str = "", date: str = "", time: str = "", duration_minutes: int = 0) -> dict:
     """Update an existing Google Calendar event."""
     service = _get_calendar_service()
@@ -961,6 +1361,7 @@ def update_event(event_id: str, title: str = "", date: str = "", time: str = "",
             event["end"] = {"dateTime": end_dt.isoformat(), "timeZone": "UTC"}
 
         result = service.events().update(calendarId="primary", eventId=event_id, body=event).execute()
+        _mark_summary_dirty("calendar")
         return {"success": True, "message": f"Event updated: '{result.get('summary')}'"}
     except Exception as e:
         return {"success": False, "message": f"Calendar error: {str(e)}"}
@@ -970,13 +1371,15 @@ def update_event(event_id: str, title: str = "", date: str = "", time: str = "",
 # GMAIL
 # ─────────────────────────────────────────
 
+@traced("google.gmail.build")
 def _get_gmail_service():
     creds = _get_google_creds()
     if not creds:
         return None
-    return build("gmail", "v1", credentials=creds)
+    return _build_google_service("gmail", "v1", creds)
 
 
+@traced("google.gmail.list_unread")
 def get_unread_emails(max_results: int = 5) -> dict:
     """Get unread emails from Gmail inbox."""
     service = _get_gmail_service()
@@ -1015,6 +1418,7 @@ def get_unread_emails(max_results: int = 5) -> dict:
         return {"success": False, "message": f"Gmail error: {str(e)}"}
 
 
+@traced("google.gmail.send")
 def send_email(to: str, subject: str, body: str) -> dict:
     """Send an email via Gmail."""
     service = _get_gmail_service()
@@ -1060,35 +1464,125 @@ def get_email_summary() -> dict:
 # CROSS-TOOL
 # ─────────────────────────────────────────
 
-def get_daily_summary() -> dict:
-    """Full picture: todos, reminders, notes, habits, calendar events."""
-    todos_result = list_todos()
-    reminders_result = list_reminders()
-    habits_result = get_habits()
-
+def _recent_notes() -> list:
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
     cur.execute("SELECT id, title, summary, tags, created_at FROM notes ORDER BY id DESC LIMIT 5")
     note_rows = cur.fetchall()
     conn.close()
-
-    recent_notes = [
+    return [
         {"id": r[0], "title": r[1], "summary": r[2] or "", "tags": r[3] or "", "created_at": r[4]}
         for r in note_rows
     ]
 
-    todos = todos_result.get("todos", [])
-    overdue = [t for t in todos if t.get("overdue")]
 
-    # Try to get today's calendar events
-    calendar_events = []
+def _todays_events() -> list:
     cal_result = list_events(days_ahead=1)
-    if cal_result.get("success"):
-        calendar_events = cal_result.get("events", [])
+    return cal_result.get("events", []) if cal_result.get("success") else []
+
+
+# Daily summary snapshot: section -> builder, and the tables whose writes make it stale.
+# The calendar lives in Google, so it is marked dirty by the event tools and
+# refreshed by the scheduler instead of by a trigger.
+SUMMARY_SECTIONS = {
+    "todos": lambda: list_todos().get("todos", []),
+    "reminders": lambda: list_reminders().get("reminders", []),
+    "habits": lambda: get_habits().get("habits", []),
+    "notes": _recent_notes,
+    "calendar": _todays_events,
+}
+SUMMARY_TABLES = {
+    "todos": ("todos",),
+    "reminders": ("reminders",),
+    "habits": ("habits", "habit_logs"),
+    "notes": ("notes",),
+}
+
+
+def _mark_summary_dirty(section: str):
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("UPDATE daily_summary SET dirty=1 WHERE section=?", (section,))
+    conn.commit()
+    conn.close()
+
+
+@traced("daily_summary.rebuild")
+def _rebuild_summary_section(section: str):
+    """Recompute one section and store it. Returns the fresh payload.
+
+    dirty is cleared before building, so a write that lands meanwhile marks it
+    again; the generation check keeps a slower, older rebuild from overwriting
+    a newer one.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.execute("UPDATE daily_summary SET dirty=0, generation=generation+1 WHERE section=?", (section,))
+    cur.execute("SELECT generation FROM daily_summary WHERE section=?", (section,))
+    generation = cur.fetchone()[0]
+    conn.commit()
+    conn.close()
+
+    payload = SUMMARY_SECTIONS[section]()
+
+    now = datetime.utcnow()
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute(
+        "UPDATE daily_summary SET payload=?, day=?, updated_at=? WHERE section=? AND generation=?",
+        (json.dumps(payload), now.date().isoformat(), now.isoformat(), section, generation),
+    )
+    conn.commit()
+    conn.close()
+    return payload
+
+
+def refresh_daily_summary(sections=None):
+    """Scheduler job: rebuild the given sections (default: all) ahead of the first request."""
+    rebuilt = []
+    for section in sections or SUMMARY_SECTIONS:
+        try:
+            _rebuild_summary_section(section)
+            rebuilt.append(section)
+        except Exception as e:
+            print(f"Daily summary refresh failed for {section}: {e}")
+    if rebuilt:
+        publish({"type": "summary_ready", "sections": rebuilt})
+
+
+def _summary_sections() -> tuple:
+    """(section -> payload, oldest updated_at), rebuilding only sections that are dirty or from another day."""
+    today = datetime.utcnow().date().isoformat()
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.execute("SELECT section, payload, day, dirty, updated_at FROM daily_summary")
+    rows = cur.fetchall()
+    conn.close()
+
+    sections = {}
+    as_of = []
+    for section, payload, day, dirty, updated_at in rows:
+        if section not in SUMMARY_SECTIONS:
+            continue
+        if payload is None or dirty or day != today:
+            sections[section] = _rebuild_summary_section(section)
+            updated_at = datetime.utcnow().isoformat()
+        else:
+            sections[section] = json.loads(payload)
+        as_of.append(updated_at)
+    return sections, min(as_of) if as_of else None
+
+
+def get_daily_summary() -> dict:
+    """Full picture: todos, reminders, notes, habits, calendar events.
+
+    Served from the daily_summary snapshot: a warm read is one small query and
+    no Calendar call.
+    """
+    sections, as_of = _summary_sections()
+    todos = sections["todos"]
+    overdue = [t for t in todos if t.get("overdue")]
 
     # Habits not done today
-    habits = habits_result.get("habits", [])
-    pending_habits = [h for h in habits if not h.get("done_today")]
+    pending_habits = [h for h in sections["habits"] if not h.get("done_today")]
 
     return {
         "success": True,
@@ -1096,57 +1590,102 @@ def get_daily_summary() -> dict:
             "pending_todos": len(todos),
             "overdue_todos": len(overdue),
             "todos": todos,
-            "upcoming_reminders": reminders_result.get("reminders", []),
-            "recent_notes": recent_notes,
-            "calendar_events": calendar_events,
+            "upcoming_reminders": sections["reminders"],
+            "recent_notes": sections["notes"],
+            "calendar_events": sections["calendar"],
             "pending_habits": pending_habits,
+            "as_of": as_of,
         }
     }
 
 
-def get_priority_inbox() -> dict:
-    """What should I work on right now? Ranks by overdue > high priority > due today."""
-    todos = list_todos().get("todos", [])
-    if not todos:
-        return {"success": True, "message": "Nothing on your plate — all clear!"}
+# Priority inbox score bands, best first: overdue +100, high +50, due today +30,
+# normal +10. Each is (priority_rank, due condition) and maps to one range of
+# idx_todos_pending, so the top N is a handful of index seeks. Non-ISO due
+# dates never count as overdue; they rank with the undated todos.
+DUE_OVERDUE = f"{DUE_KEY_SQL} < :today AND {ISO_DUE_SQL}"
+DUE_TODAY = f"{DUE_KEY_SQL} = :today"
+DUE_LATER = f"({DUE_KEY_SQL} > :today OR NOT {ISO_DUE_SQL})"
+PRIORITY_INBOX_BANDS = [
+    (0, DUE_OVERDUE),   # overdue, high      150
+    (1, DUE_OVERDUE),   # overdue, normal    110
+    (2, DUE_OVERDUE),   # overdue, low       100
+    (0, DUE_TODAY),     # today, high         80
+    (0, DUE_LATER),     # high                50
+    (1, DUE_TODAY),     # today, normal       40
+    (2, DUE_TODAY),     # today, low          30
+    (1, DUE_LATER),     # normal              10
+    (2, DUE_LATER),     # low                  0
+]
+PRIORITY_INBOX_MAX = 50
+
 
+def get_priority_inbox(limit: int = 5) -> dict:
+    """What should I work on right now? Ranks by overdue > high priority > due today."""
     today = datetime.utcnow().date().isoformat()
+    limit = max(1, min(int(limit), PRIORITY_INBOX_MAX))
+    bands = " UNION ALL ".join(
+        f"""SELECT * FROM (
+            SELECT {band} AS band, {TODO_COLUMNS} FROM todos
+            WHERE done=0 AND priority_rank={rank} AND {due}
+            ORDER BY {DUE_KEY_SQL} LIMIT :limit
+        )"""
+        for band, (rank, due) in enumerate(PRIORITY_INBOX_BANDS)
+    )
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    cur.execute(f"SELECT * FROM ({bands}) ORDER BY band LIMIT :limit", {"today": today, "limit": limit})
+    rows = cur.fetchall()
+    conn.close()
 
-    def score(t):
-        s = 0
-        if t["overdue"]: s += 100
-        if t["priority"] == "high": s += 50
-        if t["due_date"] == today: s += 30
-        if t["priority"] == "normal": s += 10
-        return s
+    if not rows:
+        return {"success": True, "message": "Nothing on your plate — all clear!"}
 
-    ranked = sorted(todos, key=score, reverse=True)[:5]
+    ranked = [_todo_from_row(r[1:], today) for r in rows]
     return {"success": True, "priority_inbox": ranked, "message": f"Top {len(ranked)} things to focus on"}
 
 
+REVIEW_PERIODS = {"week": 7, "month": 30, "year": 365}
+
+
+def _review_since(days: int) -> str:
+    """First day of a review window of `days` days ending today (inclusive)."""
+    return (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+
+
+def _read_rollup(cur, since: str) -> list:
+    """(day, metric, key, count) rows from `since` on — a range scan of the primary key."""
+    cur.execute("SELECT day, metric, key, count FROM daily_rollup WHERE day >= ? AND count != 0", (since,))
+    return cur.fetchall()
+
+
 def get_weekly_review() -> dict:
     """Summary of the week — completed todos, notes created, habits logged."""
-    week_ago = (datetime.utcnow() - timedelta(days=7)).isoformat()
+    since = _review_since(REVIEW_PERIODS["week"])
 
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
 
-    cur.execute("SELECT task, priority FROM todos WHERE done=1 AND created_at >= ?", (week_ago,))
+    cur.execute(
+        "SELECT task, priority FROM todos WHERE completed_at >= ? ORDER BY completed_at",
+        (since,),
+    )
     completed_todos = [{"task": r[0], "priority": r[1]} for r in cur.fetchall()]
 
-    cur.execute("SELECT title, created_at FROM notes WHERE created_at >= ?", (week_ago,))
+    cur.execute("SELECT title, created_at FROM notes WHERE created_at >= ?", (since,))
     new_notes = [{"title": r[0], "created_at": r[1]} for r in cur.fetchall()]
 
-    cur.execute("""
-        SELECT h.name, COUNT(hl.id) as logs
-        FROM habits h
-        LEFT JOIN habit_logs hl ON h.id = hl.habit_id AND hl.logged_date >= ?
-        GROUP BY h.id
-    """, (week_ago[:10],))
-    habit_summary = [{"habit": r[0], "logs_this_week": r[1]} for r in cur.fetchall()]
-
+    rollup = _read_rollup(cur, since)
+    cur.execute("SELECT id, name FROM habits")
+    habits = cur.fetchall()
     conn.close()
 
+    logs = {}
+    for _, metric, key, n in rollup:
+        if metric == "habit_logs":
+            logs[key] = logs.get(key, 0) + n
+    habit_summary = [{"habit": name, "logs_this_week": logs.get(hid, 0)} for hid, name in habits]
+
     return {
         "success": True,
         "weekly_review": {
@@ -1158,6 +1697,69 @@ def get_weekly_review() -> dict:
     }
 
 
+def get_review(period: str = "week") -> dict:
+    """Completions, notes and habit activity over the last week, month or year, from daily_rollup."""
+    days = REVIEW_PERIODS.get(period)
+    if not days:
+        return {"success": False, "message": f"Unknown period '{period}'. Use one of: {', '.join(REVIEW_PERIODS)}"}
+
+    today = datetime.utcnow().date()
+    since = _review_since(days)
+
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    rollup = _read_rollup(cur, since)
+    cur.execute("SELECT id, name, frequency FROM habits")
+    habits = cur.fetchall()
+    conn.close()
+
+    # A year is bucketed by month, shorter periods by day.
+    bucket_of = (lambda day: day[:7]) if period == "year" else (lambda day: day)
+    buckets = {}
+    by_priority = {name: 0 for name in PRIORITY_ORDER}
+    rank_names = {rank: name for name, rank in PRIORITY_ORDER.items()}
+    notes_created = 0
+    habit_logs = {}
+    for day, metric, key, n in rollup:
+        bucket = buckets.setdefault(bucket_of(day), {"completed": 0, "notes": 0, "habit_logs": 0})
+        if metric == "todos_completed":
+            bucket["completed"] += n
+            by_priority[rank_names.get(key, "normal")] += n
+        elif metric == "notes_created":
+            bucket["notes"] += n
+            notes_created += n
+        elif metric == "habit_logs":
+            bucket["habit_logs"] += n
+            habit_logs[key] = habit_logs.get(key, 0) + n
+
+    timeline = [{"period": key, **buckets[key]} for key in sorted(buckets)]
+    busiest = max(timeline, key=lambda b: b["completed"], default=None)
+    habit_summary = []
+    for hid, name, frequency in habits:
+        expected = days if frequency == "daily" else max(1, days // 7)
+        count = habit_logs.get(hid, 0)
+        habit_summary.append({
+            "habit": name,
+            "logs": count,
+            "completion_rate": round(min(1.0, count / expected), 2),
+        })
+
+    return {
+        "success": True,
+        "review": {
+            "period": period,
+            "from": since,
+            "to": today.isoformat(),
+            "completed_count": sum(by_priority.values()),
+            "completed_by_priority": by_priority,
+            "notes_created": notes_created,
+            "habit_summary": habit_summary,
+            "busiest": busiest["period"] if busiest and busiest["completed"] else None,
+            "timeline": timeline,
+        }
+    }
+
+
 def clear_completed() -> dict:
     """Wipe all completed todos and fired reminders."""
     conn = sqlite3.connect(DB_PATH)
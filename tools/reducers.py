@@ -0,0 +1,34 @@
+from functools import partial
+
+
+def compact(value, max_items: int = 20, max_text: int = 200, drop: tuple = ()):
+    """Shrink a tool result for the agent prompt.
+
+    Keys in `drop` are removed at any depth, strings longer than max_text are cut
+    with "…", and lists are cut to max_items — a cut list under key "k" gets a
+    sibling "k_more" with the number of items left out.
+    """
+    if isinstance(value, dict):
+        out = {}
+        for key, item in value.items():
+            if key in drop:
+                continue
+            if isinstance(item, list) and len(item) > max_items:
+                out[key] = [compact(x, max_items, max_text, drop) for x in item[:max_items]]
+                out[f"{key}_more"] = len(item) - max_items
+            else:
+                out[key] = compact(item, max_items, max_text, drop)
+        return out
+    if isinstance(value, list):
+        items = [compact(x, max_items, max_text, drop) for x in value[:max_items]]
+        if len(value) > max_items:
+            items.append({"_more": len(value) - max_items})
+        return items
+    if isinstance(value, str) and len(value) > max_text:
+        return value[:max_text].rstrip() + "…"
+    return value
+
+
+def reducer(max_items: int = 20, max_text: int = 200, drop: tuple = ()):
+    """A reducer for ToolRegistry.register with the given limits."""
+    return partial(compact, max_items=max_items, max_text=max_text, drop=frozenset(drop))
@@ -1,17 +1,77 @@
+import os
+import json
+import time
+import asyncio
 import inspect
+import threading
 from typing import Callable
+from tracing import span
+from deadline import DeadlineExceeded, within
+from tools.params import InvalidParams, ParamValidator
+import metrics
+
+# How long a read result is reused within a session (0 disables memoization).
+TOOL_CACHE_TTL_SECONDS = float(os.getenv("TOOL_CACHE_TTL_SECONDS", "60"))
+TOOL_CACHE_MAX_ENTRIES = 512
+
+
+def _param_shape(params: dict) -> dict:
+    """What a trace may keep of a tool's params: names and sizes, not the text (emails, notes, todos)."""
+    shape = {}
+    for name, value in params.items():
+        if isinstance(value, (str, list, tuple, dict)):
+            shape[name] = f"{type(value).__name__}[{len(value)}]"
+        else:
+            shape[name] = type(value).__name__
+    return shape
 
 
 class ToolRegistry:
     def __init__(self):
         self._tools = {}
+        # Serialized tool list for the agent prompt; rebuilt only after register().
+        self._catalog = None
+        self.catalog_version = 0
+        # (session_id, tool_name, params) -> (expires_at, outcome, tables it depends on)
+        self._cache = {}
+        # invalidate() is also called from scheduler threads (e.g. a reminder firing).
+        self._cache_lock = threading.Lock()
 
-    def register(self, name: str, description: str, func: Callable, schema: dict = None):
+    def register(self, name: str, description: str, func: Callable, schema: dict = None,
+                 read_only: bool = False, touches: tuple = None, idempotent: bool = False,
+                 reply: str = None, terminal: bool = False, reducer: Callable = None,
+                 memoize: bool = True):
+        """read_only: the tool has no side effects, so the agent may start it
+        speculatively (before the model has finished its response) and its
+        results are memoized per session for TOOL_CACHE_TTL_SECONDS.
+        touches: the tables/resources the tool reads or writes. A write invalidates
+        memoized reads that touch any of them; leave unset to mean "everything",
+        pass () for tools that touch no local state.
+        idempotent: repeating a write with the same params has no further effect,
+        so a repeat within the session returns the first result.
+        reply: template for the user-facing answer, formatted with the call's params
+        and result fields, e.g. 'Done — added "{task}".'
+        terminal: the result's own "message" is a complete answer.
+        Either lets the agent skip the final LLM call when the model marks the call final.
+        reducer: shrinks the tool's result before it goes into the agent prompt
+        (see tools.reducers); the full result stays available to the agent.
+        memoize: set False for reads whose data changes without a registry write
+        (chat history, Gmail, Calendar)."""
         self._tools[name] = {
             "description": description,
             "function": func,
             "schema": schema or {},
+            "validator": ParamValidator(name, func, schema),
+            "read_only": read_only,
+            "touches": frozenset(touches) if touches is not None else None,
+            "idempotent": idempotent,
+            "reply": reply,
+            "terminal": terminal,
+            "reducer": reducer,
+            "memoize": memoize,
         }
+        self._catalog = None
+        self.catalog_version += 1
 
     def list_tools(self):
         return [
@@ -23,26 +83,129 @@ class ToolRegistry:
             for name, data in self._tools.items()
         ]
 
+    def catalog(self) -> str:
+        """Compact JSON of name, description and params for every tool, cached until the next register()."""
+        if self._catalog is None:
+            self._catalog = json.dumps(
+                [{"name": name, "desc": data["description"], "params": data["schema"]}
+                 for name, data in self._tools.items()],
+                separators=(",", ":"), ensure_ascii=False,
+            )
+        return self._catalog
+
     def get(self, name: str):
         return self._tools.get(name)
 
-    async def execute(self, tool_name: str, params: dict):
+    def is_read_only(self, name: str) -> bool:
+        tool = self.get(name)
+        return bool(tool and tool["read_only"])
+
+    def render_reply(self, name: str, params: dict, outcome: dict) -> str | None:
+        """The local reply for a successful call, or None if the tool has none."""
+        tool = self.get(name)
+        if not tool or not (tool["reply"] or tool["terminal"]) or not outcome.get("success"):
+            return None
+        result = outcome.get("result")
+        if not isinstance(result, dict) or result.get("success") is False:
+            return None
+        if tool["reply"]:
+            try:
+                return tool["reply"].format(**{**params, **result})
+            except (KeyError, IndexError, ValueError):
+                pass
+        return result.get("message")
+
+    def reduce(self, name: str, outcome: dict) -> dict:
+        """The outcome as it should appear in the prompt (the same object if unchanged)."""
+        tool = self.get(name)
+        if not tool or not tool["reducer"] or "result" not in outcome:
+            return outcome
+        reduced = tool["reducer"](outcome["result"])
+        if reduced == outcome["result"]:
+            return outcome
+        return {**outcome, "result": reduced}
+
+    def invalidate(self, *tables: str):
+        """Drop memoized results that depend on any of `tables` (everything if none given)."""
+        with self._cache_lock:
+            if not tables:
+                self._cache.clear()
+                return
+            tables = set(tables)
+            stale = [key for key, (_, _, deps) in self._cache.items() if deps is None or deps & tables]
+            for key in stale:
+                del self._cache[key]
+
+    def _remember(self, key, outcome: dict, deps):
+        now = time.monotonic()
+        with self._cache_lock:
+            if len(self._cache) >= TOOL_CACHE_MAX_ENTRIES:
+                for stale in [k for k, (expires_at, _, _) in self._cache.items() if expires_at <= now]:
+                    del self._cache[stale]
+                while len(self._cache) >= TOOL_CACHE_MAX_ENTRIES:
+                    del self._cache[next(iter(self._cache))]
+            self._cache[key] = (now + TOOL_CACHE_TTL_SECONDS, outcome, deps)
+
+    def _after_write(self, tool: dict):
+        if not tool["read_only"]:
+            self.invalidate(*(tool["touches"] or ()))
+
+    async def execute(self, tool_name: str, params: dict, session_id: str = None):
+        """Run a tool. With a session_id, read-only and idempotent calls are memoized per session."""
         tool = self.get(tool_name)
 
         if not tool:
             return {"success": False, "error": f"Tool '{tool_name}' not found"}
 
         try:
-            func = tool["function"]
-            if inspect.iscoroutinefunction(func):
-                result = await func(**params)
-            else:
-                result = func(**params)
+            params = tool["validator"].validate(params)
+        except InvalidParams as e:
+            metrics.incr("tool.invalid_params")
+            return {
+                "success": False,
+                "error": f"{e}. Fix them and call {tool_name} again.",
+                "invalid_params": e.problems,
+                "expected": tool["schema"],
+            }
+
+        memoizable = (bool(session_id) and TOOL_CACHE_TTL_SECONDS > 0 and tool["memoize"]
+                      and (tool["read_only"] or tool["idempotent"]))
+        key = (session_id, tool_name, json.dumps(params, sort_keys=True, default=str)) if memoizable else None
+        if key:
+            hit = self._cache.get(key)
+            if hit and hit[0] > time.monotonic():
+                metrics.incr("tool.cache.hit")
+                with span("tool.execute", tool_name=tool_name, params=_param_shape(params), cached=True):
+                    return {**hit[1], "cached": True}
+            metrics.incr("tool.cache.miss")
+
+        with span("tool.execute", tool_name=tool_name, params=_param_shape(params)) as tool_span:
+            invalidated = tool["read_only"]
+            try:
+                func = tool["function"]
+                if inspect.iscoroutinefunction(func):
+                    result = await within(func(**params))
+                else:
+                    # Sync tools do blocking sqlite/Google I/O — keep them off the event loop.
+                    result = await within(asyncio.to_thread(func, **params))
 
-            return {"success": True, "result": result}
+                outcome = {"success": True, "result": result}
+                # Invalidate before remembering, so an idempotent write keeps its own entry.
+                self._after_write(tool)
+                invalidated = True
+                if key and not (isinstance(result, dict) and result.get("success") is False):
+                    self._remember(key, outcome, tool["touches"])
+                return outcome
 
-        except Exception as e:
-            return {"success": False, "error": str(e)}
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                tool_span.set(error=str(e))
+                return {"success": False, "error": str(e)}
+            finally:
+                # A failed or abandoned write may still have changed something.
+                if not invalidated:
+                    self._after_write(tool)
 
 
 registry = ToolRegistry()
\ No newline at end of file
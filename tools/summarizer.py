@@ -3,5 +3,5 @@ from llm.groq_client import generate
 
 async def summarize_text(text: str) -> dict:
     prompt = f"Summarize this concisely:\n\n{text}"
-    summary = await generate(prompt)
+    summary = await generate(prompt, purpose="summarize_text")
     return {"summary": summary.strip()}
\ No newline at end of file
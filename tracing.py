@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import uuid
+import functools
+import inspect
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+
+# Finished traces, newest last. Old traces fall off the end of the ring buffer.
+_traces = deque(maxlen=TRACE_BUFFER_SIZE)
+_current_span = ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, attrs: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.attrs = dict(attrs or {})
+        self.children = []
+        self.error = None
+        self.started_at = datetime.utcnow().isoformat()
+        self._start = time.perf_counter()
+        self.duration_ms = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self):
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 2)
+
+    def to_dict(self) -> dict:
+        data = {
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "attrs": self.attrs,
+            "children": [c.to_dict() for c in self.children],
+        }
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class _NoopSpan:
+    """Returned when there is no active trace (e.g. scheduler threads)."""
+    trace_id = None
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def _store(root: Span):
+    trace = {"trace_id": root.trace_id, **root.to_dict()}
+    _traces.append(trace)
+    if TRACE_FILE:
+        try:
+            with open(TRACE_FILE, "a") as f:
+                f.write(json.dumps(trace, default=str) + "\n")
+        except Exception as e:
+            print(f"Could not write trace {root.trace_id}: {e}")
+
+
+@contextmanager
+def start_trace(name: str, **attrs):
+    """Open a root span. The finished trace is kept in the ring buffer."""
+    root = Span(name, uuid.uuid4().hex[:16], attrs)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        root.finish()
+        _store(root)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Open a child span under the active one. No-op outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield _NOOP
+        return
+
+    child = Span(name, parent.trace_id, attrs)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        child.finish()
+
+
+def traced(name: str):
+    """Decorator that wraps every call of a sync or async function in a span."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    """The active span, or a no-op span outside a trace."""
+    return _current_span.get() or _NOOP
+
+
+def current_trace_id() -> str | None:
+    active = _current_span.get()
+    return active.trace_id if active else None
+
+
+def get_trace(trace_id: str) -> dict | None:
+    for trace in reversed(_traces):
+        if trace["trace_id"] == trace_id:
+            return trace
+    return None
+
+
+def list_traces(limit: int = 50) -> list:
+    recent = list(_traces)[-limit:] if limit > 0 else []
+    return [
+        {
+            "trace_id": t["trace_id"],
+            "name": t["name"],
+            "started_at": t["started_at"],
+            "duration_ms": t["duration_ms"],
+            "attrs": t["attrs"],
+        }
+        for t in reversed(recent)
+    ]